@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -61,16 +62,21 @@ INSTALLED_APPS = [
 
 SITE_ID = 1
 
+# Async-capable variants of the usual middleware (see application.middleware):
+# under ASGI none of them hops to a thread unless it has real I/O to do.
 MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'application.middleware.MetricsMiddleware',
+    'application.middleware.ReplicaPinningMiddleware',
+    'application.middleware.SecurityMiddleware',
+    'application.middleware.WhiteNoiseMiddleware',
+    'application.middleware.SessionMiddleware',
+    'application.middleware.CommonMiddleware',
+    'application.middleware.CsrfViewMiddleware',
+    'application.middleware.AuthenticationMiddleware',
+    'application.middleware.MessageMiddleware',
+    'application.middleware.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'application.middleware.HashingOverloadedMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -104,6 +110,74 @@ DATABASES = {
     }
 }
 
+# Database profile, selected with the DATABASE_PROFILE environment variable.
+# SQLITE_PROFILES PRAGMAs are applied to every new SQLite connection by
+# application.db.configure_sqlite_connection (a connection_created receiver).
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+
+SQLITE_PROFILES = {
+    'development': {},
+    'production': {
+        'journal_mode': 'WAL',          # readers no longer block on the writer
+        'synchronous': 'NORMAL',        # fsync at checkpoints only; safe with WAL
+        'mmap_size': 268435456,         # 256 MiB memory-mapped reads
+        'cache_size': -65536,           # 64 MiB page cache per connection
+        'busy_timeout': 5000,           # ms to wait for the write lock before failing
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Connection settings merged into DATABASES['default'] per profile
+DATABASE_PROFILES = {
+    'development': {},
+    'production': {
+        'CONN_MAX_AGE': 600,            # reuse connections across requests
+        'CONN_HEALTH_CHECKS': True,     # ...but verify them before reuse
+        # Take the write lock at BEGIN so busy_timeout applies instead of
+        # failing on a read-to-write lock upgrade
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+}
+
+DATABASES['default'].update(DATABASE_PROFILES[DATABASE_PROFILE])
+
+# Read replicas (application.routers): reads of the permission model go to one of
+# DATABASE_REPLICAS, writes to 'default'. Replicas more than REPLICA_MAX_LAG seconds
+# behind (by their heartbeat, checked every REPLICA_LAG_CHECK_INTERVAL seconds) are
+# skipped, and clients that wrote read from 'default' for REPLICA_MAX_LAG seconds
+# (REPLICA_PIN_COOKIE). Locally, SQLITE_REPLICA=<path> adds a replica file kept in
+# sync by `manage.py replicate_db --interval 1`.
+DATABASE_REPLICAS = []
+if os.environ.get('SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SQLITE_REPLICA'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+REPLICA_MAX_LAG = 5
+REPLICA_LAG_CHECK_INTERVAL = 1.0
+REPLICA_PIN_COOKIE = 'db_pin'
+
+# Tenant sharding (see application.sharding): with DATABASE_SHARDS set, the roles,
+# permissions and members of each application live in the database the shard map
+# assigns it, new applications being spread over DATABASE_SHARDS (list 'default'
+# to keep placing some there). Empty: everything stays on 'default'. Processes
+# re-read the map every SHARD_MAP_TTL seconds. Locally, SQLITE_SHARDS=<path>,...
+# adds SQLite shards 'shard1', 'shard2'... next to 'default'; migrate each with
+# `manage.py migrate --database shard1`.
+DATABASE_SHARDS = []
+if os.environ.get('SQLITE_SHARDS'):
+    for number, path in enumerate(os.environ['SQLITE_SHARDS'].split(','), start=1):
+        DATABASES[f'shard{number}'] = {**DATABASES['default'], 'NAME': path}
+        DATABASE_SHARDS.append(f'shard{number}')
+    DATABASE_SHARDS.insert(0, 'default')
+SHARD_MAP_TTL = 5
+SHARD_MAP_CACHE_SIZE = 100000
+
+# Tenant tables go to their shard first; 'default' reads may then go to a replica
+DATABASE_ROUTERS = ['application.sharding.ShardRouter', 'application.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -163,20 +237,26 @@ AUTHENTICATION_BACKENDS = (
    "allauth.account.auth_backends.AuthenticationBackend"
 )
 
+# API keys (application.authentication.APIKeyAuthentication) are accepted by the
+# application-scoped API views only, which set their own authentication_classes.
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'application.throttling.ApplicationRateThrottle',
+    ),
 }
 
 REST_AUTH = {
     'USE_JWT': True,
     'JWT_AUTH_HTTPONLY': False,
     'JWT_AUTH_COOKIE': 'core-app-auth',
-    'JWT_AUTH_REFRESH_COOKIE': 'core-app-refresh-token'
+    'JWT_AUTH_REFRESH_COOKIE': 'core-app-refresh-token',
+    'JWT_TOKEN_CLAIMS_SERIALIZER': 'application.serializers.ClaimsTokenObtainPairSerializer',
 }
 
 # AUTH_USER_MODEL = 'application.User'
@@ -187,14 +267,119 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'SIGNING_KEY': SECRET_KEY,
+    # Access tokens embed per-application role/permission claims (application.claims)
+    'TOKEN_OBTAIN_SERIALIZER': 'application.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'application.serializers.ClaimsTokenRefreshSerializer',
 }
 
+# Password hashing. The first hasher of the PASSWORD_HASHER_POLICY is preferred;
+# the others still verify, and their hashes are upgraded on the next login (as
+# are hashes made with older PASSWORD_HASHER_PARAMS). Argon2 needs argon2-cffi.
+# Hashing runs on a pool of PASSWORD_HASHING_WORKERS threads (default: one per
+# core, 0 hashes on the request thread); past PASSWORD_HASHING_QUEUE_DEPTH
+# waiting calls, logins fail fast with 503 (HashingOverloadedMiddleware answers
+# for the admin and allauth logins, which are not DRF views).
+PASSWORD_HASHER_POLICIES = {
+    'pbkdf2': 'application.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'application.hashers.ScryptPasswordHasher',
+    'argon2': 'application.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER_POLICY = os.environ.get('PASSWORD_HASHER_POLICY', 'pbkdf2')
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_POLICIES[PASSWORD_HASHER_POLICY],
+    *(hasher for policy, hasher in PASSWORD_HASHER_POLICIES.items() if policy != PASSWORD_HASHER_POLICY),
+    # The rest of Django's defaults, so existing hashes in their formats still verify
+    # (and are upgraded). The pooled hashers above replace Django's own PBKDF2, scrypt
+    # and Argon2 hashers, which would otherwise take over their algorithm names.
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASHER_PARAMS = {
+    # OWASP's minimum for Argon2id: a single lane, since the pool already uses every core
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+}
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_QUEUE_DEPTH = 16
+
+# In-process Bloom filter of blacklisted refresh-token jtis (application.blacklist):
+# sized for CAPACITY jtis at ERROR_RATE false positives; tokens blacklisted by other
+# processes are picked up within SYNC_INTERVAL seconds, and the filter is rebuilt
+# without expired tokens every REBUILD_INTERVAL seconds. Each sync re-reads the rows
+# blacklisted up to SYNC_MARGIN seconds before the previous one: keep it above the
+# longest transaction plus the clock skew between hosts. Prune the tables with
+# `manage.py prune_tokens`.
+TOKEN_BLACKLIST_FILTER_CAPACITY = 100000
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = 0.01
+TOKEN_BLACKLIST_FILTER_SYNC_INTERVAL = 5
+TOKEN_BLACKLIST_FILTER_SYNC_MARGIN = 60
+TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL = 3600
+
+# Roles inherit the permissions of their parent role (Role.parent); longest chain
+# of ancestors a role may have
+ROLE_HIERARCHY_MAX_DEPTH = 10
+
+# Effective-permission cache (entries are (application, user) pairs). Entries expire
+# after PERMISSION_CACHE_TTL seconds, which bounds how long other worker processes
+# keep serving a revoked grant.
+PERMISSION_CACHE_SIZE = 10000
+PERMISSION_CACHE_TTL = 10
+
+# Maximum (user, permission) pairs per POST /api/applications/<id>/check
+PERMISSION_CHECK_MAX_PAIRS = 500
+
+# API key resolution cache (seconds); unknown keys are cached separately
+API_KEY_CACHE_SIZE = 10000
+API_KEY_CACHE_TTL = 300
+API_KEY_NEGATIVE_CACHE_SIZE = 10000
+API_KEY_NEGATIVE_CACHE_TTL = 30
+
+# Per-application rate limits of API-key requests (application.throttling): token
+# buckets of BURST requests refilled at RATE ("<n>/<s|m|h|d>"), overridable per
+# application with Application.data["throttle"] = {"rate": ..., "burst": ...}.
+# LocalBucketStore keeps buckets in the process; with several workers per host use
+# 'application.throttling.SQLiteBucketStore' with OPTIONS {'path': '/tmp/throttle.sqlite3'}.
+THROTTLE_DEFAULT_RATE = '20/s'
+THROTTLE_DEFAULT_BURST = 100
+THROTTLE_STORE = {
+    'BACKEND': 'application.throttling.LocalBucketStore',
+    'OPTIONS': {'maxsize': 100000},
+}
+
+# Admin changelists: rows counted exactly before switching to estimates, and
+# the most choices a related-object filter lists
+ADMIN_EXACT_COUNT_LIMIT = 10000
+ADMIN_FILTER_MAX_CHOICES = 100
+
+# Request metrics (GET /metrics, Prometheus text format). Requests repeating one
+# SQL statement this many times are counted and logged as possible N+1s. Set
+# METRICS_TOKEN to require `Authorization: Bearer <token>` on the endpoint.
+METRICS_N_PLUS_ONE_THRESHOLD = 10
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Change feed (GET /api/changes): longest long-poll wait and page size a client
+# may ask for, how often waiting requests re-check for entries written by other
+# processes (seconds), and what `manage.py compact_changelog` keeps
+CHANGES_MAX_WAIT = 30
+CHANGES_MAX_PAGE_SIZE = 1000
+CHANGES_POLL_INTERVAL = 1.0
+CHANGELOG_RETENTION_DAYS = 7
+CHANGELOG_COMPACT_AFTER_HOURS = 1
+# Application manifests cached per revision; how long (seconds) a cached
+# revision is trusted before it is checked against the database again
+MANIFEST_CACHE_SIZE = 1000
+MANIFEST_CACHE_TTL = 5
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
             'type': 'apiKey',
             'name': 'Authorization',
             'in': 'header'
+        },
+        'ApiKey': {
+            'type': 'apiKey',
+            'name': 'X-API-Key',
+            'in': 'header'
         }
     }
 }
@@ -21,6 +21,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from application.views import ClaimsLoginView, ClaimsTokenRefreshView, metrics
+
 schema_view = get_schema_view(
    openapi.Info(
       title="API Documentation",
@@ -34,9 +36,14 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Claim-embedding replacements, matched before the dj_rest_auth defaults
+    path('auth/login/', ClaimsLoginView.as_view(), name='rest_login'),
+    path('auth/token/refresh/', ClaimsTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/', include('dj_rest_auth.urls')),
     path('auth/registration/', include('dj_rest_auth.registration.urls')),
     path('accounts/', include('allauth.urls')),
+    path('api/', include('application.urls')),
+    path('metrics', metrics, name='metrics'),
 
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
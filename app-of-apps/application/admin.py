@@ -1,13 +1,74 @@
+from django.conf import settings
 from django.contrib import admin
+
 from application.models import Application, Role, AppPermission, ApplicationUser
+from application.pagination import EstimatedCountPaginator
+
+
+class BoundedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """
+    RelatedFieldListFilter listing at most ADMIN_FILTER_MAX_CHOICES related
+    rows (and the selected ones), in one query joining only the relations
+    their __str__ follows. Beyond that, narrow the changelist with its search.
+    """
+    select_related = ()
+
+    def get_choices_queryset(self, field):
+        return field.related_model._default_manager.select_related(*self.select_related)
+
+    def field_choices(self, field, request, model_admin):
+        queryset = self.get_choices_queryset(field)
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        choices = list(queryset[:getattr(settings, "ADMIN_FILTER_MAX_CHOICES", 100)])
+        selected = {int(pk) for pk in self.lookup_val or () if pk.isdigit()} - {obj.pk for obj in choices}
+        if selected:
+            choices += queryset.filter(pk__in=selected)
+        return [(obj.pk, str(obj)) for obj in choices]
+
+
+class ApplicationListFilter(BoundedRelatedFieldListFilter):
+    select_related = ("user",)  # Application.__str__ shows the owner
+
+
+class ApplicationRoleListFilter(BoundedRelatedFieldListFilter):
+    """ Roles of the application picked in the `application` filter; hidden until one is picked """
+    select_related = ("application",)
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        application_id = request.GET.get("application__id__exact", "")
+        self.application_id = int(application_id) if application_id.isdigit() else None
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def has_output(self):
+        return self.application_id is not None and super().has_output()
+
+    def get_choices_queryset(self, field):
+        return super().get_choices_queryset(field).filter(application_id=self.application_id)
+
+    def field_choices(self, field, request, model_admin):
+        if self.application_id is None:
+            return []
+        return super().field_choices(field, request, model_admin)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelists that never run an unbounded COUNT(*) (see EstimatedCountPaginator).
+    Newest first by pk reads the table, or the FK index of a filter, backwards;
+    ordering by created_ts sorted every row of the table to show one page.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
 
 
 @admin.register(Application)
-class ApplicationAdmin(admin.ModelAdmin):
+class ApplicationAdmin(LargeTableAdmin):
     list_display = ('name', 'API_KEY', 'created_ts', 'updated_ts', 'deleted_ts')
     readonly_fields = ('API_KEY', 'created_ts', 'updated_ts', 'deleted_ts')
     search_fields = ('name',)
-    ordering = ('-created_ts',)
     fieldsets = (
         (None, {'fields': ('name', 'description')}),
         ('Timestamps', {'fields': ('created_ts', 'updated_ts', 'deleted_ts'), 'classes': ('collapse',)}),
@@ -16,24 +77,26 @@ class ApplicationAdmin(admin.ModelAdmin):
 
 
 @admin.register(Role)
-class RoleAdmin(admin.ModelAdmin):
+class RoleAdmin(LargeTableAdmin):
     list_display = ('name', 'application', 'created_ts', 'updated_ts', 'deleted_ts')
+    list_select_related = ('application__user',)  # Application.__str__ shows the owner
     search_fields = ('name', 'application__name')
-    list_filter = ('application',)
-    ordering = ('-created_ts',)
+    list_filter = (('application', ApplicationListFilter),)
+    autocomplete_fields = ('application', 'parent')
     readonly_fields = ('created_ts', 'updated_ts', 'deleted_ts')
     fieldsets = (
-        (None, {'fields': ('name', 'application', 'description')}),
+        (None, {'fields': ('name', 'application', 'parent', 'description')}),
         ('Timestamps', {'fields': ('created_ts', 'updated_ts', 'deleted_ts'), 'classes': ('collapse',)}),
     )
 
 
 @admin.register(AppPermission)
-class PermissionAdmin(admin.ModelAdmin):
+class PermissionAdmin(LargeTableAdmin):
     list_display = ('name', 'application', 'created_ts', 'updated_ts', 'deleted_ts')
+    list_select_related = ('application__user',)
     search_fields = ('name', 'application__name')
-    list_filter = ('application',)
-    ordering = ('-created_ts',)
+    list_filter = (('application', ApplicationListFilter),)
+    autocomplete_fields = ('application',)
     readonly_fields = ('created_ts', 'updated_ts', 'deleted_ts')
     fieldsets = (
         (None, {'fields': ('name', 'application', 'description')}),
@@ -42,11 +105,16 @@ class PermissionAdmin(admin.ModelAdmin):
 
 
 @admin.register(ApplicationUser)
-class ApplicationUserAdmin(admin.ModelAdmin):
+class ApplicationUserAdmin(LargeTableAdmin):
     list_display = ('user', 'application', 'role', 'created_ts', 'updated_ts', 'deleted_ts')
+    list_select_related = ('user', 'application__user', 'role__application')
     search_fields = ('user__username', 'application__name', 'role__name')
-    list_filter = ('application', 'role', 'created_ts')
-    ordering = ('-created_ts',)
+    list_filter = (
+        ('application', ApplicationListFilter),
+        ('role', ApplicationRoleListFilter),
+        'created_ts',
+    )
+    autocomplete_fields = ('user', 'application', 'role')
     readonly_fields = ('created_ts', 'updated_ts', 'deleted_ts')
     fieldsets = (
         (None, {'fields': ('user', 'application', 'role')}),
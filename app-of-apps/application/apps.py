@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApplicationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "application"
+
+    def ready(self):
+        from application import signals  # noqa: F401  (registers receivers)
@@ -0,0 +1,188 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from application.caching import LRUCache
+from application.models import Application, hash_api_key
+
+
+API_KEY_HEADER = "HTTP_X_API_KEY"
+API_KEY_KEYWORD = b"api-key"
+API_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ApplicationClient:
+    """
+    `request.user` for requests authenticated with an Application's API_KEY.
+    The client is the application itself, not its owner, so it never picks up
+    the owner's Django permissions.
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    is_superuser = False
+    pk = None
+
+    def __init__(self, application):
+        self.application = application
+
+    def __str__(self):
+        return f"client:{self.application.name}"
+
+
+class APIKeyCache:
+    """
+    Digest -> Application resolution cache.
+
+    Unknown keys live in a separate, shorter-lived LRU so a flood of bad keys
+    cannot evict the entries of well-behaved clients, and repeated bad keys do
+    not reach the database. Cached Applications are shared between requests and
+    must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.known = LRUCache(
+            getattr(settings, "API_KEY_CACHE_SIZE", 10000),
+            ttl=getattr(settings, "API_KEY_CACHE_TTL", 300),
+        )
+        self.unknown = LRUCache(
+            getattr(settings, "API_KEY_NEGATIVE_CACHE_SIZE", 10000),
+            ttl=getattr(settings, "API_KEY_NEGATIVE_CACHE_TTL", 30),
+        )
+
+    def lookup(self, digest):
+        """ Return the Application, False for a known-bad key, or None on a miss """
+        application = self.known.get(digest)
+        if application is not None:
+            return application
+        if self.unknown.get(digest) is not None:
+            return False
+        return None
+
+    def store(self, digest, application):
+        if application is None:
+            self.unknown.set(digest, True)
+        else:
+            self.known.set(digest, application)
+
+    def invalidate(self, digest):
+        self.known.pop(digest)
+        self.unknown.pop(digest)
+
+    def clear(self):
+        self.known.clear()
+        self.unknown.clear()
+
+    def stats(self):
+        return {"known": self.known.stats(), "unknown": self.unknown.stats()}
+
+
+api_key_cache = APIKeyCache()
+
+
+def _api_key_digest(api_key):
+    if not API_KEY_PATTERN.match(api_key):
+        return None  # malformed keys never reach the cache or the database
+    return hash_api_key(api_key)
+
+
+def _api_key_queryset(digest):
+    return Application.alive.select_related("user").filter(API_KEY_DIGEST=digest)
+
+
+def resolve_api_key(api_key):
+    """ Return the live Application owning `api_key`, or None """
+    digest = _api_key_digest(api_key)
+    if digest is None:
+        return None
+    application = api_key_cache.lookup(digest)
+    if application is None:
+        application = _api_key_queryset(digest).first()
+        api_key_cache.store(digest, application)
+    return application or None
+
+
+async def aresolve_api_key(api_key):
+    """ Async resolve_api_key: cache hits never leave the event loop """
+    digest = _api_key_digest(api_key)
+    if digest is None:
+        return None
+    application = api_key_cache.lookup(digest)
+    if application is None:
+        application = await _api_key_queryset(digest).afirst()
+        api_key_cache.store(digest, application)
+    return application or None
+
+
+class APIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates client applications by API_KEY, sent either as
+    `X-API-Key: <key>` or `Authorization: Api-Key <key>`.
+    On success `request.user` is an ApplicationClient and `request.auth`
+    is the Application.
+    """
+
+    def authenticate(self, request):
+        api_key = self.get_api_key(request)
+        if api_key is None:
+            return None
+        application = resolve_api_key(api_key)
+        if application is None:
+            raise exceptions.AuthenticationFailed("Invalid API key.")
+        return ApplicationClient(application), application
+
+    def get_api_key(self, request):
+        api_key = request.META.get(API_KEY_HEADER)
+        if api_key:
+            return api_key.strip()
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != API_KEY_KEYWORD:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid API key header.")
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid API key header.")
+
+    def authenticate_header(self, request):
+        return "Api-Key"
+
+
+async def aauthenticate(request):
+    """
+    Authenticate a plain Django request for async views the way
+    REST_FRAMEWORK's JWTAuthentication and APIKeyAuthentication would.
+    Returns (user, auth), or (None, None) without credentials; raises
+    AuthenticationFailed for bad ones.
+    """
+    api_key = APIKeyAuthentication().get_api_key(request)
+    if api_key is not None:
+        application = await aresolve_api_key(api_key)
+        if application is None:
+            raise exceptions.AuthenticationFailed("Invalid API key.")
+        return ApplicationClient(application), application
+
+    jwt_authentication = JWTAuthentication()
+    header = jwt_authentication.get_header(request)
+    raw_token = None if header is None else jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        return None, None
+    token = jwt_authentication.get_validated_token(raw_token)  # signature only, no I/O
+    try:
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise exceptions.AuthenticationFailed("Token contained no recognizable user identification")
+    try:
+        user = await get_user_model().objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except get_user_model().DoesNotExist:
+        raise exceptions.AuthenticationFailed("User not found")
+    if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+        raise exceptions.AuthenticationFailed("User is inactive")
+    return user, token
@@ -0,0 +1,72 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import transaction
+
+
+DEVELOPER_GROUP = "developer"
+
+_current_context = contextvars.ContextVar("authorization_context", default=None)
+
+
+class AuthorizationContext:
+    """
+    Memoizes the "owner is a developer" rule enforced by Application, Role and
+    AppPermission.save() for the duration of one transaction, so each owner and
+    each application is looked up at most once however many rows are written.
+    Group membership changes made inside the same transaction are not seen.
+    """
+
+    def __init__(self):
+        self.owners = {}      # application_id -> owner user_id
+        self.developers = {}  # user_id -> bool
+
+    def prefetch_owners(self, application_ids):
+        missing = set(application_ids) - self.owners.keys()
+        if missing:
+            Application = apps.get_model("application", "Application")
+            self.owners.update(Application.objects.filter(pk__in=missing).values_list("pk", "user_id"))
+        self.prefetch_developers(self.owners[pk] for pk in application_ids if pk in self.owners)
+
+    def prefetch_developers(self, user_ids):
+        missing = set(user_ids) - self.developers.keys()
+        if missing:
+            developers = set(
+                User.objects.filter(pk__in=missing, groups__name=DEVELOPER_GROUP).values_list("pk", flat=True)
+            )
+            self.developers.update((pk, pk in developers) for pk in missing)
+
+    def is_developer(self, user_id):
+        self.prefetch_developers([user_id])
+        return self.developers[user_id]
+
+    def owner_is_developer(self, application_id):
+        self.prefetch_owners([application_id])
+        owner_id = self.owners.get(application_id)
+        return owner_id is not None and self.developers[owner_id]
+
+
+def get_authorization_context():
+    """ The active AuthorizationContext, or None outside authorization_context() """
+    return _current_context.get()
+
+
+@contextmanager
+def authorization_context(using=None):
+    """
+    Open a transaction with a memoizing AuthorizationContext.
+    Nested calls reuse the outer context.
+    """
+    context = _current_context.get()
+    if context is not None:
+        yield context
+        return
+    context = AuthorizationContext()
+    token = _current_context.set(context)
+    try:
+        with transaction.atomic(using=using):
+            yield context
+    finally:
+        _current_context.reset(token)
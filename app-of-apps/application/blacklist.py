@@ -0,0 +1,174 @@
+"""
+In-process Bloom filter of blacklisted refresh-token jtis.
+
+simplejwt checks every refresh token against BlacklistedToken with a join
+query. Almost no refresh token presented is blacklisted, so the filter
+answers "certainly not blacklisted" from memory for those, and only a
+"maybe" (a blacklisted jti or a false positive) goes to the database.
+
+The filter is kept current by:
+- post_save of BlacklistedToken in this process (logout), immediately;
+- a sync, at most every TOKEN_BLACKLIST_FILTER_SYNC_INTERVAL seconds, that
+  adds the rows other processes created since (one indexed range query on
+  blacklisted_at); this interval is how long a token blacklisted elsewhere
+  can still refresh here, so keep it short (0 syncs before every check).
+  Rows become visible out of id and timestamp order under concurrent
+  writers, so each sync reads back TOKEN_BLACKLIST_FILTER_SYNC_MARGIN
+  seconds before the previous one started: a blacklisting committed later
+  than that after its timestamp waits for the next rebuild;
+- a full rebuild every TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL seconds,
+  which drops expired tokens and resizes the filter to the blacklist.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    """ Fixed-size Bloom filter over strings, sized for `capacity` items at `error_rate` """
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(-(-self.size // 8))
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & 1 << (position & 7) for position in self._positions(item))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        """ Expected false-positive rate at the current number of items """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class BlacklistFilter:
+    """ Thread-safe BloomFilter of BlacklistedToken jtis, synced and rebuilt from the database """
+
+    def __init__(self, capacity, error_rate, sync_interval, rebuild_interval, sync_margin=60, timer=time.monotonic):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.sync_margin = timedelta(seconds=sync_margin)
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._refreshing = threading.Lock()
+        self._filter = None
+        self._added_during_rebuild = None
+        self._synced_since = None
+        self._synced_at = self._built_at = None
+        self.checks = 0
+        self.database_checks = 0
+        self.false_positives = 0
+
+    def might_contain(self, jti):
+        """ False when the jti is certainly not blacklisted (as of the last sync) """
+        self.refresh()
+        with self._lock:
+            self.checks += 1
+            maybe = jti in self._filter
+            if maybe:
+                self.database_checks += 1
+        return maybe
+
+    def record_false_positive(self):
+        with self._lock:
+            self.false_positives += 1
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(jti)  # may be missing from the filter being built
+
+    def refresh(self):
+        """ Sync or rebuild when due; while another thread does it, checks use the current filter """
+        if not self._refreshing.acquire(blocking=self._filter is None):
+            return
+        try:
+            now = self._timer()
+            if self._filter is None or now - self._built_at >= self.rebuild_interval:
+                self.rebuild()
+            elif now - self._synced_at >= self.sync_interval:
+                self.sync()
+        finally:
+            self._refreshing.release()
+
+    def rebuild(self):
+        with self._lock:
+            self._added_during_rebuild = []
+        started = timezone.now()
+        live = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        bloom = BloomFilter(max(self.capacity, 2 * live.count()), self.error_rate)
+        for jti in live.values_list("token__jti", flat=True).iterator(chunk_size=10000):
+            bloom.add(jti)
+        now = self._timer()
+        with self._lock:
+            for jti in self._added_during_rebuild:
+                bloom.add(jti)
+            self._filter, self._synced_since, self._added_during_rebuild = bloom, started, None
+            self._synced_at = self._built_at = now
+
+    def sync(self):
+        with self._lock:
+            since = self._synced_since
+        started = timezone.now()
+        jtis = list(
+            BlacklistedToken.objects.filter(blacklisted_at__gte=since - self.sync_margin)
+            .values_list("token__jti", flat=True)
+        )
+        now = self._timer()
+        with self._lock:
+            for jti in jtis:
+                if jti not in self._filter:  # rows within the margin are read again
+                    self._filter.add(jti)
+            self._synced_since, self._synced_at = started, now
+
+    def clear(self):
+        with self._lock:
+            self._filter = None
+
+    def stats(self):
+        with self._lock:
+            bloom = self._filter
+            return {
+                "entries": bloom.count if bloom else 0,
+                "bytes": bloom.nbytes if bloom else 0,
+                "hashes": bloom.hashes if bloom else 0,
+                "estimated_false_positive_rate": bloom.false_positive_rate() if bloom else 0.0,
+                "checks": self.checks,
+                "database_checks": self.database_checks,
+                "false_positives": self.false_positives,
+            }
+
+
+blacklist_filter = BlacklistFilter(
+    capacity=getattr(settings, "TOKEN_BLACKLIST_FILTER_CAPACITY", 100_000),
+    error_rate=getattr(settings, "TOKEN_BLACKLIST_FILTER_ERROR_RATE", 0.01),
+    sync_interval=getattr(settings, "TOKEN_BLACKLIST_FILTER_SYNC_INTERVAL", 5),
+    rebuild_interval=getattr(settings, "TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL", 3600),
+    sync_margin=getattr(settings, "TOKEN_BLACKLIST_FILTER_SYNC_MARGIN", 60),
+)
@@ -0,0 +1,87 @@
+from django.core.exceptions import PermissionDenied
+
+from application import sharding
+from application.authorization import authorization_context
+from application.models import Application, AppPermission, ApplicationUser, Role, hash_api_key
+from application.signals import bulk_changed
+
+
+SUPPORTED_MODELS = (Application, Role, AppPermission, ApplicationUser)
+
+
+def _authorize(model, objs, context):
+    """ Apply the developer-owner rule of save() to every object, with batched lookups """
+    if model is Application:
+        context.prefetch_developers(obj.user_id for obj in objs)
+        allowed = all(context.is_developer(obj.user_id) for obj in objs)
+    elif model in (Role, AppPermission):
+        context.prefetch_owners({obj.application_id for obj in objs})
+        allowed = all(context.owner_is_developer(obj.application_id) for obj in objs)
+    else:
+        allowed = True  # ApplicationUser.save() has no ownership rule either
+    if not allowed:
+        raise PermissionDenied("User does not have permission to create applications.")
+
+
+def _prepare(model, objs, fields=None):
+    """ Fill the columns save() derives, since bulk operations bypass it """
+    if model is Application and (fields is None or "API_KEY" in fields):
+        for obj in objs:
+            obj.API_KEY_DIGEST = hash_api_key(obj.API_KEY)
+        if fields is not None:
+            fields = [*fields, "API_KEY_DIGEST"]
+    if model is AppPermission and fields is None:
+        AppPermission.assign_bit_indexes(objs)
+    return fields
+
+
+def _application_ids(model, objs):
+    if model is Application:
+        return {obj.pk for obj in objs}
+    return {obj.application_id for obj in objs}
+
+
+def _changed(model, objs, fields=None):
+    """ bulk_changed arguments; members' users are named unless memberships may have moved """
+    changed = {"application_ids": _application_ids(model, objs)}
+    if model is ApplicationUser and not {"application", "user"} & set(fields or ()):
+        changed["user_ids"] = {obj.user_id for obj in objs}
+    return changed
+
+
+def bulk_create(model, objs, batch_size=None, **kwargs):
+    """
+    `model.objects.bulk_create` that enforces the same authorization as
+    save(), using one owner and one group query for the whole batch.
+    """
+    if model not in SUPPORTED_MODELS:
+        raise TypeError(f"bulk_create does not support {model.__name__}.")
+    objs = list(objs)
+    if not objs:
+        return objs
+    with authorization_context() as context:
+        _authorize(model, objs, context)
+        _prepare(model, objs)
+        created = model.objects.bulk_create(objs, batch_size=batch_size, **kwargs)
+        if model is Application:
+            sharding.assign([obj for obj in created if obj.pk is not None])
+        bulk_changed.send(sender=model, **_changed(model, created))
+    return created
+
+
+def bulk_update(model, objs, fields, batch_size=None):
+    """
+    `model.objects.bulk_update` that enforces the same authorization as save().
+    Returns the number of rows matched.
+    """
+    if model not in SUPPORTED_MODELS:
+        raise TypeError(f"bulk_update does not support {model.__name__}.")
+    objs = list(objs)
+    if not objs:
+        return 0
+    with authorization_context() as context:
+        _authorize(model, objs, context)
+        fields = _prepare(model, objs, fields)
+        updated = model.objects.bulk_update(objs, fields, batch_size=batch_size)
+        bulk_changed.send(sender=model, **_changed(model, objs, fields))
+    return updated
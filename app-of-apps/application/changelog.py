@@ -0,0 +1,137 @@
+"""
+Change-data-capture feed of the permission model (ChangeLogEntry rows).
+
+Receivers in application.signals call record() for every change to an
+application, role, permission, role-permission link or member. Inside a
+transaction the entries are buffered and written with one bulk INSERT when
+it commits, so a rolled-back transaction (or savepoint) leaves no entries
+and a large transaction costs one extra statement instead of one per row.
+Entries are written in commit order, so the id doubles as the client cursor.
+On backends whose sequences can commit out of order (PostgreSQL), a reader
+may briefly see a later id before an earlier one.
+
+Long-polling readers (GET /api/changes) wait on `notifier`, which wakes them
+as soon as this process commits entries for their application; entries
+written by other processes are picked up every CHANGES_POLL_INTERVAL seconds.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.db.models import Max, Min
+
+from application import sharding
+from application.models import ChangeLogEntry, Role
+
+
+class ChangeNotifier:
+    """ Wakes event-loop waiters, per application id, from any thread """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = defaultdict(set)
+
+    @contextmanager
+    def listen(self, application_id):
+        """
+        Register an asyncio.Event that is set when entries for the application
+        are written; register before reading the feed so no write is missed.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[application_id].add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                self._waiters[application_id].discard(waiter)
+                if not self._waiters[application_id]:
+                    del self._waiters[application_id]
+
+    def notify(self, application_ids):
+        with self._lock:
+            waiters = [waiter for app_id in application_ids for waiter in self._waiters.get(app_id, ())]
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # the waiter's loop is closed
+
+
+notifier = ChangeNotifier()
+
+
+class _Batch:
+    """ Entries buffered by one (sub)transaction, written by its on_commit callback """
+
+    def __init__(self, using, savepoint_id):
+        self.using = using
+        self.savepoint_id = savepoint_id
+        self.entries = []
+        self.position = None
+
+    def is_open(self, connection, savepoint_id):
+        # A rolled-back savepoint drops the callback from run_on_commit and an
+        # ended transaction empties it, so the batch is only reused while its
+        # callback is still queued in the same (sub)transaction.
+        return (
+            self.savepoint_id == savepoint_id
+            and self.position < len(connection.run_on_commit)
+            and connection.run_on_commit[self.position][1] == self.flush
+        )
+
+    def flush(self):
+        write(self.entries, self.using)
+
+
+def write(entries, using="default"):
+    if entries:
+        ChangeLogEntry.objects.using(sharding.global_database(using)).bulk_create(entries)
+        notifier.notify({entry.application_id for entry in entries})
+
+
+def record(application_id, model, object_id, action, data=None, using="default"):
+    """ Append an entry to the feed now, or when the current transaction commits """
+    entry = ChangeLogEntry(
+        application_id=application_id, model=model, object_id=object_id, action=action, data=data or {},
+    )
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        write([entry], using)
+        return
+    savepoint_id = next((sid for sid in reversed(connection.savepoint_ids) if sid is not None), None)
+    batch = getattr(connection, "_changelog_batch", None)
+    if batch is None or not batch.is_open(connection, savepoint_id):
+        batch = _Batch(using, savepoint_id)
+        batch.position = len(connection.run_on_commit)
+        transaction.on_commit(batch.flush, using=using)
+        connection._changelog_batch = batch
+    batch.entries.append(entry)
+
+
+def role_permissions(role_ids, using="default"):
+    """ {role id: (application id, sorted permission ids)}, so entries carry the role's full set """
+    roles = {
+        role_id: (application_id, [])
+        for role_id, application_id in Role.objects.using(using).filter(pk__in=role_ids).values_list("pk", "application_id")
+    }
+    links = (
+        Role.permissions.through.objects.using(using)
+        .filter(role_id__in=roles).order_by("apppermission_id")
+        .values_list("role_id", "apppermission_id")
+    )
+    for role_id, permission_id in links:
+        roles[role_id][1].append(permission_id)
+    return roles
+
+
+async def ahead():
+    """ Cursor of the newest entry (0 while the feed is empty) """
+    return (await ChangeLogEntry.objects.aaggregate(head=Max("id")))["head"] or 0
+
+
+async def aoldest():
+    """ Id of the oldest retained entry; cursors below it - 1 have lost entries to retention """
+    return (await ChangeLogEntry.objects.aaggregate(oldest=Min("id")))["oldest"]
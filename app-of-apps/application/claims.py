@@ -0,0 +1,54 @@
+"""
+Verification of the permission claims embedded in access tokens.
+
+This module only depends on rest_framework_simplejwt, so downstream Django
+apps can use it to authorize requests locally: configure SIMPLE_JWT with the
+same SIGNING_KEY/ALGORITHM and check claims without calling back to us.
+Claims are at most ACCESS_TOKEN_LIFETIME old.
+"""
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+APPLICATIONS_CLAIM = "apps"    # {"<application_id>": {"r": role name, "p": [permission names]}}
+APPLICATION_SCOPE_CLAIM = "app"  # set when the token was requested for a single application
+
+
+class TokenPermissions:
+    """ Read-only view of the role/permission claims of a verified access token """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.applications = payload.get(APPLICATIONS_CLAIM, {})
+
+    @classmethod
+    def from_token(cls, raw_token):
+        """ Verify signature, expiry and type of `raw_token`; raises InvalidToken """
+        try:
+            return cls(AccessToken(raw_token).payload)
+        except TokenError as e:
+            raise InvalidToken(str(e))
+
+    @classmethod
+    def from_request(cls, request):
+        """ From an `Authorization: Bearer <token>` header; None when there is no bearer token """
+        parts = request.headers.get("Authorization", "").split()
+        if len(parts) != 2 or parts[0].lower() != "bearer":
+            return None
+        return cls.from_token(parts[1])
+
+    @property
+    def scope(self):
+        return self.payload.get(APPLICATION_SCOPE_CLAIM)
+
+    def role(self, application_id):
+        return self.applications.get(str(application_id), {}).get("r")
+
+    def permissions(self, application_id):
+        return frozenset(self.applications.get(str(application_id), {}).get("p", ()))
+
+    def has_permission(self, application_id, permission_name):
+        return permission_name in self.permissions(application_id)
+
+    def has_permissions(self, application_id, *permission_names):
+        return self.permissions(application_id).issuperset(permission_names)
@@ -0,0 +1,60 @@
+import re
+
+from django.db import models
+from django.db.models.fields.json import KeyTextTransform
+
+
+KEY_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def validate_key(key):
+    if not KEY_PATTERN.match(key):
+        raise ValueError(f"{key!r} is not a valid indexed data key.")
+    return key
+
+
+class DataKey(models.Func):
+    """
+    Text value of a top-level key in a JSON column: `json_extract(col, '$."key"')`
+    on SQLite, `(col ->> 'key')` on PostgreSQL.
+
+    The key is inlined as a literal rather than bound as a parameter, so the
+    expression a query filters on is textually identical to the one an
+    expression index was built on; both SQLite and PostgreSQL need that to pick
+    the index. Keys are restricted to identifiers, which keeps inlining safe.
+    Other backends get Django's own `data__key` text transform.
+    """
+    output_field = models.TextField()
+
+    def __init__(self, column, key, **extra):
+        self.key = validate_key(key)
+        super().__init__(models.F(column), **extra)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.source_expressions[0]!r}, {self.key!r})"
+
+    def deconstruct(self):
+        path, _, kwargs = super().deconstruct()
+        return path, (self.source_expressions[0].name, self.key), kwargs
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        return f"json_extract({column}, '$.\"{self.key}\"')", params
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        column, params = compiler.compile(self.source_expressions[0])
+        return f"({column} ->> '{self.key}')", params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return compiler.compile(KeyTextTransform(self.key, self.source_expressions[0]))
+
+
+def data_key_indexes(prefix, keys):
+    """
+    Expression indexes on (application_id, data->>key) for each declared key,
+    for use in Meta.indexes. Tenant metadata is always queried within one application.
+    """
+    return [
+        models.Index(models.F("application"), DataKey("data", key), name=f"{prefix}_data_{key}_idx")
+        for key in keys
+    ]
@@ -0,0 +1,43 @@
+import re
+
+from django.conf import settings
+
+
+PRAGMA_NAMES = {"journal_mode", "synchronous", "mmap_size", "cache_size", "busy_timeout", "temp_store"}
+PRAGMA_VALUE = re.compile(r"^-?\d+$|^[A-Za-z]+$")
+
+# What a fresh sqlite3 connection from Python runs with, for comparisons
+SQLITE_DEFAULT_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "busy_timeout": 5000,
+    "temp_store": "DEFAULT",
+}
+
+
+def get_sqlite_pragmas(profile=None):
+    """ PRAGMAs of a SQLITE_PROFILES entry, defaulting to the active DATABASE_PROFILE """
+    profile = profile or getattr(settings, "DATABASE_PROFILE", None)
+    return getattr(settings, "SQLITE_PROFILES", {}).get(profile, {})
+
+
+def apply_sqlite_pragmas(connection, pragmas):
+    """ Run `PRAGMA name=value` for each entry on a Django SQLite connection """
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if name not in PRAGMA_NAMES or not PRAGMA_VALUE.match(str(value)):
+                raise ValueError(f"Unsupported SQLite pragma {name}={value!r}.")
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """ connection_created receiver applying the active SQLite profile """
+    if connection.vendor == "sqlite":
+        pragmas = get_sqlite_pragmas()
+        if pragmas:
+            apply_sqlite_pragmas(connection, pragmas)
@@ -0,0 +1,115 @@
+"""
+Maintenance of the materialized EffectivePermission table.
+
+A row is an (application, user, permission) that the permission model grants:
+a live membership, its live role or a live ancestor of it (RoleClosure) with
+no soft-deleted role in between, linked to a live permission. Receivers in application.signals call the
+refresh functions inside the writing transaction, for the users a change can
+affect:
+
+- a membership saved, moved or deleted: that user;
+- a role's permission links changed: the members of the role and of every
+  role inheriting from it, for the linked permissions only;
+- a role's parent or liveness changed: the members of its subtree;
+- a permission soft-deleted or restored: the members of the roles holding
+  it, directly or by inheritance, for that permission only;
+- set-based writes (bulk_changed): the given users, else every member.
+
+Deletes of applications, users and permissions cascade to the rows.
+refresh() recomputes rows with one join and writes only the difference, which
+is also how `manage.py rebuild_effective_permissions` verifies and repairs
+the table.
+"""
+from collections import defaultdict
+
+from application.models import AppPermission, ApplicationUser, EffectivePermission, RoleClosure
+
+
+CHUNK_SIZE = 1000  # users per refresh query, under SQLite's bound-parameter limit
+
+
+def granted(application_id, user_ids, permission_ids=None, using="default"):
+    """ (user id, permission id) pairs the permission model grants the given users, in one query """
+    member = "roles__descendant_links__descendant__role_users"
+    rows = AppPermission.objects.using(using).filter(~RoleClosure.through_deleted_role("roles__descendant_links__"), **{
+        "application_id": application_id,
+        "deleted_ts__isnull": True,
+        "roles__deleted_ts__isnull": True,
+        "roles__descendant_links__descendant__deleted_ts__isnull": True,
+        f"{member}__application_id": application_id,
+        f"{member}__user_id__in": user_ids,
+        f"{member}__deleted_ts__isnull": True,
+    })
+    if permission_ids is not None:
+        rows = rows.filter(pk__in=permission_ids)
+    return rows.values_list(f"{member}__user_id", "pk")
+
+
+def refresh(application_id, user_ids, permission_ids=None, dry_run=False, using="default"):
+    """
+    Bring the rows of the given users (and permissions, if given) in line
+    with the permission model, CHUNK_SIZE users per query. Returns (rows
+    added, rows removed); with dry_run they are only counted.
+    """
+    user_ids, added, removed = list(user_ids), 0, 0
+    objects = EffectivePermission.objects.using(using)
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        chunk = user_ids[start:start + CHUNK_SIZE]
+        expected = set(granted(application_id, chunk, permission_ids, using=using))
+        stored = objects.filter(application_id=application_id, user_id__in=chunk)
+        if permission_ids is not None:
+            stored = stored.filter(permission_id__in=permission_ids)
+        stored = {(user_id, permission_id): pk for pk, user_id, permission_id in
+                  stored.values_list("pk", "user_id", "permission_id")}
+        missing = expected - stored.keys()
+        stale = [pk for row, pk in stored.items() if row not in expected]
+        if not dry_run:
+            if stale:
+                objects.filter(pk__in=stale).delete()
+            objects.bulk_create([
+                EffectivePermission(application_id=application_id, user_id=user_id, permission_id=permission_id)
+                for user_id, permission_id in missing
+            ], batch_size=CHUNK_SIZE)
+        added, removed = added + len(missing), removed + len(stale)
+    return added, removed
+
+
+def refresh_roles(role_ids, permission_ids=None, using="default"):
+    """ refresh() the members of the given roles and of every role inheriting from them """
+    inheriting = RoleClosure.objects.using(using).filter(ancestor_id__in=role_ids).values("descendant_id")
+    members = defaultdict(set)
+    for application_id, user_id in (
+        ApplicationUser.objects.using(using).filter(role_id__in=inheriting).values_list("application_id", "user_id")
+    ):
+        members[application_id].add(user_id)
+    for application_id, user_ids in members.items():
+        refresh(application_id, user_ids, permission_ids, using=using)
+
+
+def user_chunks(application_id, chunk_size=CHUNK_SIZE, using="default"):
+    """
+    Ids of every user with a membership or stored rows in the application, in
+    ascending lists of at most 2 * chunk_size, two keyset queries per list
+    """
+    sources = [
+        ApplicationUser.objects.using(using).filter(application_id=application_id)
+        .order_by("user_id").values_list("user_id", flat=True),
+        EffectivePermission.objects.using(using).filter(application_id=application_id)
+        .order_by("user_id").values_list("user_id", flat=True).distinct(),
+    ]
+    last = 0
+    while True:
+        batches = [list(source.filter(user_id__gt=last)[:chunk_size]) for source in sources]
+        # A full batch may continue past its last id, so stop the chunk there
+        ends = [batch[-1] for batch in batches if len(batch) == chunk_size]
+        end = min(ends) if ends else max((batch[-1] for batch in batches if batch), default=None)
+        if end is None:
+            return
+        yield sorted({user_id for batch in batches for user_id in batch if user_id <= end})
+        last = end
+
+
+def refresh_application(application_id, using="default"):
+    """ refresh() every user of the application, chunk by chunk """
+    for user_ids in user_chunks(application_id, using=using):
+        refresh(application_id, user_ids, using=using)
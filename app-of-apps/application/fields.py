@@ -0,0 +1,33 @@
+from django.db import models
+
+
+class BitmaskField(models.BinaryField):
+    """
+    Arbitrary-width bitmask exposed as a Python int and stored as big-endian
+    bytes, so applications are not capped at 64 permissions.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("default", 0)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else int.from_bytes(bytes(value), "big")
+
+    def to_python(self, value):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            return int(value)
+        return int.from_bytes(bytes(value), "big")
+
+    def get_prep_value(self, value):
+        value = self.to_python(value)
+        if value is None:
+            return None
+        if value < 0:
+            raise ValueError("Bitmasks cannot be negative.")
+        return value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+    def value_to_string(self, obj):
+        return str(self.value_from_object(obj))
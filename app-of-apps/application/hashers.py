@@ -0,0 +1,147 @@
+"""
+Password hashers that do their work on a bounded thread pool.
+
+PBKDF2, scrypt and Argon2 all release the GIL while hashing, so a pool of
+PASSWORD_HASHING_WORKERS threads (one per core by default) runs them in
+parallel. At most PASSWORD_HASHING_QUEUE_DEPTH further calls may wait for a
+thread; past that, a login is rejected at once with 503 (HashingOverloaded;
+middleware.HashingOverloadedMiddleware answers for non-DRF views) instead of
+tying up a request worker for seconds, which keeps workers free for token
+refreshes and other cheap requests during a login storm.
+
+Work factors come from PASSWORD_HASHER_PARAMS. Hashes made with another
+algorithm or older parameters are upgraded on the next successful login,
+by Django's check_password() setter.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import exceptions
+
+
+class HashingOverloaded(exceptions.APIException):
+    status_code = 503
+    default_detail = "Too many logins in progress, retry shortly."
+    default_code = "hashing_overloaded"
+
+
+class BoundedHashingPool:
+    """ Thread pool that rejects work instead of queueing more than `queue_depth` calls """
+
+    def __init__(self, workers, queue_depth):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue_depth)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def run(self, func, *args):
+        """ func(*args) on a pool thread; raises HashingOverloaded when the pool and its queue are full """
+        if getattr(self._local, "worker", False):
+            return func(*args)  # verify() calls encode(): already on a pool thread
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloaded()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return self._executor.submit(self._call, func, args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def _call(self, func, args):
+        self._local.worker = True
+        try:
+            return func(*args)
+        finally:
+            self._local.worker = False
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers, "queue_depth": self.queue_depth, "in_flight": self.in_flight,
+                "completed": self.completed, "rejected": self.rejected,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """ The process-wide pool, created on first use; None when PASSWORD_HASHING_WORKERS is 0 """
+    global _pool
+    workers = getattr(settings, "PASSWORD_HASHING_WORKERS", None)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = BoundedHashingPool(workers, getattr(settings, "PASSWORD_HASHING_QUEUE_DEPTH", 4 * workers))
+        return _pool
+
+
+def hashing_pool_stats():
+    """ Counters of the pool, without creating it (None before the first hash) """
+    pool = _pool
+    return pool.stats() if pool is not None else None
+
+
+def reset_hashing_pool():
+    """ Drop the pool so the next call picks up changed settings (tests, benchmarks) """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def tuned(algorithm, name, default):
+    return getattr(settings, "PASSWORD_HASHER_PARAMS", {}).get(algorithm, {}).get(name, default)
+
+
+class PooledHasherMixin:
+    """ Runs encode() and verify() on the hashing pool, or inline when it is disabled """
+
+    def _run(self, func, *args):
+        pool = get_hashing_pool()
+        return func(*args) if pool is None else pool.run(func, *args)
+
+    def encode(self, *args, **kwargs):
+        return self._run(partial(super().encode, *args, **kwargs))
+
+    def verify(self, password, encoded):
+        return self._run(super().verify, password, encoded)
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    iterations = property(lambda self: tuned("pbkdf2", "iterations", hashers.PBKDF2PasswordHasher.iterations))
+
+
+class ScryptPasswordHasher(PooledHasherMixin, hashers.ScryptPasswordHasher):
+    work_factor = property(lambda self: tuned("scrypt", "work_factor", hashers.ScryptPasswordHasher.work_factor))
+    block_size = property(lambda self: tuned("scrypt", "block_size", hashers.ScryptPasswordHasher.block_size))
+    parallelism = property(lambda self: tuned("scrypt", "parallelism", hashers.ScryptPasswordHasher.parallelism))
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    """ Needs argon2-cffi, like Django's own; only loaded when an argon2 hash is made or checked """
+    time_cost = property(lambda self: tuned("argon2", "time_cost", hashers.Argon2PasswordHasher.time_cost))
+    memory_cost = property(lambda self: tuned("argon2", "memory_cost", hashers.Argon2PasswordHasher.memory_cost))
+    parallelism = property(lambda self: tuned("argon2", "parallelism", hashers.Argon2PasswordHasher.parallelism))
@@ -0,0 +1,254 @@
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from io import StringIO
+
+import django
+from allauth.account.models import EmailAddress
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+from application.authentication import api_key_cache, resolve_api_key
+from application.models import Application, ApplicationUser, Role
+from application.permissions import get_effective_permissions, permission_cache
+from application.throttling import reset_bucket_store
+
+
+BENCH_LOGIN = {"email": "bench-login@example.com", "password": "bench-login-password"}
+PERCENTILES = (50, 90, 95, 99)
+# Per-application rate limit of the benchmarked applications: the throttle check is timed, but never rejects
+BENCH_THROTTLE = {"rate": "1000000/s", "burst": 1000000}
+
+
+def percentile(sorted_values, p):
+    """ Nearest-rank percentile of an already sorted list """
+    index = max(0, min(len(sorted_values) - 1, -(-p * len(sorted_values) // 100) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings, queries):
+    timings = sorted(timings)
+    return {
+        "iterations": len(timings),
+        "latency_ms": {
+            **{f"p{p}": round(percentile(timings, p), 3) for p in PERCENTILES},
+            "mean": round(statistics.fmean(timings), 3),
+            "max": round(timings[-1], 3),
+        },
+        "queries": {"min": min(queries), "max": max(queries), "mean": round(statistics.fmean(queries), 2)},
+    }
+
+
+def compare(baseline, current, tolerance):
+    """ Regression messages for scenarios slower (p95) or chattier (mean queries) than the baseline """
+    regressions = []
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        old_p95, new_p95 = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old_p95:.3f} ms -> {new_p95:.3f} ms")
+        old_queries, new_queries = before["queries"]["mean"], result["queries"]["mean"]
+        if new_queries > old_queries:
+            regressions.append(f"{name}: queries {old_queries} -> {new_queries}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the permission-model hot paths on a generated dataset and writes query counts and "
+        "latency percentiles to JSON. Runs in a scratch test database unless --use-existing-db is given."
+    )
+
+    scenarios = (
+        "membership_lookup", "permission_resolution_cold", "permission_resolution_cached", "role_assignment",
+        "api_key_resolution_cold", "api_key_resolution_cached", "admin_changelist", "jwt_login",
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apps", type=int, default=100)
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--roles-per-app", type=int, default=10)
+        parser.add_argument("--perms-per-app", type=int, default=50)
+        parser.add_argument("--members-per-app", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--iterations", type=int, default=200, help="Samples per scenario")
+        parser.add_argument("--login-iterations", type=int, default=20,
+                            help="Samples for jwt_login, which pays for a full password hash each time")
+        parser.add_argument("--scenario", action="append", choices=self.scenarios, dest="only",
+                            help="Only run this scenario (repeatable)")
+        parser.add_argument("--output", help="JSON results file (default: bench-<timestamp>.json)")
+        parser.add_argument("--compare", help="Baseline JSON results; exit with an error on regressions")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed p95 slowdown against --compare (default: 0.2 = 20%%)")
+        parser.add_argument("--keepdb", action="store_true", help="Keep and reuse the scratch database")
+        parser.add_argument("--use-existing-db", action="store_true",
+                            help="Populate and benchmark the configured database itself (adds rows to it)")
+
+    def handle(self, *args, **options):
+        try:
+            setup_test_environment()  # 'testserver' host, in-memory email backend
+            owns_environment = True
+        except RuntimeError:
+            owns_environment = False  # already inside a test run
+        old_name = None
+        if not options["use_existing_db"]:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options["keepdb"])
+        try:
+            results = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options["keepdb"])
+            if owns_environment:
+                teardown_test_environment()
+
+        output = options["output"] or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Results written to {output}")
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                regressions = compare(json.load(f), results, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("✅ No regressions against the baseline."))
+
+    def run(self, options):
+        self.stdout.write("📌 Generating dataset...")
+        started = time.monotonic()
+        call_command(
+            "populate_user_db", apps=options["apps"], users=options["users"],
+            roles_per_app=options["roles_per_app"], perms_per_app=options["perms_per_app"],
+            members_per_app=options["members_per_app"], seed=options["seed"], fast_hash=True,
+            stdout=self.stdout if options["verbosity"] > 1 else StringIO(),
+        )
+        self.stdout.write(f"   done in {time.monotonic() - started:.1f}s")
+        self.prepare(options)
+
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "database_profile": getattr(settings, "DATABASE_PROFILE", None),
+                "dataset": {key: options[key] for key in (
+                    "apps", "users", "roles_per_app", "perms_per_app", "members_per_app", "seed")},
+            },
+            "scenarios": {},
+        }
+        for name in options["only"] or self.scenarios:
+            reset_bucket_store()  # every scenario starts with full buckets
+            iterations = options["login_iterations"] if name == "jwt_login" else options["iterations"]
+            operation = getattr(self, f"bench_{name}")
+            result = self.measure(operation, iterations)
+            results["scenarios"][name] = result
+            latency = result["latency_ms"]
+            self.stdout.write(
+                f"{name:<30} p50 {latency['p50']:>8.3f} ms  p95 {latency['p95']:>8.3f} ms  "
+                f"p99 {latency['p99']:>8.3f} ms  queries {result['queries']['mean']}"
+            )
+        return results
+
+    def prepare(self, options):
+        """ Pick random targets up front so lookups are not timed """
+        self.rng = random.Random(options["seed"])
+        prefix = f"synth{options['seed']}-app-"
+        self.apps = list(Application.alive.filter(name__startswith=prefix).order_by("pk"))
+        if not self.apps:
+            raise CommandError("The dataset has no synthetic applications; use --apps > 0.")
+        self.members = {
+            app.pk: list(ApplicationUser.objects.filter(application=app).values_list("pk", "user_id"))
+            for app in self.apps
+        }
+        self.roles = {app.pk: list(Role.objects.filter(application=app).values_list("pk", flat=True))
+                      for app in self.apps}
+        self.apps = [app for app in self.apps if self.members[app.pk] and self.roles[app.pk]]
+        for app in self.apps:
+            if app.data.get("throttle") != BENCH_THROTTLE:
+                app.data["throttle"] = BENCH_THROTTLE  # one API key sends every request
+                app.save(update_fields=["data"])
+
+        login_user = User.objects.filter(email=BENCH_LOGIN["email"]).first()
+        if login_user is None:
+            login_user = User.objects.create(username="bench-login", email=BENCH_LOGIN["email"])
+        login_user.password = make_password(BENCH_LOGIN["password"])  # the configured hasher, as in production
+        login_user.save(update_fields=["password"])
+        EmailAddress.objects.get_or_create(user=login_user, email=login_user.email,
+                                           defaults={"verified": True, "primary": True})
+
+        self.client = Client()
+        self.admin_client = Client()
+        self.admin_client.force_login(User.objects.get(username="admin"))
+
+    def measure(self, operation, iterations):
+        timings, queries = [], []
+        for _ in range(iterations):
+            setup = operation()  # returns the timed callable, so target selection is not timed
+            reset_queries()  # a full query log would make CaptureQueriesContext count nothing
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                setup()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        return summarize(timings, queries)
+
+    def pick_member(self):
+        app = self.rng.choice(self.apps)
+        pk, user_id = self.rng.choice(self.members[app.pk])
+        return app, pk, user_id
+
+    def expect(self, response, status=200):
+        if response.status_code != status:
+            raise CommandError(f"{response.request['PATH_INFO']} answered {response.status_code}.")
+
+    # Scenarios: each returns the callable to time
+
+    def bench_membership_lookup(self):
+        app, _, user_id = self.pick_member()
+        url = f"/api/applications/{app.pk}/members/{user_id}/"
+        return lambda: self.expect(self.client.get(url, HTTP_X_API_KEY=app.API_KEY))
+
+    def bench_permission_resolution_cold(self):
+        app, _, user_id = self.pick_member()
+        permission_cache.clear()
+        return lambda: get_effective_permissions(app.pk, user_id)
+
+    def bench_permission_resolution_cached(self):
+        app, _, user_id = self.pick_member()
+        get_effective_permissions(app.pk, user_id)
+        return lambda: get_effective_permissions(app.pk, user_id)
+
+    def bench_role_assignment(self):
+        app, pk, _ = self.pick_member()
+        member = ApplicationUser.objects.select_related("application").get(pk=pk)
+        member.role_id = self.rng.choice(self.roles[app.pk])
+        return member.save
+
+    def bench_api_key_resolution_cold(self):
+        app = self.rng.choice(self.apps)
+        api_key_cache.clear()
+        return lambda: resolve_api_key(app.API_KEY)
+
+    def bench_api_key_resolution_cached(self):
+        app = self.rng.choice(self.apps)
+        resolve_api_key(app.API_KEY)
+        return lambda: resolve_api_key(app.API_KEY)
+
+    def bench_admin_changelist(self):
+        return lambda: self.expect(self.admin_client.get("/admin/application/applicationuser/"))
+
+    def bench_jwt_login(self):
+        return lambda: self.expect(self.client.post("/auth/login/", BENCH_LOGIN))
@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from application.models import Application, ApplicationUser, Role
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks indexed (filter_data) against unindexed (data__key) filters on ApplicationUser.data. "
+        "Rows are generated inside a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="ApplicationUser rows to generate")
+        parser.add_argument("--departments", type=int, default=1000, help="Distinct department values")
+        parser.add_argument("--iterations", type=int, default=50, help="Queries per variant")
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        try:
+            with transaction.atomic():
+                app = self.generate(options)
+                self.run(app, options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Generated rows rolled back.")
+
+    def generate(self, options):
+        """Create one application with `rows` members spread over `departments` values."""
+        self.stdout.write(f"📌 Generating {options['rows']} members...")
+        started = time.monotonic()
+        owner = User.objects.create(username=f"bench-owner-{self.rng.random()}")
+        app = Application(user=owner, name="bench")
+        Application.objects.bulk_create([app])  # bypasses the developer rule on purpose
+        role = Role(application=app, name="member")
+        Role.objects.bulk_create([role])
+
+        prefix = f"bench-{self.rng.getrandbits(32):08x}"
+        batch_size = options["batch_size"]
+        for start in range(0, options["rows"], batch_size):
+            stop = min(start + batch_size, options["rows"])
+            users = User.objects.bulk_create(
+                [User(username=f"{prefix}-{i}", password="!") for i in range(start, stop)]
+            )
+            ApplicationUser.objects.bulk_create([
+                ApplicationUser(
+                    application=app, user=user, role=role,
+                    data={
+                        "department": f"d{self.rng.randrange(options['departments'])}",
+                        "region": self.rng.choice(("emea", "amer", "apac")),
+                    },
+                )
+                for user in users
+            ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"   done in {time.monotonic() - started:.1f}s")
+        return app
+
+    def run(self, app, options):
+        members = ApplicationUser.objects.filter(application=app)
+        variants = {
+            "indexed   filter_data(department=...)": lambda value: members.filter_data(department=value),
+            "unindexed filter(data__department=...)": lambda value: members.filter(data__department=value),
+        }
+        for label, build in variants.items():
+            timings = []
+            for _ in range(options["iterations"]):
+                queryset = build(f"d{self.rng.randrange(options['departments'])}")
+                started = time.perf_counter()
+                len(queryset.values_list("pk", flat=True))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+            self.stdout.write(
+                f"{label}: median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+            )
+            self.stdout.write(f"   plan: {self.plan(build('d0'))}")
+
+    def plan(self, queryset):
+        sql, params = queryset.values_list("pk", flat=True).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "; ".join(str(row[-1]) for row in cursor.fetchall())
@@ -0,0 +1,125 @@
+import json
+import os
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from application.hashers import HashingOverloaded, get_hashing_pool, reset_hashing_pool
+from application.management.commands.bench import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures password verifications (the cost of a login) per second, per second per core, and "
+        "their latency under each PASSWORD_HASHER_POLICIES entry, with concurrent clients going "
+        "through the bounded hashing pool. `bench --scenario jwt_login` times whole login requests "
+        "under the configured policy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--policy", action="append", dest="policies",
+                            help="Policy from PASSWORD_HASHER_POLICIES (repeatable; default: all)")
+        parser.add_argument("--logins", type=int, default=100, help="Verifications per policy")
+        parser.add_argument("--clients", type=int, default=2 * (os.cpu_count() or 1), help="Concurrent clients")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Hashing pool threads")
+        parser.add_argument("--queue-depth", type=int,
+                            help="Hashing pool queue depth (default: enough for every client, so none is rejected)")
+        parser.add_argument("--output", help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        policies = options["policies"] or list(settings.PASSWORD_HASHER_POLICIES)
+        unknown = set(policies) - set(settings.PASSWORD_HASHER_POLICIES)
+        if unknown:
+            raise CommandError(f"Unknown policy(ies): {', '.join(sorted(unknown))}.")
+        if options["workers"] < 1 or options["clients"] < 1 or options["logins"] < 1:
+            raise CommandError("--workers, --clients and --logins must be positive.")
+        queue_depth = options["queue_depth"]
+        if queue_depth is None:
+            queue_depth = max(0, options["clients"] - options["workers"])
+
+        results = {"cores": os.cpu_count(), "workers": options["workers"], "clients": options["clients"],
+                   "queue_depth": queue_depth, "policies": {}}
+        for policy in policies:
+            hasher = settings.PASSWORD_HASHER_POLICIES[policy]
+            with override_settings(PASSWORD_HASHERS=[hasher], PASSWORD_HASHING_WORKERS=options["workers"],
+                                   PASSWORD_HASHING_QUEUE_DEPTH=queue_depth):
+                reset_hashing_pool()
+                try:
+                    result = self.run(options)
+                except ValueError as e:  # e.g. argon2-cffi is not installed
+                    self.stdout.write(f"{policy:<8} skipped: {e}")
+                    continue
+                finally:
+                    reset_hashing_pool()
+            results["policies"][policy] = result
+            self.stdout.write(
+                f"{policy:<8} {result['logins_per_second']:>8.1f} logins/s  "
+                f"{result['logins_per_second_per_core']:>8.1f} /s/core  "
+                f"p50 {result['latency_ms']['p50']:>8.1f} ms  p99 {result['latency_ms']['p99']:>8.1f} ms  "
+                f"rejected {result['rejected']}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, options):
+        password = "bench-password"
+        encoded = make_password(password)
+        remaining = iter(range(options["logins"]))
+        lock = threading.Lock()
+        timings, rejected, failed = [], 0, 0
+
+        def client():
+            nonlocal rejected, failed
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    if not check_password(password, encoded):
+                        with lock:
+                            failed += 1
+                        continue
+                except HashingOverloaded:
+                    with lock:
+                        rejected += 1
+                    continue
+                with lock:
+                    timings.append((time.perf_counter() - started) * 1000)
+
+        check_password(password, encoded)  # warm-up: loads the hasher and starts the pool
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(options["clients"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if failed or not timings:
+            raise CommandError(f"{failed} verifications failed, {len(timings)} succeeded.")
+
+        timings.sort()
+        per_second = len(timings) / elapsed
+        pool = get_hashing_pool()
+        return {
+            "hasher": {
+                key: value for key, value in identify_hasher(encoded).decode(encoded).items()
+                if key not in ("salt", "hash")
+            },
+            "logins_per_second": round(per_second, 2),
+            "logins_per_second_per_core": round(per_second / min(pool.workers, os.cpu_count() or 1), 2),
+            "latency_ms": {
+                "p50": round(percentile(timings, 50), 3),
+                "p99": round(percentile(timings, 99), 3),
+                "mean": round(statistics.fmean(timings), 3),
+            },
+            "rejected": rejected,
+        }
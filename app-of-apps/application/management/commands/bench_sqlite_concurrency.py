@@ -0,0 +1,147 @@
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+
+from application.db import SQLITE_DEFAULT_PRAGMAS, apply_sqlite_pragmas
+from application.models import Application, ApplicationUser, Role
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs parallel ApplicationUser readers and writers against a scratch SQLite file once per "
+        "database profile and reports throughput, latency and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="append", dest="profiles",
+                            help="Profile from SQLITE_PROFILES (repeatable; default: all)")
+        parser.add_argument("--members", type=int, default=10_000, help="ApplicationUser rows to generate")
+        parser.add_argument("--readers", type=int, default=8, help="Reader threads")
+        parser.add_argument("--writers", type=int, default=2, help="Writer threads")
+        parser.add_argument("--duration", type=float, default=5.0, help="Seconds per profile")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"] or list(settings.SQLITE_PROFILES)
+        unknown = set(profiles) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}.")
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in profiles:
+                alias = f"bench_{profile}"
+                self.configure(alias, Path(directory) / f"{profile}.sqlite3", profile)
+                try:
+                    self.run(alias, profile, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+    def configure(self, alias, path, profile):
+        """Register a scratch database alias that connects like `profile` would."""
+        settings_dict = {"ENGINE": "django.db.backends.sqlite3", "NAME": str(path),
+                         **settings.DATABASE_PROFILES.get(profile, {})}
+        connections.settings[alias] = connections.configure_settings({"default": settings_dict})["default"]
+        self.pragmas = {**SQLITE_DEFAULT_PRAGMAS, **settings.SQLITE_PROFILES[profile]}
+
+    def apply_pragmas(self, sender, connection, **kwargs):
+        # Runs after application.db.configure_sqlite_connection, overriding the active profile
+        if connection.alias.startswith("bench_"):
+            apply_sqlite_pragmas(connection, self.pragmas)
+
+    def run(self, alias, profile, options):
+        connection_created.connect(self.apply_pragmas)
+        try:
+            call_command("migrate", database=alias, verbosity=0)
+            member_ids, user_ids, app_id = self.generate(alias, options)
+            stats = self.stress(alias, member_ids, user_ids, app_id, options)
+        finally:
+            connection_created.disconnect(self.apply_pragmas)
+        self.report(profile, stats, options["duration"])
+
+    def generate(self, alias, options):
+        owner = User.objects.using(alias).create(username="bench-owner")
+        app = Application(user=owner, name="bench")
+        Application.objects.using(alias).bulk_create([app])  # bypasses the developer rule on purpose
+        role = Role(application=app, name="member")
+        Role.objects.using(alias).bulk_create([role])
+        users = User.objects.using(alias).bulk_create(
+            [User(username=f"bench-{i}", password="!") for i in range(options["members"])], batch_size=5000
+        )
+        members = ApplicationUser.objects.using(alias).bulk_create(
+            [ApplicationUser(application=app, user=user, role=role) for user in users], batch_size=5000
+        )
+        connections[alias].close()
+        return [member.pk for member in members], [user.pk for user in users], app.pk
+
+    def stress(self, alias, member_ids, user_ids, app_id, options):
+        deadline = time.monotonic() + options["duration"]
+        stats = {"read": [], "write": [], "errors": 0}
+        lock = threading.Lock()
+
+        def read(rng):
+            ApplicationUser.objects.using(alias).select_related("role").filter(
+                application_id=app_id, user_id=rng.choice(user_ids)
+            ).first()
+
+        def write(rng):
+            with transaction.atomic(using=alias):
+                ApplicationUser.objects.using(alias).filter(pk=rng.choice(member_ids)).update(
+                    data={"department": f"d{rng.randrange(100)}"}
+                )
+
+        def worker(kind, operation, seed):
+            rng = random.Random(seed)
+            timings, errors = [], 0
+            connection = connections[alias]
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(rng)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    except OperationalError:
+                        errors += 1
+                    # What request_finished does at the end of every request
+                    connection.close_if_unusable_or_obsolete()
+            finally:
+                connection.close()
+                with lock:
+                    stats[kind] += timings
+                    stats["errors"] += errors
+
+        threads = [
+            threading.Thread(target=worker, args=("read", read, options["seed"] + i))
+            for i in range(options["readers"])
+        ] + [
+            threading.Thread(target=worker, args=("write", write, options["seed"] + 1000 + i))
+            for i in range(options["writers"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return stats
+
+    def report(self, profile, stats, duration):
+        self.stdout.write(f"📌 {profile} ({', '.join(f'{k}={v}' for k, v in self.pragmas.items())})")
+        for kind in ("read", "write"):
+            timings = sorted(stats[kind])
+            if not timings:
+                self.stdout.write(f"   {kind}s: none completed")
+                continue
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"   {kind}s: {len(timings) / duration:.0f}/s, "
+                f"median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+            )
+        self.stdout.write(f"   lock errors: {stats['errors']}")
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from application.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies retention and compaction to the change feed. Entries older than the retention period are "
+        "deleted; clients whose cursor falls behind them get 410 Gone and reload. Older than the compaction "
+        "threshold, only the newest entry per object is kept, since entries carry the object's full state."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=float,
+                            default=getattr(settings, "CHANGELOG_RETENTION_DAYS", 7))
+        parser.add_argument("--compact-after-hours", type=float,
+                            default=getattr(settings, "CHANGELOG_COMPACT_AFTER_HOURS", 1))
+
+    def handle(self, *args, **options):
+        if options["retention_days"] < 0 or options["compact_after_hours"] < 0:
+            raise CommandError("--retention-days and --compact-after-hours must not be negative.")
+        self.stdout.write("📌 Compacting the change feed...")
+        now = timezone.now()
+        expired = self.apply_retention(now - timedelta(days=options["retention_days"]))
+        superseded = self.compact(now - timedelta(hours=options["compact_after_hours"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Removed {expired} expired and {superseded} superseded entries."
+        ))
+
+    def apply_retention(self, threshold):
+        """
+        Delete entries older than `threshold`, by id so the retained ones stay
+        a contiguous tail; the newest entry is always kept so the oldest id
+        keeps marking how far back cursors remain valid.
+        """
+        newest = ChangeLogEntry.objects.order_by("-pk").values_list("pk", flat=True).first()
+        if newest is None:
+            return 0
+        cutoff = (
+            ChangeLogEntry.objects.filter(created_ts__gte=threshold)
+            .order_by("pk").values_list("pk", flat=True).first()
+        )
+        deleted, _ = ChangeLogEntry.objects.filter(pk__lt=cutoff or newest).delete()
+        return deleted
+
+    def compact(self, threshold):
+        """
+        Delete entries older than `threshold` that a newer entry for the same
+        object supersedes. The oldest entry is left alone: it marks the
+        retention boundary (see apply_retention).
+        """
+        oldest = ChangeLogEntry.objects.order_by("pk").values_list("pk", flat=True).first()
+        if oldest is None:
+            return 0
+        newer = ChangeLogEntry.objects.filter(
+            application_id=OuterRef("application_id"), model=OuterRef("model"), pk__gt=OuterRef("pk"),
+        )
+        old = ChangeLogEntry.objects.filter(created_ts__lt=threshold, pk__gt=oldest)
+        deleted = 0
+        for candidates, newer_entries in (
+            (old.filter(object_id__isnull=False), newer.filter(object_id=OuterRef("object_id"))),
+            # Bulk entries (no object) supersede each other per application and model
+            (old.filter(object_id__isnull=True), newer.filter(object_id__isnull=True)),
+        ):
+            count, _ = candidates.filter(Exists(newer_entries)).delete()
+            deleted += count
+        return deleted
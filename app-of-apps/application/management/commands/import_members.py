@@ -0,0 +1,144 @@
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from application import sharding
+from application.models import Application, ApplicationUser, Role
+from application.signals import bulk_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams application members from CSV or JSONL (a file or stdin) into ApplicationUser. "
+        "Each row needs a `username` and a `role` name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("application", type=int, help="ID of the application to import into")
+        parser.add_argument("path", nargs="?", default="-", help="Input file, or '-' for stdin (default)")
+        parser.add_argument("--format", choices=("csv", "jsonl"), help="Input format (default: from extension, else csv)")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per transaction")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT statement")
+        parser.add_argument("--rejects", help="Write rejected rows with the reason to this JSONL file")
+
+    def handle(self, *args, **options):
+        try:
+            self.application = Application.objects.get(pk=options["application"])
+        except Application.DoesNotExist:
+            raise CommandError(f"Application {options['application']} does not exist.")
+        if options["chunk_size"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--chunk-size and --batch-size must be positive.")
+
+        self.batch_size = options["batch_size"]
+        self.role_ids = {}
+        self.imported = self.rejected = 0
+        self.rejects_file = open(options["rejects"], "w") if options["rejects"] else None
+        fmt = options["format"] or self.guess_format(options["path"])
+        source = sys.stdin if options["path"] == "-" else open(options["path"], newline="", encoding="utf-8")
+
+        self.stdout.write(f"📌 Importing members into {self.application.name}...")
+        started = time.monotonic()
+        try:
+            rows = self.read_rows(source, fmt)
+            while chunk := list(islice(rows, options["chunk_size"])):
+                self.import_chunk(chunk)
+                self.report(started)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if self.rejects_file:
+                self.rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Imported {self.imported} members, rejected {self.rejected} rows "
+            f"({self.rate(started):.0f} rows/s)."
+        ))
+
+    def guess_format(self, path):
+        return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+    def read_rows(self, source, fmt):
+        """Yield (line_number, row) pairs; rows that fail to parse are yielded as None."""
+        if fmt == "csv":
+            reader = csv.DictReader(source)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+    def import_chunk(self, chunk):
+        """Resolve a chunk of rows with one query per model and insert it in one transaction."""
+        rows = []
+        for line_number, row in chunk:
+            username = (row or {}).get("username")
+            role = (row or {}).get("role")
+            if not username or not role:
+                self.reject(line_number, row, "row needs a username and a role")
+            else:
+                rows.append((line_number, row, str(username).strip(), str(role).strip()))
+
+        user_ids = dict(User.objects.filter(username__in={r[2] for r in rows}).values_list("username", "pk"))
+        self.resolve_roles({r[3] for r in rows})
+        existing = set(
+            ApplicationUser.objects.filter(application=self.application, user_id__in=user_ids.values())
+            .values_list("user_id", flat=True)
+        )
+
+        members = []
+        for line_number, row, username, role in rows:
+            user_id = user_ids.get(username)
+            if user_id is None:
+                self.reject(line_number, row, f"unknown user {username!r}")
+            elif role not in self.role_ids:
+                self.reject(line_number, row, f"unknown role {role!r}")
+            elif user_id in existing:
+                self.reject(line_number, row, f"{username!r} is already a member")
+            else:
+                existing.add(user_id)  # also catches duplicates within the chunk
+                members.append(ApplicationUser(
+                    application=self.application, user_id=user_id, role_id=self.role_ids[role]
+                ))
+
+        if members:
+            with transaction.atomic(using=sharding.database_for(self.application.pk)):
+                ApplicationUser.objects.bulk_create(members, batch_size=self.batch_size)
+                bulk_changed.send(sender=ApplicationUser, application_ids={self.application.pk},
+                                  user_ids={member.user_id for member in members})
+        self.imported += len(members)
+
+    def resolve_roles(self, names):
+        """Look up role names not seen in earlier chunks."""
+        missing = names - self.role_ids.keys()
+        if missing:
+            self.role_ids.update(
+                Role.alive.filter(application=self.application, name__in=missing)
+                .values_list("name", "pk")
+            )
+
+    def reject(self, line_number, row, reason):
+        self.rejected += 1
+        if self.rejects_file:
+            self.rejects_file.write(json.dumps({"line": line_number, "row": row, "reason": reason}) + "\n")
+
+    def rate(self, started):
+        elapsed = time.monotonic() - started
+        return (self.imported + self.rejected) / elapsed if elapsed else 0.0
+
+    def report(self, started):
+        self.stdout.write(
+            f"   {self.imported + self.rejected} rows processed, {self.rejected} rejected "
+            f"({self.rate(started):.0f} rows/s)"
+        )
@@ -0,0 +1,219 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max, Min, Q
+
+from application import effective_permissions, sharding
+from application.models import (
+    Application, ApplicationShard, ApplicationUser, AppPermission, ChangeLogEntry, EffectivePermission, Role,
+    RoleClosure,
+)
+
+
+RolePermission = Role.permissions.through
+
+# Change log model names of the copied tables, parents first
+COPIED = {"permission": AppPermission, "role": Role, "role_permissions": RolePermission, "member": ApplicationUser}
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves an application's roles, permissions and members to another database of DATABASE_SHARDS "
+        "while it keeps serving: the rows are copied in batches, then writes to the application are "
+        "refused (503) while the changes made meanwhile are replayed from the change log, and the shard "
+        "map is flipped. Each step waits SHARD_MAP_TTL seconds for every process to see the map change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("application", type=int, help="ID of the application to move")
+        parser.add_argument("target", help="Database alias to move it to ('default' or one of DATABASE_SHARDS)")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per read and INSERT statement")
+        parser.add_argument("--keep-source", action="store_true", help="Leave the copied rows on the source database")
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError("Sharding is off: set DATABASE_SHARDS.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        self.application_id, target = options["application"], options["target"]
+        if not Application.objects.using(DEFAULT_DB_ALIAS).filter(pk=self.application_id).exists():
+            raise CommandError(f"Application {self.application_id} does not exist.")
+        if target not in sharding.shards():
+            raise CommandError(f"{target!r} is not 'default' or one of DATABASE_SHARDS.")
+        source, _ = sharding.shard_map.load(self.application_id)
+        if source == target:
+            raise CommandError(f"Application {self.application_id} is already on {target}.")
+        self.batch_size = options["batch_size"]
+
+        self.stdout.write(f"📌 Moving application {self.application_id} from {source} to {target}...")
+        started = time.monotonic()
+        cursor = ChangeLogEntry.objects.using(DEFAULT_DB_ALIAS).aggregate(head=Max("id"))["head"] or 0
+        self.purge(target)  # what an interrupted move left behind
+        copied = sum(self.copy(model, source, target) for model in COPIED.values())
+        self.rebuild(target, everything=True)
+        self.stdout.write(f"   copied {copied} rows online ({time.monotonic() - started:.1f}s)")
+
+        self.set_shard(source, locked=True)
+        try:
+            replayed = self.catch_up(source, target, cursor)
+        except BaseException:
+            self.set_shard(source, locked=False)
+            raise
+        self.set_shard(target, locked=False)
+        self.stdout.write(f"   replayed {replayed} changes while locked")
+        if not options["keep_source"]:
+            self.purge(source)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Moved application {self.application_id} to {target} ({time.monotonic() - started:.1f}s)."
+        ))
+
+    def set_shard(self, alias, locked):
+        """ Point the shard map at `alias`, then wait until every process has seen it """
+        ApplicationShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+            application_id=self.application_id, defaults={"alias": alias, "locked": locked}
+        )
+        sharding.shard_map.pop(self.application_id)
+        time.sleep(getattr(settings, "SHARD_MAP_TTL", 5))
+
+    def rows(self, model, using):
+        """ The application's rows of a copied or derived table """
+        if model in (RolePermission, RoleClosure):
+            lookup = "role__application_id" if model is RolePermission else "descendant__application_id"
+        else:
+            lookup = "application_id"
+        return model._base_manager.using(using).filter(**{lookup: self.application_id})
+
+    def copy(self, model, source, target, pks=None):
+        """
+        Upsert the application's rows of `model` (only `pks`, if given) from
+        source into target, a batch per statement in primary key order.
+        Rows pointing at roles or permissions target does not have yet were
+        written after the copy started, so they are left to catch_up().
+        Parent roles may come after their children, so parents are set last.
+        """
+        rows, objects = self.rows(model, source).order_by("pk"), model._base_manager.using(target)
+        if pks is not None:
+            rows = rows.filter(pk__in=pks)
+        fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        copied = {
+            field.attname: set(self.rows(field.related_model, target).values_list("pk", flat=True))
+            for field in model._meta.concrete_fields
+            if field.many_to_one and field.related_model in (Role, AppPermission) and field.related_model is not model
+        }
+        parents, count, last = {}, 0, None
+        while batch := list((rows if last is None else rows.filter(pk__gt=last))[:self.batch_size]):
+            last = batch[-1].pk
+            batch = [obj for obj in batch if all(getattr(obj, name) in known for name, known in copied.items())]
+            if model is Role:
+                parents.update((role.pk, role.parent_id) for role in batch if role.parent_id)
+                for role in batch:
+                    role.parent_id = None
+            objects.bulk_create(batch, update_conflicts=True, unique_fields=["pk"], update_fields=fields)
+            count += len(batch)
+        if parents:
+            present = set(objects.filter(pk__in=parents.values()).values_list("pk", flat=True))
+            objects.bulk_update(
+                [Role(pk=pk, parent_id=parent_id) for pk, parent_id in parents.items() if parent_id in present],
+                ["parent"], batch_size=self.batch_size,
+            )
+        return count
+
+    def delete(self, queryset):
+        """ Delete in batches, without signals or cascades: these are copies, not changes """
+        model, using = queryset.model, queryset.db
+        while pks := list(queryset.values_list("pk", flat=True)[:self.batch_size]):
+            model._base_manager.using(using).filter(pk__in=pks)._raw_delete(using)
+
+    def purge(self, alias):
+        """ Delete the application's rows from `alias`, children first """
+        self.delete(self.rows(EffectivePermission, alias))
+        self.delete(self.rows(RoleClosure, alias))
+        self.delete(self.rows(RolePermission, alias))
+        self.delete(self.rows(ApplicationUser, alias))
+        self.rows(Role, alias).update(parent=None)
+        self.delete(self.rows(Role, alias))
+        self.delete(self.rows(AppPermission, alias))
+
+    def catch_up(self, source, target, cursor):
+        """
+        Replay onto target the changes logged since `cursor`, with writes to
+        the application refused. Set-based changes, or entries lost to
+        retention, resync the whole table. Returns the number of entries.
+        """
+        entries = ChangeLogEntry.objects.using(DEFAULT_DB_ALIAS).filter(
+            application_id=self.application_id, id__gt=cursor
+        )
+        changed, everything = {name: set() for name in COPIED}, set()
+        for name, object_id in entries.values_list("model", "object_id"):
+            if name not in COPIED:
+                continue
+            if object_id is None:
+                everything.add(name)
+            else:
+                changed[name].add(object_id)
+        oldest = ChangeLogEntry.objects.using(DEFAULT_DB_ALIAS).aggregate(oldest=Min("id"))["oldest"]
+        if oldest is not None and cursor < oldest - 1:
+            everything = set(COPIED)  # compacted away: the log no longer says what changed
+        # Grants of every member may have changed, unless only members did
+        refresh_all = "member" in everything or any(
+            changed[name] or name in everything for name in COPIED if name != "member"
+        )
+
+        # Members before and after, whose effective permissions need refreshing
+        user_ids = {
+            user_id for alias in (source, target) for user_id in
+            ApplicationUser._base_manager.using(alias).filter(pk__in=changed["member"]).values_list("user_id", flat=True)
+        }
+        for name, model in reversed(COPIED.items()):  # children first
+            if name == "role_permissions" and name not in everything:
+                self.delete(self.rows(model, target).filter(role_id__in=changed[name]))
+            elif name in everything:
+                self.delete_missing(model, source, target)
+            else:
+                present = set(self.rows(model, source).filter(pk__in=changed[name]).values_list("pk", flat=True))
+                self.delete_rows(model, target, changed[name] - present)
+        for name, model in COPIED.items():  # parents first
+            if name in everything:
+                self.copy(model, source, target)
+            elif name == "role_permissions":
+                self.copy(model, source, target, self.rows(model, source).filter(role_id__in=changed[name]).values("pk"))
+            else:
+                self.copy(model, source, target, changed[name])
+
+        self.rebuild(target, everything=refresh_all, user_ids=user_ids)
+        return entries.count()
+
+    def delete_missing(self, model, source, target):
+        """ Delete from target the application's rows of `model` that source no longer has """
+        rows, last = self.rows(model, target).order_by("pk").values_list("pk", flat=True), None
+        while pks := list((rows if last is None else rows.filter(pk__gt=last))[:self.batch_size]):
+            present = set(self.rows(model, source).filter(pk__in=pks).values_list("pk", flat=True))
+            self.delete_rows(model, target, set(pks) - present)
+            last = pks[-1]
+
+    def delete_rows(self, model, alias, pks):
+        """ Delete rows of a copied table from alias, with the rows pointing at them """
+        if not pks:
+            return
+        objects = model._base_manager.using(alias)
+        if model is Role:
+            self.delete(RoleClosure._base_manager.using(alias).filter(Q(ancestor_id__in=pks) | Q(descendant_id__in=pks)))
+            self.delete(RolePermission._base_manager.using(alias).filter(role_id__in=pks))
+            objects.filter(parent_id__in=pks).update(parent=None)  # children are re-parented by the copy
+        elif model is AppPermission:
+            self.delete(EffectivePermission._base_manager.using(alias).filter(permission_id__in=pks))
+            self.delete(RolePermission._base_manager.using(alias).filter(apppermission_id__in=pks))
+        self.delete(objects.filter(pk__in=pks))
+
+    def rebuild(self, alias, everything, user_ids=()):
+        """ Recompute the derived tables and role masks on `alias` from the copied rows """
+        with transaction.atomic(using=alias):
+            RoleClosure.rebuild([self.application_id], using=alias)
+            Role.recompute_permission_masks(list(self.rows(Role, alias).values_list("pk", flat=True)), using=alias)
+        if everything:
+            effective_permissions.refresh_application(self.application_id, using=alias)
+        else:
+            effective_permissions.refresh(self.application_id, user_ids, using=alias)
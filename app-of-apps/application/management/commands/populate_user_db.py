@@ -1,13 +1,54 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from application import bulk, sharding
 from application.models import Application, Role, AppPermission, ApplicationUser
+from application.signals import bulk_changed
 
 
-class Command(BaseCommand):
-    help = "Populates the database with initial test data"
+SYNTHETIC_PASSWORD = "synthetic"
+
+
+def hash_passwords(passwords):
+    """Process-pool worker: hash a list of raw passwords."""
+    return [make_password(password) for password in passwords]
 
-    def handle(self, *args, **kwargs):
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        "Populates the database with initial test data and, optionally, a deterministic synthetic "
+        "dataset of any size. Safe to run again: existing rows are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--apps", type=int, default=0, help="Synthetic applications to generate")
+        parser.add_argument("--users", type=int, default=0, help="Synthetic users to generate")
+        parser.add_argument("--roles-per-app", type=int, default=5)
+        parser.add_argument("--perms-per-app", type=int, default=20)
+        parser.add_argument("--members-per-app", type=int, default=100,
+                            help="Members per synthetic application, sampled from the synthetic users")
+        parser.add_argument("--seed", type=int, default=0, help="Same seed, same dataset")
+        parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows per transaction")
+        parser.add_argument("--workers", type=int, default=0, help="Processes hashing passwords (0: in-process)")
+        parser.add_argument("--fast-hash", action="store_true",
+                            help=f"Hash the shared password {SYNTHETIC_PASSWORD!r} once and reuse it for every user")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
         self.stdout.write("📌 Populating database...")
 
         # Create Users
@@ -29,15 +70,26 @@ class Command(BaseCommand):
         # Assign Users to Roles
         self.assign_users_to_roles(app, normal_user, admin_user, developer_user, admin_role, viewer_role)
 
+        # Synthetic dataset
+        if options["users"] or options["apps"]:
+            self.generate(developer_user, options)
+
         self.stdout.write(self.style.SUCCESS("✅ Database population completed!"))
 
     def create_users(self):
         """Create and return test users."""
-        normal_user = User.objects.create_user(username="normal", email="normal@example.com", password="normalpass")
-        admin_user = User.objects.create_superuser(username="admin", email="admin@example.com", password="adminpass")
-        developer_user = User.objects.create_user(username="developer", email="developer@example.com", password="devpass")
+        normal_user = self.get_or_create_user(username="normal", email="normal@example.com", password="normalpass")
+        admin_user = self.get_or_create_user(username="admin", email="admin@example.com", password="adminpass",
+                                             is_staff=True, is_superuser=True)
+        developer_user = self.get_or_create_user(username="developer", email="developer@example.com", password="devpass")
         return normal_user, admin_user, developer_user
 
+    def get_or_create_user(self, username, email, password, **extra_fields):
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            user = User.objects.create_user(username=username, email=email, password=password, **extra_fields)
+        return user
+
     def create_group_with_permissions(self, group_name, models):
         """Create a group and assign CRUD permissions on the given models."""
         group, _ = Group.objects.get_or_create(name=group_name)
@@ -49,22 +101,31 @@ class Command(BaseCommand):
 
     def create_application(self, user):
         """Create an application assigned to a user."""
-        return Application.objects.create(user=user, name="FinanceApp", description="Manage financial data")
+        app, _ = Application.objects.get_or_create(
+            user=user, name="FinanceApp", defaults={"description": "Manage financial data"}
+        )
+        return app
 
     def create_permissions(self, app):
         """Create and return custom application permissions."""
-        create_perm = AppPermission.objects.create(
-            application=app, name="Can Create Financial Reports", description="Allowed to add financial data"
+        create_perm, _ = AppPermission.objects.get_or_create(
+            application=app, name="Can Create Financial Reports",
+            defaults={"description": "Allowed to add financial data"},
         )
-        view_perm = AppPermission.objects.create(
-            application=app, name="Can View Financial Reports", description="Allowed to view financial data"
+        view_perm, _ = AppPermission.objects.get_or_create(
+            application=app, name="Can View Financial Reports",
+            defaults={"description": "Allowed to view financial data"},
         )
         return create_perm, view_perm
 
     def create_roles(self, app, create_perm, view_perm):
         """Create roles and assign permissions."""
-        admin_role = Role.objects.create(application=app, name="Admin", description="Full access to the application")
-        viewer_role = Role.objects.create(application=app, name="Viewer", description="Can view financial data")
+        admin_role, _ = Role.objects.get_or_create(
+            application=app, name="Admin", defaults={"description": "Full access to the application"}
+        )
+        viewer_role, _ = Role.objects.get_or_create(
+            application=app, name="Viewer", defaults={"description": "Can view financial data"}
+        )
 
         # Assign Permissions
         admin_role.permissions.add(create_perm, view_perm)
@@ -74,6 +135,121 @@ class Command(BaseCommand):
 
     def assign_users_to_roles(self, app, normal_user, admin_user, developer_user, admin_role, viewer_role):
         """Assign users to their respective roles."""
-        ApplicationUser.objects.create(application=app, user=normal_user, role=viewer_role)
-        ApplicationUser.objects.create(application=app, user=admin_user, role=admin_role)
-        ApplicationUser.objects.create(application=app, user=developer_user, role=viewer_role)
+        ApplicationUser.objects.get_or_create(application=app, user=normal_user, defaults={"role": viewer_role})
+        ApplicationUser.objects.get_or_create(application=app, user=admin_user, defaults={"role": admin_role})
+        ApplicationUser.objects.get_or_create(application=app, user=developer_user, defaults={"role": viewer_role})
+
+    # Synthetic dataset
+
+    def generate(self, owner, options):
+        """
+        Generate `--users` users and `--apps` applications owned by `owner`.
+        Names derive from the seed and every random choice from a per-object
+        RNG, so reruns (or larger reruns) only add what is missing.
+        """
+        self.prefix = f"synth{options['seed']}"
+        self.seed = options["seed"]
+        self.chunk_size = options["chunk_size"]
+        started = time.monotonic()
+
+        user_ids = self.generate_users(options)
+        self.stdout.write(f"   users: {len(user_ids)} ({time.monotonic() - started:.1f}s)")
+        apps = self.generate_applications(owner, options["apps"])
+        for index, app in enumerate(apps, start=1):
+            self.generate_application_data(app, user_ids, options)
+            if index % 100 == 0 or index == len(apps):
+                self.stdout.write(f"   applications: {index}/{len(apps)} ({time.monotonic() - started:.1f}s)")
+
+    def generate_users(self, options):
+        """Create missing synthetic users chunk by chunk; return their ids in generation order."""
+        names = [f"{self.prefix}-user-{i}" for i in range(options["users"])]
+        shared_hash = make_password(SYNTHETIC_PASSWORD) if options["fast_hash"] else None
+        pool = None
+        if options["workers"] and not options["fast_hash"]:
+            pool = ProcessPoolExecutor(options["workers"], initializer=django.setup)
+        try:
+            for chunk in chunked(names, self.chunk_size):
+                existing = set(User.objects.filter(username__in=chunk).values_list("username", flat=True))
+                missing = [name for name in chunk if name not in existing]
+                if not missing:
+                    continue
+                if shared_hash is not None:
+                    hashes = [shared_hash] * len(missing)
+                elif pool is not None:
+                    parts = list(chunked([SYNTHETIC_PASSWORD] * len(missing), -(-len(missing) // options["workers"])))
+                    hashes = [hashed for part in pool.map(hash_passwords, parts) for hashed in part]
+                else:
+                    hashes = hash_passwords([SYNTHETIC_PASSWORD] * len(missing))
+                with transaction.atomic():
+                    User.objects.bulk_create(
+                        [User(username=name, email=f"{name}@example.com", password=hashed)
+                         for name, hashed in zip(missing, hashes)],
+                        ignore_conflicts=True,
+                    )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        ids = {}
+        for chunk in chunked(names, self.chunk_size):
+            ids.update(User.objects.filter(username__in=chunk).values_list("username", "pk"))
+        return [ids[name] for name in names]
+
+    def generate_applications(self, owner, count):
+        names = [f"{self.prefix}-app-{i}" for i in range(count)]
+        existing = set(Application.objects.filter(user=owner, name__in=names).values_list("name", flat=True))
+        bulk.bulk_create(
+            Application,
+            [Application(user=owner, name=name, description="Synthetic application")
+             for name in names if name not in existing],
+            batch_size=self.chunk_size,
+        )
+        apps = {app.name: app for app in Application.objects.filter(user=owner, name__in=names)}
+        return [apps[name] for name in names]
+
+    def generate_application_data(self, app, user_ids, options):
+        rng = random.Random(f"{self.seed}:{app.name}")
+        perms = self.get_or_create_named(
+            AppPermission, app, [f"perm-{i}" for i in range(options["perms_per_app"])]
+        )
+        roles, new_roles = self.get_or_create_named(
+            Role, app, [f"role-{i}" for i in range(options["roles_per_app"])], return_created=True
+        )
+
+        # Draw for every role, so a rerun makes the same choices for the new ones
+        grants = {role.pk: rng.sample(perms, rng.randint(1, len(perms))) if perms else [] for role in roles}
+        links = [
+            Role.permissions.through(role_id=role.pk, apppermission_id=perm.pk)
+            for role in new_roles for perm in grants[role.pk]
+        ]
+        if links:
+            using = sharding.database_for(app.pk)
+            Role.permissions.through.objects.using(using).bulk_create(
+                links, batch_size=self.chunk_size, ignore_conflicts=True
+            )
+            Role.recompute_permission_masks([role.pk for role in new_roles], using=using)
+            # The join rows bypass m2m_changed: changelog, revision, caches and members as for any bulk write
+            bulk_changed.send(sender=Role, application_ids={app.pk})
+
+        if not roles or not user_ids:
+            return
+        members = rng.sample(user_ids, min(options["members_per_app"], len(user_ids)))
+        role_ids = [rng.choice(roles).pk for _ in members]
+        existing = set(ApplicationUser.objects.filter(application=app).values_list("user_id", flat=True))
+        rows = [
+            ApplicationUser(application=app, user_id=user_id, role_id=role_id)
+            for user_id, role_id in zip(members, role_ids) if user_id not in existing
+        ]
+        for chunk in chunked(rows, self.chunk_size):
+            bulk.bulk_create(ApplicationUser, chunk)
+
+    def get_or_create_named(self, model, app, names, return_created=False):
+        """Rows of `model` in `app` with the given names, in order, creating the missing ones in bulk."""
+        existing = {obj.name: obj for obj in model.objects.filter(application=app, name__in=names)}
+        created = bulk.bulk_create(
+            model, [model(application=app, name=name) for name in names if name not in existing],
+            batch_size=self.chunk_size,
+        )
+        existing.update((obj.name, obj) for obj in created)
+        rows = [existing[name] for name in names]
+        return (rows, created) if return_created else rows
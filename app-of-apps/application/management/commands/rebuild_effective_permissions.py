@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from application import effective_permissions, sharding
+from application.models import Application
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifies the materialized EffectivePermission table against the permission model and repairs it, "
+        "a chunk of users per transaction, writing only missing and stale rows. Signals keep the table "
+        "current; run this after restoring a backup, loading fixtures or writing past the ORM."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--application", type=int, action="append", dest="applications",
+                            help="Application id (repeatable; default: all)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Users per transaction")
+        parser.add_argument("--verify", action="store_true",
+                            help="Only count missing and stale rows, and fail if there are any")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        application_ids = options["applications"] or Application.objects.order_by("pk").values_list("pk", flat=True)
+        self.stdout.write(f"📌 {'Verifying' if options['verify'] else 'Rebuilding'} effective permissions...")
+        missing = stale = 0
+        for application_id in application_ids:
+            using = sharding.database_for(application_id)
+            for user_ids in effective_permissions.user_chunks(application_id, options["chunk_size"], using=using):
+                with transaction.atomic(using=using):
+                    added, removed = effective_permissions.refresh(
+                        application_id, user_ids, dry_run=options["verify"], using=using
+                    )
+                missing, stale = missing + added, stale + removed
+        if options["verify"] and (missing or stale):
+            raise CommandError(f"{missing} missing and {stale} stale rows.")
+        verb = "Found" if options["verify"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"✅ {verb} {missing} missing and {stale} stale rows."))
@@ -0,0 +1,58 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from application.models import ReplicaHeartbeat
+
+
+class Command(BaseCommand):
+    help = (
+        "Replication stub for local read replicas: stamps the heartbeat on the primary, then copies the "
+        "primary SQLite database onto each replica with SQLite's online backup API. Replicas then lag by "
+        "at most --interval seconds plus the copy time. Real deployments use their database's replication "
+        "and only need the heartbeat (run with --heartbeat-only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--replica", action="append", dest="replicas",
+                            help="Replica alias (repeatable; default: DATABASE_REPLICAS)")
+        parser.add_argument("--interval", type=float, default=0,
+                            help="Repeat every this many seconds until interrupted (default: once)")
+        parser.add_argument("--heartbeat-only", action="store_true", help="Only stamp the heartbeat")
+
+    def handle(self, *args, **options):
+        replicas = options["replicas"] or list(getattr(settings, "DATABASE_REPLICAS", ()))
+        for alias in replicas:
+            if alias == DEFAULT_DB_ALIAS or alias not in connections.settings:
+                raise CommandError(f"{alias!r} is not a replica database alias.")
+        if not options["heartbeat_only"]:
+            if not replicas:
+                raise CommandError("No replicas: set DATABASE_REPLICAS or pass --replica.")
+            for alias in [DEFAULT_DB_ALIAS, *replicas]:
+                if connections[alias].vendor != "sqlite":
+                    raise CommandError(f"{alias} is not SQLite; use the database's own replication.")
+        if options["interval"] < 0:
+            raise CommandError("--interval must not be negative.")
+
+        self.stdout.write(f"📌 Replicating to {', '.join(replicas) or 'no replica (heartbeat only)'}...")
+        while True:
+            started = time.monotonic()
+            ReplicaHeartbeat.beat()
+            if not options["heartbeat_only"]:
+                for alias in replicas:
+                    self.copy(alias)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Replicated in {(time.monotonic() - started) * 1000:.0f} ms."
+            ))
+            if not options["interval"]:
+                return
+            time.sleep(max(0.0, options["interval"] - (time.monotonic() - started)))
+
+    def copy(self, alias):
+        """ Online copy of the primary onto the replica; readers of the replica wait for it to finish """
+        source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+        source.ensure_connection()
+        target.ensure_connection()
+        source.connection.backup(target.connection)
@@ -0,0 +1,66 @@
+"""
+Application manifests: the live roles, permissions and role -> permission
+matrix of an application, served by GET /api/applications/<id>/manifest/.
+
+A manifest is serialized once per Application.revision and kept in
+`manifest_cache`, so revalidating with If-None-Match answers 304 without a
+query. Signals drop the entry on writes in this process; other processes'
+writes are noticed within MANIFEST_CACHE_TTL seconds, when the entry's
+revision is checked against the database again (one query, and the body is
+reused if the revision has not moved).
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from application.caching import LRUCache
+from application.models import AppPermission, Role
+from application.serializers import AppPermissionSerializer, RoleSerializer
+
+
+class Manifest:
+    __slots__ = ("application_id", "user_id", "revision", "etag", "body", "checked_at")
+
+    def __init__(self, application_id, user_id, revision, body, checked_at=None):
+        self.application_id = application_id
+        self.user_id = user_id  # owner, so cached hits can be authorized without a query
+        self.revision = revision
+        self.etag = f'"{application_id}.{revision}"'
+        self.body = body
+        self.checked_at = time.monotonic() if checked_at is None else checked_at
+
+    def is_fresh(self):
+        return time.monotonic() - self.checked_at < getattr(settings, "MANIFEST_CACHE_TTL", 5)
+
+    def revalidated(self, application):
+        """ This manifest, checked against a freshly loaded Application; None if out of date """
+        if application.revision != self.revision:
+            return None
+        return Manifest(self.application_id, application.user_id, self.revision, self.body)
+
+
+manifest_cache = LRUCache(getattr(settings, "MANIFEST_CACHE_SIZE", 1000))
+
+
+async def abuild_manifest(application):
+    """
+    Serialize the manifest of an already loaded Application in three queries.
+    The application row (and so its revision) must be read first: content
+    read afterwards is at least that revision, never older.
+    """
+    roles = Role.alive.filter(application=application).order_by("pk").prefetch_related(
+        Prefetch("permissions", AppPermission.alive.order_by("pk"))
+    )
+    permissions = AppPermission.alive.filter(application=application).order_by("pk")
+    data = {
+        "application": application.pk,
+        "name": application.name,
+        "revision": application.revision,
+        "permissions": AppPermissionSerializer([p async for p in permissions], many=True).data,
+        "roles": RoleSerializer([r async for r in roles], many=True).data,
+    }
+    body = json.dumps(data, cls=DjangoJSONEncoder).encode()
+    return Manifest(application.pk, application.user_id, application.revision, body)
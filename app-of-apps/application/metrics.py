@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from application.authentication import api_key_cache
+from application.blacklist import blacklist_filter
+from application.hashers import hashing_pool_stats
+from application.permissions import permission_cache
+from application.throttling import throttle_counts
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNRESOLVED_VIEW = "<unresolved>"  # 404s and the like, so URLs never become label values
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """ SQL statistics of the request being served, filled in by sql_metrics_wrapper """
+    __slots__ = ("queries", "sql_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+
+    def repeated_statements(self, threshold):
+        return [(sql, count) for sql, count in self.statements.items() if count >= threshold]
+
+
+def sql_metrics_wrapper(execute, sql, params, many, context):
+    """ connection.execute_wrapper that times statements run while a request is being measured """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.sql_seconds += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] += 1  # placeholders keep the text identical across parameters
+
+
+def install_sql_metrics(sender, connection, **kwargs):
+    """ connection_created receiver; wrappers outlive reconnects, so only add it once """
+    if sql_metrics_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_metrics_wrapper)
+
+
+def start_request():
+    """ Begin collecting SQL metrics for the current context; returns (metrics, reset token) """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics, per resolved URL name, rendered in the
+    Prometheus text format. Each worker process keeps its own registry, so
+    scrape every worker (or run a single ASGI process).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, n_plus_one_threshold=10):
+        self.buckets = tuple(buckets)
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.collectors = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()
+            self.latency = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+            self.latency_sum = defaultdict(float)
+            self.queries = Counter()
+            self.sql_seconds = defaultdict(float)
+            self.n_plus_one = Counter()
+            self._reported = set()
+
+    def register(self, collector):
+        """
+        Add a callable returning (name, type, help, samples) tuples, where
+        samples is a list of (labels dict, value), rendered on every scrape.
+        """
+        self.collectors.append(collector)
+        return collector
+
+    def observe(self, view, method, status, seconds, metrics):
+        repeated = metrics.repeated_statements(self.n_plus_one_threshold)
+        with self._lock:
+            self.requests[view, method, status] += 1
+            self.latency[view][bisect_left(self.buckets, seconds)] += 1
+            self.latency_sum[view] += seconds
+            self.queries[view] += metrics.queries
+            self.sql_seconds[view] += metrics.sql_seconds
+            if repeated:
+                self.n_plus_one[view] += 1
+                new = [(sql, count) for sql, count in repeated if (view, sql) not in self._reported]
+                if len(self._reported) < 10000:
+                    self._reported.update((view, sql) for sql, _ in new)
+            else:
+                new = []
+        for sql, count in new:
+            logger.warning("Possible N+1 in %s: statement ran %d times in one request: %s", view, count, sql[:500])
+
+    def render(self):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            family("app_http_requests_total", "counter", "Requests by URL name, method and status.")
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f"app_http_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+            family("app_http_request_duration_seconds", "histogram", "Request latency by URL name.")
+            for view, counts in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f"app_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {cumulative}")
+                lines.append(f"app_http_request_duration_seconds_sum{_labels(view=view)} {self.latency_sum[view]}")
+                lines.append(f"app_http_request_duration_seconds_count{_labels(view=view)} {cumulative}")
+
+            family("app_db_queries_total", "counter", "SQL statements executed while serving requests.")
+            for view, count in sorted(self.queries.items()):
+                lines.append(f"app_db_queries_total{_labels(view=view)} {count}")
+
+            family("app_db_query_seconds_total", "counter", "Time spent in SQL while serving requests.")
+            for view, seconds in sorted(self.sql_seconds.items()):
+                lines.append(f"app_db_query_seconds_total{_labels(view=view)} {seconds}")
+
+            family("app_n_plus_one_requests_total", "counter",
+                   "Requests that repeated one SQL statement at least the N+1 threshold.")
+            for view, count in sorted(self.n_plus_one.items()):
+                lines.append(f"app_n_plus_one_requests_total{_labels(view=view)} {count}")
+
+        for collector in self.collectors:
+            for name, kind, help_text, samples in collector():
+                family(name, kind, help_text)
+                lines.extend(f"{name}{_labels(**labels) if labels else ''} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(
+    buckets=getattr(settings, "METRICS_LATENCY_BUCKETS", LATENCY_BUCKETS),
+    n_plus_one_threshold=getattr(settings, "METRICS_N_PLUS_ONE_THRESHOLD", 10),
+)
+
+
+@registry.register
+def cache_metrics():
+    caches = {"permissions": permission_cache.stats(), **{
+        f"api_key_{kind}": stats for kind, stats in api_key_cache.stats().items()
+    }}
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        name = f"app_cache_{field}_total" if kind == "counter" else f"app_cache_{field}"
+        yield name, kind, f"In-process cache {field}.", [
+            ({"cache": cache}, stats[field]) for cache, stats in caches.items()
+        ]
+
+
+@registry.register
+def hashing_pool_metrics():
+    stats = hashing_pool_stats()
+    if stats is None:
+        return
+    yield "app_password_hashing_in_flight", "gauge", "Password hashes running or queued.", [({}, stats["in_flight"])]
+    yield "app_password_hashing_completed_total", "counter", "Password hashes completed.", [({}, stats["completed"])]
+    yield "app_password_hashing_rejected_total", "counter", "Password hashes rejected with 503 because the pool was full.", [
+        ({}, stats["rejected"])
+    ]
+
+
+@registry.register
+def blacklist_filter_metrics():
+    stats = blacklist_filter.stats()
+    for name, kind, help_text, key in (
+        ("filter_bytes", "gauge", "Memory of the blacklisted-jti Bloom filter.", "bytes"),
+        ("filter_entries", "gauge", "Jtis in the blacklisted-jti Bloom filter.", "entries"),
+        ("filter_estimated_false_positive_ratio", "gauge",
+         "Expected false-positive rate of the filter at its current fill.", "estimated_false_positive_rate"),
+        ("checks_total", "counter", "Refresh tokens checked against the blacklist.", "checks"),
+        ("database_checks_total", "counter",
+         "Blacklist checks the filter could not rule out, which queried the database.", "database_checks"),
+        ("false_positives_total", "counter",
+         "Database checks that found the token was not blacklisted.", "false_positives"),
+    ):
+        yield f"app_token_blacklist_{name}", kind, help_text, [({}, stats[key])]
+
+
+@registry.register
+def throttle_metrics():
+    allowed, rejected = throttle_counts.snapshot()
+    yield "app_throttle_allowed_total", "counter", "API-key requests let through by the rate limit.", [
+        ({"application": application_id}, count) for application_id, count in sorted(allowed.items())
+    ]
+    yield "app_throttle_rejected_total", "counter", "API-key requests rejected with 429 by the rate limit.", [
+        ({"application": application_id}, count) for application_id, count in sorted(rejected.items())
+    ]
@@ -0,0 +1,203 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, common, csrf, security
+from django.utils.deprecation import MiddlewareMixin
+from whitenoise import middleware as whitenoise
+
+from application import metrics, routers
+from application.hashers import HashingOverloaded
+
+
+class InlineAsyncMixin:
+    """
+    In async mode, Django's MiddlewareMixin runs every process_request and
+    process_response through sync_to_async(thread_sensitive=True): two hops
+    per middleware per request, all onto one shared thread. This mixin calls
+    them directly on the event loop instead. Only use it for hooks that do no
+    blocking I/O, and return True from needs_thread() for the cases that do.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.async_mode and self.inline and hasattr(self, "process_view"):
+            # load_middleware() adapts process_view after __init__; a coroutine
+            # function is used as-is instead of being wrapped in sync_to_async.
+            process_view = self.process_view
+
+            async def aprocess_view(request, view_func, view_args, view_kwargs):
+                return process_view(request, view_func, view_args, view_kwargs)
+
+            self.process_view = aprocess_view
+
+    @property
+    def inline(self):
+        return True
+
+    def needs_thread(self, request, response):
+        return False
+
+    async def __acall__(self, request):
+        if not self.inline:
+            return await super().__acall__(request)
+        response = None
+        if hasattr(self, "process_request"):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, "process_response"):
+            if self.needs_thread(request, response):
+                response = await sync_to_async(self.process_response, thread_sensitive=True)(request, response)
+            else:
+                response = self.process_response(request, response)
+        return response
+
+
+class SecurityMiddleware(InlineAsyncMixin, security.SecurityMiddleware):
+    pass
+
+
+class SessionMiddleware(InlineAsyncMixin, sessions.SessionMiddleware):
+    """ The session is loaded lazily; only saving it touches the database """
+
+    def needs_thread(self, request, response):
+        session = getattr(request, "session", None)
+        return session is not None and (session.modified or settings.SESSION_SAVE_EVERY_REQUEST)
+
+
+class CommonMiddleware(InlineAsyncMixin, common.CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(InlineAsyncMixin, csrf.CsrfViewMiddleware):
+    """ Inline only while the CSRF secret lives in a cookie rather than the session """
+
+    @property
+    def inline(self):
+        return not settings.CSRF_USE_SESSIONS
+
+
+class AuthenticationMiddleware(InlineAsyncMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(InlineAsyncMixin, messages.MessageMiddleware):
+    """ Storing messages may fall back to the session, so only that goes to a thread """
+
+    def needs_thread(self, request, response):
+        storage = getattr(request, "_messages", None)
+        return storage is not None and (storage.used or storage.added_new)
+
+
+class XFrameOptionsMiddleware(InlineAsyncMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
+
+
+class ReplicaPinningMiddleware(InlineAsyncMixin, MiddlewareMixin):
+    """
+    Scopes application.routers' read-your-writes state to the request: reads
+    go to the primary once the request wrote, and for REPLICA_MAX_LAG seconds
+    after, for clients that send back the pin cookie.
+    """
+
+    def process_request(self, request):
+        cookie = getattr(settings, "REPLICA_PIN_COOKIE", "db_pin")
+        request._replica_token = routers.start_request(pinned=cookie in request.COOKIES)
+
+    def process_response(self, request, response):
+        token = getattr(request, "_replica_token", None)
+        if token is not None and routers.finish_request(token):
+            response.set_cookie(
+                getattr(settings, "REPLICA_PIN_COOKIE", "db_pin"), "1",
+                max_age=getattr(settings, "REPLICA_MAX_LAG", 5), httponly=True, samesite="Lax",
+            )
+        return response
+
+
+class HashingOverloadedMiddleware(InlineAsyncMixin, MiddlewareMixin):
+    """
+    Answers 503 when a full hashing pool rejects a login outside DRF (the
+    admin and allauth login views); DRF views turn HashingOverloaded into a
+    503 themselves.
+    """
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingOverloaded):
+            return HttpResponse(str(exception.detail), status=exception.status_code, content_type="text/plain")
+        return None
+
+
+class WhiteNoiseMiddleware(whitenoise.WhiteNoiseMiddleware):
+    """
+    WhiteNoise is sync-only, which would put every ASGI request on a thread.
+    Non-static requests pass straight through on the event loop; only static
+    hits (and autorefresh lookups) touch the filesystem in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and SQL time per resolved URL name into
+    application.metrics.registry (served at /metrics). Goes first in
+    MIDDLEWARE so the whole stack is timed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        collected, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, time.perf_counter() - started, collected)
+        return response
+
+    async def __acall__(self, request):
+        collected, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, time.perf_counter() - started, collected)
+        return response
+
+    def record(self, request, response, seconds, collected):
+        view = getattr(request.resolver_match, "view_name", None) or metrics.UNRESOLVED_VIEW
+        metrics.registry.observe(view, request.method, response.status_code, seconds, collected)
@@ -0,0 +1,38 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_api_key_digests(apps, schema_editor):
+    Application = apps.get_model("application", "Application")
+    manager = Application.objects.db_manager(schema_editor.connection.alias)
+    last_pk = 0
+    while True:
+        batch = list(manager.filter(pk__gt=last_pk).order_by("pk").only("pk", "API_KEY")[:1000])
+        if not batch:
+            break
+        for app in batch:
+            app.API_KEY_DIGEST = hashlib.sha256(app.API_KEY.encode()).hexdigest()
+        manager.bulk_update(batch, ["API_KEY_DIGEST"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0002_rename_permission_apppermission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="API_KEY_DIGEST",
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_api_key_digests, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="application",
+            name="API_KEY_DIGEST",
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
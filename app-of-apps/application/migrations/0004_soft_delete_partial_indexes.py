@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0003_application_api_key_digest"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="applicationuser",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application"],
+                name="appuser_app_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apppermission",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application"],
+                name="appperm_app_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="role",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application"],
+                name="role_app_alive_idx",
+            ),
+        ),
+    ]
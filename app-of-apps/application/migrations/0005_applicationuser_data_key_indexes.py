@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:51
+
+import application.data_keys
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0004_soft_delete_partial_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="applicationuser",
+            index=models.Index(
+                models.F("application"),
+                application.data_keys.DataKey("data", "department"),
+                name="appuser_data_department_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="applicationuser",
+            index=models.Index(
+                models.F("application"),
+                application.data_keys.DataKey("data", "region"),
+                name="appuser_data_region_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="applicationuser",
+            index=models.Index(
+                models.F("application"),
+                application.data_keys.DataKey("data", "external_id"),
+                name="appuser_data_external_id_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0005_applicationuser_data_key_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="applicationuser",
+            name="appuser_app_alive_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="apppermission",
+            name="appperm_app_alive_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="role",
+            name="role_app_alive_idx",
+        ),
+        migrations.AddIndex(
+            model_name="applicationuser",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application", "created_ts", "id"],
+                name="appuser_app_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="apppermission",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application", "created_ts", "id"],
+                name="appperm_app_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="role",
+            index=models.Index(
+                condition=models.Q(("deleted_ts__isnull", True)),
+                fields=["application", "created_ts", "id"],
+                name="role_app_alive_idx",
+            ),
+        ),
+    ]
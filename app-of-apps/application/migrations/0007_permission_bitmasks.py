@@ -0,0 +1,59 @@
+import application.fields
+from django.db import migrations, models
+
+
+def backfill_bitmasks(apps, schema_editor):
+    """Number each application's permissions in creation order, then OR them into role masks."""
+    alias = schema_editor.connection.alias
+    AppPermission = apps.get_model("application", "AppPermission")
+    Role = apps.get_model("application", "Role")
+    RolePermission = Role.permissions.through
+
+    bits = {}
+    next_bit = {}
+    permissions = AppPermission.objects.using(alias).order_by("application_id", "pk")
+    for permission in permissions.only("pk", "application_id"):
+        bits[permission.pk] = next_bit.get(permission.application_id, 0)
+        next_bit[permission.application_id] = bits[permission.pk] + 1
+    AppPermission.objects.using(alias).bulk_update(
+        [AppPermission(pk=pk, bit_index=bit) for pk, bit in bits.items()], ["bit_index"], batch_size=1000
+    )
+
+    masks = {}
+    for role_id, permission_id in RolePermission.objects.using(alias).values_list("role_id", "apppermission_id"):
+        masks[role_id] = masks.get(role_id, 0) | (1 << bits[permission_id])
+    Role.objects.using(alias).bulk_update(
+        [Role(pk=pk, permission_mask=mask) for pk, mask in masks.items()], ["permission_mask"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="apppermission",
+            name="bit_index",
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="role",
+            name="permission_mask",
+            field=application.fields.BitmaskField(default=0),
+        ),
+        migrations.RunPython(backfill_bitmasks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="apppermission",
+            name="bit_index",
+            field=models.PositiveIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name="apppermission",
+            constraint=models.UniqueConstraint(
+                fields=("application", "bit_index"), name="appperm_app_bit_index_uniq"
+            ),
+        ),
+    ]
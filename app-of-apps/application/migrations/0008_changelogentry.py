@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0007_permission_bitmasks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("application_id", models.BigIntegerField()),
+                ("model", models.CharField(max_length=32)),
+                ("object_id", models.BigIntegerField(null=True)),
+                ("action", models.CharField(max_length=16)),
+                ("data", models.JSONField(default=dict)),
+                ("created_ts", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["application_id", "id"], name="changelog_app_id_idx"
+                    ),
+                    models.Index(fields=["created_ts"], name="changelog_created_idx"),
+                ],
+            },
+        ),
+    ]
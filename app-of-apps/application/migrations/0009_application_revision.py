@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0008_changelogentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="revision",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_closure(apps, schema_editor):
+    """Every existing role has no parent yet, so its closure is just its own row."""
+    alias = schema_editor.connection.alias
+    Role = apps.get_model("application", "Role")
+    RoleClosure = apps.get_model("application", "RoleClosure")
+    RoleClosure.objects.using(alias).bulk_create(
+        [
+            RoleClosure(ancestor_id=pk, descendant_id=pk, depth=0)
+            for pk in Role.objects.using(alias).values_list("pk", flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0009_application_revision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="role",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="children",
+                to="application.role",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RoleClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveSmallIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="application.role",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="application.role",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["ancestor", "descendant"],
+                        name="roleclosure_ancestor_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("descendant", "ancestor"),
+                        name="roleclosure_descendant_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_effective_permissions(apps, schema_editor):
+    """Materialize what every live membership grants, in one query."""
+    alias = schema_editor.connection.alias
+    AppPermission = apps.get_model("application", "AppPermission")
+    EffectivePermission = apps.get_model("application", "EffectivePermission")
+    member = "roles__descendant_links__descendant__role_users"
+    grants = (
+        AppPermission.objects.using(alias)
+        .filter(
+            **{
+                "deleted_ts__isnull": True,
+                "roles__deleted_ts__isnull": True,
+                "roles__descendant_links__descendant__deleted_ts__isnull": True,
+                f"{member}__application_id": models.F("application_id"),
+                f"{member}__deleted_ts__isnull": True,
+            }
+        )
+        .values_list("application_id", f"{member}__user_id", "pk")
+        .distinct()
+    )
+    EffectivePermission.objects.using(alias).bulk_create(
+        (
+            EffectivePermission(
+                application_id=application_id,
+                user_id=user_id,
+                permission_id=permission_id,
+            )
+            for application_id, user_id, permission_id in grants.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0010_role_hierarchy"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EffectivePermission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "application",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="application.application",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="application.apppermission",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["application", "permission", "user"],
+                        name="effperm_app_perm_user_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("application", "user", "permission"),
+                        name="effperm_app_user_perm_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_effective_permissions, migrations.RunPython.noop),
+    ]
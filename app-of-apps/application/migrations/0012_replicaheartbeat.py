@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0011_effectivepermission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReplicaHeartbeat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ts", models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("application", "0012_replicaheartbeat"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApplicationShard",
+            fields=[
+                (
+                    "application",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="+",
+                        serialize=False,
+                        to="application.application",
+                    ),
+                ),
+                ("alias", models.CharField(max_length=64)),
+                ("locked", models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="applicationuser",
+            name="application",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="app_users",
+                to="application.application",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="applicationuser",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="app_memberships",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="apppermission",
+            name="application",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="permissions",
+                to="application.application",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="effectivepermission",
+            name="application",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="application.application",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="effectivepermission",
+            name="user",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="role",
+            name="application",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="roles",
+                to="application.application",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """ Index the blacklist by time for BlacklistFilter.sync(); the table belongs to simplejwt """
+
+    dependencies = [
+        ("application", "0013_sharding"),
+        ("token_blacklist", "0013_alter_blacklistedtoken_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX token_blacklist_blacklisted_at_idx ON token_blacklist_blacklistedtoken (blacklisted_at)",
+            "DROP INDEX token_blacklist_blacklisted_at_idx",
+        ),
+    ]
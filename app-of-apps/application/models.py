@@ -1,9 +1,199 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router
+from django.db.models import Exists, Max, OuterRef, Q
 from django.contrib.auth.models import User, Group, Permission
 
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.utils import timezone
 
+import hashlib
+import operator
 import uuid
+from collections import defaultdict
+from functools import reduce
+
+from application.authorization import DEVELOPER_GROUP, get_authorization_context
+from application.data_keys import DataKey, data_key_indexes
+from application.fields import BitmaskField
+
+
+# Tenant metadata keys on ApplicationUser.data that get an expression index
+APPLICATION_USER_DATA_KEYS = ("department", "region", "external_id")
+
+
+class BaseQuerySet(models.QuerySet):
+    """
+    - Set-based soft delete. Both write methods run a single UPDATE, which skips
+      per-row signals, so they announce the change through `bulk_changed`.
+    - `filter_data()` for lookups on top-level keys of the `data` JSON column
+    """
+
+    def alive(self):
+        return self.filter(deleted_ts__isnull=True)
+
+    def deleted(self):
+        return self.filter(deleted_ts__isnull=False)
+
+    def soft_delete(self):
+        """ Tombstone the live rows; returns the number of rows changed """
+        return self._set_deleted_ts(self.alive(), timezone.now())
+
+    def restore(self):
+        """ Bring tombstoned rows back; returns the number of rows changed """
+        return self._set_deleted_ts(self.deleted(), None)
+
+    def filter_data(self, **lookups):
+        """
+        Filter on `data` keys, e.g. filter_data(department="Finance", region__in=[...]).
+        Exact/in lookups with string values on keys the model lists in
+        `indexed_data_keys` use the expression index; anything else falls back
+        to the plain (unindexed) `data__<key>` lookup.
+        """
+        queryset = self
+        for lookup, value in lookups.items():
+            key, _, operator = lookup.partition("__")
+            values = value if operator == "in" else [value]
+            if (
+                key in self.model.indexed_data_keys
+                and operator in ("", "exact", "in")
+                and all(isinstance(v, str) for v in values)
+            ):
+                alias = f"_data_{key}"
+                queryset = queryset.alias(**{alias: DataKey("data", key)})
+                queryset = queryset.filter(**{f"{alias}__{operator or 'exact'}": value})
+            else:
+                queryset = queryset.filter(**{f"data__{lookup}": value})
+        return queryset
+
+    def _set_deleted_ts(self, queryset, value):
+        from application.signals import bulk_changed  # signals imports this module
+
+        field = "pk" if self.model is Application else "application_id"
+        extra = {}
+        if self.model is ApplicationUser:
+            members = set(queryset.values_list(field, "user_id"))
+            application_ids = {application_id for application_id, _ in members}
+            extra["user_ids"] = {user_id for _, user_id in members}
+        else:
+            application_ids = set(queryset.values_list(field, flat=True).distinct())
+        if not application_ids:
+            return 0
+        changed = queryset.update(deleted_ts=value, updated_ts=timezone.now())
+        bulk_changed.send(sender=self.model, application_ids=application_ids, **extra)
+        return changed
+
+
+class AliveManager(models.Manager.from_queryset(BaseQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().alive()
+
+
+def _filtered_application(lookups):
+    """ The single application id that keyword lookups pin a query to, or None """
+    for key in ("application", "application_id", "application__pk", "application__id"):
+        if key in lookups:
+            value = lookups[key]
+            return getattr(value, "pk", value)
+    return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    QuerySet of a per-application table, which may live on a shard (see
+    application.sharding). Filtering on one application, or creating rows of
+    one, adds it to the router hints so ShardRouter picks its database; bulk
+    writes are split by database. Queries over several applications run on
+    'default' unless sent elsewhere with using().
+    """
+
+    def _filter_or_exclude(self, negate, args, kwargs):
+        clone = super()._filter_or_exclude(negate, args, kwargs)
+        if not negate:
+            clone._add_application_hint(kwargs)
+        return clone
+
+    def _add_application_hint(self, lookups):
+        application_id = _filtered_application(lookups)
+        if application_id is not None and self._db is None and "application_id" not in self._hints:
+            self._hints = {**self._hints, "application_id": application_id}  # shared with the clone's source
+        return self
+
+    def _for_application(self, lookups):
+        return self._chain()._add_application_hint(lookups)
+
+    def primary(self):
+        """ Read from the primary rather than a read replica (see application.routers) """
+        clone = self._chain()
+        clone._hints = {**self._hints, "primary": True}
+        return clone
+
+    def create(self, **kwargs):
+        return super(ShardedQuerySet, self._for_application(kwargs)).create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._for_application(kwargs)).get_or_create(defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._for_application(kwargs)).update_or_create(
+            defaults, create_defaults, **kwargs
+        )
+
+    def _by_database(self, objs):
+        if self._db is not None or "application_id" in self._hints:
+            return {self.db: objs}
+        groups = defaultdict(list)
+        for obj in objs:
+            groups[router.db_for_write(self.model, instance=obj)].append(obj)
+        return groups
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for using, group in self._by_database(objs).items():
+            super(ShardedQuerySet, self.using(using)).bulk_create(group, *args, **kwargs)
+        return objs
+
+    def bulk_update(self, objs, *args, **kwargs):
+        objs = list(objs)
+        return sum(
+            super(ShardedQuerySet, self.using(using)).bulk_update(group, *args, **kwargs)
+            for using, group in self._by_database(objs).items()
+        )
+
+    def select_global_related(self, *fields):
+        """
+        select_related() for foreign keys to the global models (Application,
+        User). Other shards have no rows in their tables, so there the related
+        rows come from 'default' in a second query (prefetch_related). The
+        database is only known when the query runs, which may be in a thread
+        of an async caller, so the choice is made then.
+        """
+        clone = self._chain()
+        clone._global_related = (*self._global_related, *fields)
+        return clone
+
+    _global_related = ()
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._global_related = self._global_related
+        return clone
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._global_related:
+            fields, self._global_related = self._global_related, ()
+            if self.db != "default" and self.db in getattr(settings, "DATABASE_SHARDS", ()):
+                self._prefetch_related_lookups = (*self._prefetch_related_lookups, *fields)
+            else:
+                self.query.add_select_related(fields)
+        super()._fetch_all()
+
+
+class ShardedBaseQuerySet(ShardedQuerySet, BaseQuerySet):
+    pass
+
+
+class ShardedAliveManager(AliveManager.from_queryset(ShardedBaseQuerySet)):
+    pass
 
 
 class BaseModel(models.Model):
@@ -11,19 +201,41 @@ class BaseModel(models.Model):
     Abstract base model that includes:
     - JSONField for dynamic data storage
     - Timestamp fields for tracking creation, updates, and soft deletion
+    - Managers: `objects` and `all_with_deleted` see every row, `alive` hides soft-deleted ones
+    - `indexed_data_keys`: `data` keys with an expression index (see data_keys.data_key_indexes)
     """
     data = models.JSONField(default=dict)  # JSON column
     created_ts = models.DateTimeField(auto_now_add=True)
     updated_ts = models.DateTimeField(auto_now=True)
     deleted_ts = models.DateTimeField(null=True, blank=True)  # Soft delete field
 
+    objects = BaseQuerySet.as_manager()  # Default manager, keeps tombstones visible to admin and relations
+    alive = AliveManager()
+    all_with_deleted = BaseQuerySet.as_manager()
+
+    indexed_data_keys = ()
+
     class Meta:
         abstract = True  # Ensures this model is not created as a table
 
 
+class ShardedModel(BaseModel):
+    """ BaseModel of the per-application tables, with shard-aware managers (see ShardedQuerySet) """
+    objects = ShardedBaseQuerySet.as_manager()
+    alive = ShardedAliveManager()
+    all_with_deleted = ShardedBaseQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+
 def generate_api_key():
     return uuid.uuid4().hex  # Generates a new unique API key every time
 
+
+def hash_api_key(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()  # Fixed-length, indexed lookup digest
+
 class Application(BaseModel):
     user = models.ForeignKey(
         User,
@@ -38,81 +250,328 @@ class Application(BaseModel):
         default=generate_api_key,  # Call the function instead of setting a fixed value
         editable=False
     )
+    API_KEY_DIGEST = models.CharField(max_length=64, unique=True, editable=False)
+    # Bumped by bump_revisions() on any change to the application, its roles,
+    # its permissions or their links; versions the manifest (see application.manifest)
+    revision = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
 
     def save(self, *args, **kwargs):
         """ Ensure only users with the correct role can create applications """
-        if not self.user.groups.filter(name="developer").exists():
+        context = get_authorization_context()
+        if context is not None:
+            allowed = context.is_developer(self.user_id)
+        else:
+            allowed = self.user.groups.filter(name=DEVELOPER_GROUP).exists()
+        if not allowed:
             raise PermissionDenied("User does not have permission to create applications.")
+        self.API_KEY_DIGEST = hash_api_key(self.API_KEY)
+        if not self._state.adding and not args and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            # Never write back the revision this instance was loaded with: it
+            # would move the counter backwards and reuse a published revision
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != "revision"
+            ]
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bump_revisions(cls, application_ids, using="default"):
+        """ Advance the manifest revision of the given applications, in one UPDATE """
+        if application_ids:
+            cls.objects.using(using).filter(pk__in=application_ids).update(revision=models.F("revision") + 1)
+
+    def compile_mask(self, names):
+        """
+        Bitmask of the named live permissions, for Role.has_permissions().
+        Raises AppPermission.DoesNotExist if any name is unknown, rather than
+        returning a mask that silently drops it.
+        """
+        names = set(names)
+        bits = dict(AppPermission.alive.filter(application=self, name__in=names).values_list("name", "bit_index"))
+        missing = names - bits.keys()
+        if missing:
+            raise AppPermission.DoesNotExist(f"Unknown permissions for {self.name}: {', '.join(sorted(missing))}")
+        return reduce(operator.or_, (1 << bit for bit in bits.values()), 0)
+
 
 
-class Role(BaseModel):
+class Role(ShardedModel):
     """
     Defines roles that belong to a specific application.
     """
     application = models.ForeignKey(
         Application, 
         on_delete=models.CASCADE, 
-        related_name="roles"
+        related_name="roles",
+        db_constraint=False,  # applications are global, roles may be on a shard
     )
     name = models.CharField(max_length=50)
     description = models.TextField(null=True, blank=True)
 
     # FIX: Add ManyToMany relationship with Permission
     permissions = models.ManyToManyField('AppPermission', related_name="roles")
+    # Role whose permissions this role inherits (e.g. Editor.parent = Viewer), in the
+    # same application; mirrored in RoleClosure by signals.maintain_role_closure
+    parent = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.RESTRICT,  # only together with the roles inheriting from it
+        related_name="children"
+    )
+    # OR of 1 << bit_index over `permissions` and those of the ancestors reached through
+    # live roles only, kept in sync by signals.sync_role_permission_masks and
+    # signals.maintain_role_closure
+    permission_mask = BitmaskField()
 
     class Meta:
         unique_together = ('application', 'name')
+        indexes = [
+            models.Index(fields=['application', 'created_ts', 'id'], condition=models.Q(deleted_ts__isnull=True), name='role_app_alive_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.application.name})"
 
     def save(self, *args, **kwargs):
         """ Ensure only users with the correct role can create applications """
-        if not self.application.user.groups.filter(name="developer").exists():
+        context = get_authorization_context()
+        if context is not None:
+            allowed = context.owner_is_developer(self.application_id)
+        else:
+            allowed = self.application.user.groups.filter(name=DEVELOPER_GROUP).exists()
+        if not allowed:
             raise PermissionDenied("User does not have permission to create applications.")
+        if self.parent_id is not None:
+            RoleClosure.check_parent(self)
         super().save(*args, **kwargs)
 
+    def clean(self):
+        if self.parent_id is not None:
+            RoleClosure.check_parent(self)
+
+    def has_permissions(self, mask):
+        """ True if the role holds every permission in `mask` (see Application.compile_mask) """
+        return self.permission_mask & mask == mask
+
+    @classmethod
+    def recompute_permission_masks(cls, role_ids, using="default"):
+        """
+        Rebuild permission_mask of the given roles and of the roles inheriting
+        from them, from the closure and the join table, in two queries
+        """
+        if not role_ids:
+            return
+        closure = RoleClosure.objects.using(using)
+        inheriting = closure.filter(ancestor_id__in=role_ids).values("descendant_id")
+        links = closure.filter(
+            Q(depth=0) | Q(ancestor__deleted_ts__isnull=True) & ~RoleClosure.through_deleted_role(),
+            descendant_id__in=inheriting,
+        ).values_list("descendant_id", "ancestor__permissions__bit_index")
+        masks = {}
+        for role_id, bit in links:
+            masks[role_id] = masks.get(role_id, 0) | (0 if bit is None else 1 << bit)
+        cls.objects.using(using).bulk_update(
+            [cls(pk=role_id, permission_mask=mask) for role_id, mask in masks.items()], ["permission_mask"]
+        )
+
+
+class RoleClosure(models.Model):
+    """
+    Transitive closure of Role.parent: one row per role and ancestor, the role
+    itself included at depth 0. A role's inherited permissions are one indexed
+    join through it and cycle checks one index probe, however deep the
+    hierarchy. Maintained incrementally by signals.maintain_role_closure.
+    """
+    # The composite indexes below lead with each column, so no single-column ones
+    ancestor = models.ForeignKey(Role, on_delete=models.CASCADE, related_name="descendant_links", db_index=False)
+    descendant = models.ForeignKey(Role, on_delete=models.CASCADE, related_name="ancestor_links", db_index=False)
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['descendant', 'ancestor'], name='roleclosure_descendant_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'descendant'], name='roleclosure_ancestor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def through_deleted_role(cls, path=""):
+        """
+        Exists() of a soft-deleted role strictly between the ancestor and the
+        descendant of the closure row at `path` (e.g. "roles__descendant_links__").
+        A soft-deleted role passes nothing on: neither its own permissions nor
+        those of its ancestors. One probe of the (descendant, ancestor) index.
+        """
+        return Exists(cls.objects.filter(
+            descendant_id=OuterRef(f"{path}descendant_id"),
+            depth__gt=0,
+            depth__lt=OuterRef(f"{path}depth"),
+            ancestor__deleted_ts__isnull=False,
+        ))
+
+    @classmethod
+    def check_parent(cls, role):
+        """
+        Raise ValidationError unless role.parent may be the parent of `role`: same
+        application, no cycle, and no role with more than ROLE_HIERARCHY_MAX_DEPTH
+        ancestors. A fixed number of indexed lookups, whatever the depth.
+        """
+        parent = role.parent
+        objects = cls.objects.db_manager(router.db_for_write(cls, instance=role))  # not a lagging replica
+        if parent.application_id != role.application_id:
+            raise ValidationError({"parent": "A role can only inherit from a role of the same application."})
+        if role.pk is not None and (
+            parent.pk == role.pk or objects.filter(ancestor_id=role.pk, descendant_id=parent.pk).exists()
+        ):
+            raise ValidationError({"parent": f"{parent.name} already inherits from {role.name}."})
+        parent_depth = objects.filter(descendant_id=parent.pk).aggregate(depth=Max("depth"))["depth"] or 0
+        height = 0
+        if role.pk is not None:
+            height = objects.filter(ancestor_id=role.pk).aggregate(height=Max("depth"))["height"] or 0
+        max_depth = getattr(settings, "ROLE_HIERARCHY_MAX_DEPTH", 10)
+        if parent_depth + 1 + height > max_depth:
+            raise ValidationError({"parent": f"Role hierarchies are limited to {max_depth} levels of inheritance."})
 
-class AppPermission(BaseModel):
+    @classmethod
+    def move(cls, role, created=False, using="default"):
+        """
+        Hang `role` and the roles inheriting from it under role.parent_id: their
+        links to the old ancestors go and links to the new ones are added, in
+        three queries (two for a new role). Does not revalidate the parent.
+        """
+        objects = cls.objects.using(using)
+        if created:
+            subtree = [(role.pk, 0)]
+            objects.bulk_create([cls(ancestor_id=role.pk, descendant_id=role.pk, depth=0)])
+        else:
+            subtree = list(objects.filter(ancestor_id=role.pk).values_list("descendant_id", "depth"))
+            descendant_ids = [descendant_id for descendant_id, _ in subtree]
+            objects.filter(descendant_id__in=descendant_ids).exclude(ancestor_id__in=descendant_ids).delete()
+        if role.parent_id is not None:
+            ancestors = objects.filter(descendant_id=role.parent_id).values_list("ancestor_id", "depth")
+            objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + 1 + below)
+                for ancestor_id, above in ancestors for descendant_id, below in subtree
+            ])
+
+    @classmethod
+    def rebuild(cls, application_ids, using="default"):
+        """
+        Bring the closure of the given applications' roles in line with
+        Role.parent, for writes that bypass save() (bulk operations, repairs);
+        only missing and stale rows are written. Returns the ids of the roles
+        that have a parent. Raises ValidationError if the parents form a cycle.
+        """
+        parents = dict(
+            Role.objects.using(using).filter(application_id__in=application_ids).values_list("pk", "parent_id")
+        )
+        expected = set()
+        for role_id in parents:
+            ancestor_id, depth = role_id, 0
+            while ancestor_id is not None:
+                if depth > len(parents):
+                    raise ValidationError(f"The parents of role {role_id} form a cycle.")
+                expected.add((ancestor_id, role_id, depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        objects = cls.objects.using(using)
+        rows = {
+            (ancestor_id, descendant_id, depth): pk for pk, ancestor_id, descendant_id, depth in
+            objects.filter(descendant__application_id__in=application_ids)
+            .values_list("pk", "ancestor_id", "descendant_id", "depth")
+        }
+        stale = [pk for row, pk in rows.items() if row not in expected]
+        if stale:
+            objects.filter(pk__in=stale).delete()
+        objects.bulk_create(
+            [cls(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in expected - rows.keys()],
+            batch_size=1000,
+        )
+        return [role_id for role_id, parent_id in parents.items() if parent_id is not None]
+
+
+class AppPermission(ShardedModel):
     application = models.ForeignKey(
         Application,
         on_delete=models.CASCADE,
-        related_name="permissions"
+        related_name="permissions",
+        db_constraint=False,  # applications are global, permissions may be on a shard
     )
     name = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
+    # Stable position of this permission in its application's Role.permission_mask
+    bit_index = models.PositiveIntegerField(editable=False)
 
     class Meta:
         unique_together = ('application', 'name')
+        indexes = [
+            models.Index(fields=['application', 'created_ts', 'id'], condition=models.Q(deleted_ts__isnull=True), name='appperm_app_alive_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['application', 'bit_index'], name='appperm_app_bit_index_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.application.name})"
 
     def save(self, *args, **kwargs):
         """ Ensure only users with the correct role can create applications """
-        if not self.application.user.groups.filter(name="developer").exists():
+        context = get_authorization_context()
+        if context is not None:
+            allowed = context.owner_is_developer(self.application_id)
+        else:
+            allowed = self.application.user.groups.filter(name=DEVELOPER_GROUP).exists()
+        if not allowed:
             raise PermissionDenied("User does not have permission to create applications.")
+        if self.bit_index is None:
+            self.assign_bit_indexes([self])
         super().save(*args, **kwargs)
 
+    @classmethod
+    def assign_bit_indexes(cls, permissions):
+        """
+        Give unsaved permissions the next free bit indexes of their application,
+        one query per database. Soft-deleted permissions keep their bits so
+        they can be restored.
+        """
+        pending = [permission for permission in permissions if permission.bit_index is None]
+        application_ids = defaultdict(set)
+        for permission in pending:  # the primary or the application's shard, not a lagging replica
+            application_ids[router.db_for_write(cls, instance=permission)].add(permission.application_id)
+        next_bits = {}
+        for using, ids in application_ids.items():
+            next_bits.update(
+                cls.objects.using(using).filter(application_id__in=ids)
+                .values("application_id").annotate(top=Max("bit_index")).values_list("application_id", "top")
+            )
+        for permission in pending:
+            bit = next_bits.get(permission.application_id)
+            permission.bit_index = 0 if bit is None else bit + 1
+            next_bits[permission.application_id] = permission.bit_index
 
-class ApplicationUser(BaseModel):
+
+class ApplicationUser(ShardedModel):
     """
     Links users to applications and assigns them a role that belongs to that application.
     """
+    # Applications and users are global, memberships may be on a shard
     application = models.ForeignKey(
         Application, 
         on_delete=models.CASCADE, 
-        related_name="app_users"
+        related_name="app_users",
+        db_constraint=False,
     )
     user = models.ForeignKey(
         User, 
         on_delete=models.CASCADE, 
-        related_name="app_memberships"
+        related_name="app_memberships",
+        db_constraint=False,
     )
     role = models.ForeignKey(
         Role,
@@ -120,8 +579,100 @@ class ApplicationUser(BaseModel):
         related_name="role_users"
     )
 
+    indexed_data_keys = APPLICATION_USER_DATA_KEYS
+
     class Meta:
         unique_together = ('application', 'user')  # Prevent duplicate user-application pair
+        indexes = [
+            models.Index(fields=['application', 'created_ts', 'id'], condition=models.Q(deleted_ts__isnull=True), name='appuser_app_alive_idx'),
+            *data_key_indexes('appuser', APPLICATION_USER_DATA_KEYS),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.application.name} ({self.role.name})"
+
+
+
+class EffectivePermission(models.Model):
+    """
+    Materialized effective permissions: one row per permission a user holds in
+    an application through their live membership, role and the ancestors it
+    reaches through live roles.
+    Kept up to date by application.effective_permissions; both directions of
+    lookup are a range scan of one covering index.
+    """
+    # The composite indexes below lead with the application, so no single-column ones;
+    # applications and users are global, the rows may be on a shard
+    application = models.ForeignKey(
+        Application, on_delete=models.CASCADE, related_name="+", db_index=False, db_constraint=False
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+", db_index=False, db_constraint=False)
+    permission = models.ForeignKey("AppPermission", on_delete=models.CASCADE, related_name="+", db_index=False)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # "What can user U do in app A"
+            models.UniqueConstraint(fields=['application', 'user', 'permission'], name='effperm_app_user_perm_uniq'),
+        ]
+        indexes = [
+            # "Who can do X in app A"
+            models.Index(fields=['application', 'permission', 'user'], name='effperm_app_perm_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.application_id}: {self.user_id} -> {self.permission_id}"
+
+class ApplicationShard(models.Model):
+    """
+    Shard map: the database holding an application's roles, permissions and
+    members. Applications without an entry are on 'default' (see
+    application.sharding).
+    """
+    application = models.OneToOneField(Application, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    alias = models.CharField(max_length=64)
+    # Set by move_application_shard while it copies the last changes: writes are refused
+    locked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.application_id} -> {self.alias}{' (locked)' if self.locked else ''}"
+
+
+class ReplicaHeartbeat(models.Model):
+    """
+    A single row stamped with the time on the primary; read back from a
+    replica, it tells how far behind the replica is (see application.routers)
+    """
+    ts = models.DateTimeField()
+
+    @classmethod
+    def beat(cls, using="default"):
+        cls.objects.using(using).update_or_create(pk=1, defaults={"ts": timezone.now()})
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only feed of changes to applications, roles, permissions, role
+    permissions and members, served by GET /api/changes (see
+    application.changelog). The id is the feed cursor.
+    """
+    CREATED, UPDATED, DELETED, BULK = "created", "updated", "deleted", "bulk"
+
+    # Not a foreign key: entries must outlive the application they describe
+    application_id = models.BigIntegerField()
+    model = models.CharField(max_length=32)
+    # None for set-based changes (action "bulk"): resync every `model` row of the application
+    object_id = models.BigIntegerField(null=True)
+    action = models.CharField(max_length=16)
+    data = models.JSONField(default=dict)
+    created_ts = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['application_id', 'id'], name='changelog_app_id_idx'),
+            models.Index(fields=['created_ts'], name='changelog_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.model}:{self.object_id} {self.action}"
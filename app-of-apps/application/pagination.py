@@ -0,0 +1,150 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(created_ts, pk):
+    return urlsafe_b64encode(f"{created_ts.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """ Return (created_ts, pk) or raise ValueError """
+    created_ts, pk = urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(created_ts), int(pk)
+
+
+def after_cursor(queryset, position):
+    """
+    Rows strictly after `position` in (created_ts, id) order.
+    Written as `created_ts >= ts AND NOT (created_ts = ts AND id <= pk)` rather
+    than an OR, so the database seeks into the (application, created_ts, id)
+    index instead of scanning every earlier row.
+    """
+    created_ts, pk = position
+    return queryset.filter(created_ts__gte=created_ts).exclude(created_ts=created_ts, pk__lte=pk)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over (created_ts, id). Each page is one
+    index range read of `page_size + 1` rows, so deep pages cost the same as
+    the first one. Views must pass a queryset filtered to a single application.
+    apaginate_queryset() serves native async views, which pass a plain
+    HttpRequest (hence `request.GET` rather than DRF's `query_params`).
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self.seek(queryset, request)
+        return self.build_page(list(queryset[:page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self.seek(queryset, request)
+        return self.build_page([row async for row in queryset[:page_size + 1]], page_size)
+
+    def seek(self, queryset, request):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = request.GET.get(self.cursor_query_param)
+        if cursor:
+            try:
+                queryset = after_cursor(queryset, decode_cursor(cursor))
+            except (TypeError, ValueError, UnicodeDecodeError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset.order_by("created_ts", "pk"), page_size
+
+    def build_page(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.next_cursor = encode_cursor(page[-1].created_ts, page[-1].pk) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_data(self, data):
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {"name": self.cursor_query_param, "required": False, "in": "query",
+             "schema": {"type": "string"}},
+            {"name": self.page_size_query_param, "required": False, "in": "query",
+             "schema": {"type": "integer"}},
+        ]
+
+
+def estimate_row_count(model, using="default"):
+    """
+    Row count of `model`'s table from planner statistics, or None when the
+    database has none (SQLite needs a prior ANALYZE or PRAGMA optimize).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql, params = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table]
+    elif connection.vendor == "sqlite":
+        # The first number of each index's stat is its row count; partial indexes count fewer
+        sql, params = "SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None  # e.g. sqlite_stat1 does not exist yet
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator for very large tables. Unfiltered changelists take the
+    row count from planner statistics; filtered ones count at most
+    ADMIN_EXACT_COUNT_LIMIT rows, so no page ever runs an unbounded COUNT(*).
+    Pair with `show_full_result_count = False`.
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, "ADMIN_EXACT_COUNT_LIMIT", 10000)
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        return queryset.order_by()[:limit].count()
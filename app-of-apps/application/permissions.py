@@ -0,0 +1,155 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+from application.caching import LRUCache
+from application.models import Application, AppPermission, ApplicationUser, EffectivePermission
+
+
+def _pk(obj):
+    return getattr(obj, "pk", obj)
+
+
+class PermissionCache:
+    """
+    Compiled effective-permission cache keyed by (application_id, user_id).
+
+    Entries are frozensets of permission names. Whole applications are
+    invalidated in O(1) by bumping a per-application generation that is part
+    of the key, so entries from an older generation are never hit again and
+    age out through LRU eviction. The cache is per process: signals keep it
+    coherent for writes made by this process only, and entries expire after
+    `ttl` seconds so writes made by other processes are seen within that time.
+    """
+
+    def __init__(self, maxsize, ttl=None, timer=time.monotonic):
+        self._entries = LRUCache(maxsize, ttl=ttl, timer=timer)
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _key(self, application_id, user_id):
+        return application_id, self._generations.get(application_id, 0), user_id
+
+    def get(self, application_id, user_id):
+        return self._entries.get(self._key(application_id, user_id))
+
+    def get_or_compute(self, application_id, user_id, compute):
+        permissions = self.get(application_id, user_id)
+        if permissions is not None:
+            return permissions
+        with self._lock:
+            epoch = self._epoch
+            key = self._key(application_id, user_id)
+        permissions = frozenset(compute(application_id, user_id))
+        with self._lock:
+            # Skip the store if anything was invalidated while we were querying,
+            # otherwise a concurrent write could be masked by a stale entry.
+            if epoch == self._epoch:
+                self._entries.set(key, permissions)
+        return permissions
+
+    def invalidate(self, application_id, user_id):
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(self._key(application_id, user_id))
+
+    def invalidate_application(self, application_id):
+        with self._lock:
+            self._epoch += 1
+            self._generations[application_id] = self._generations.get(application_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._generations.clear()
+            self._entries.clear()
+
+    def stats(self):
+        return self._entries.stats()
+
+
+permission_cache = PermissionCache(
+    maxsize=getattr(settings, "PERMISSION_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "PERMISSION_CACHE_TTL", 10),
+)
+
+
+def resolve_permissions(application_id, user_id):
+    """
+    Uncached lookup of the materialized ApplicationUser -> Role -> inherited
+    roles -> AppPermission join (EffectivePermission): one index range scan.
+    Reads the primary, as the result is cached.
+    """
+    return EffectivePermission.objects.primary().filter(
+        application_id=application_id, user_id=user_id
+    ).values_list("permission__name", flat=True)
+
+
+def get_effective_permissions(application, user):
+    """
+    Return the frozenset of permission names `user` holds in `application`.
+    Both arguments may be model instances or primary keys.
+    """
+    return permission_cache.get_or_compute(_pk(application), _pk(user), resolve_permissions)
+
+
+def has_permission(application, user, permission_name):
+    return permission_name in get_effective_permissions(application, user)
+
+
+def users_with_permission(application, permission_name):
+    """ Ids of the users holding a live permission in `application`: one index range scan """
+    application_id = _pk(application)
+    return EffectivePermission.objects.filter(
+        application_id=application_id, permission__application_id=application_id, permission__name=permission_name
+    ).values_list("user_id", flat=True)
+
+
+class IsApplicationOwnerOrClient(BasePermission):
+    """
+    Object permission for an Application: its owner (JWT) or the application
+    itself (API_KEY, see authentication.APIKeyAuthentication).
+    """
+
+    def has_object_permission(self, request, view, obj):
+        if isinstance(request.auth, Application):
+            return request.auth.pk == obj.pk
+        return request.user.pk is not None and request.user.pk == obj.user_id
+
+
+def _check_querysets(application_id, pairs):
+    bits = AppPermission.alive.primary().filter(
+        application_id=application_id, name__in={name for _, name in pairs}
+    ).values_list("name", "bit_index")
+    masks = ApplicationUser.alive.primary().filter(
+        application_id=application_id, user_id__in={user_id for user_id, _ in pairs},
+        role__deleted_ts__isnull=True,
+    ).values_list("user_id", "role__permission_mask")
+    return bits, masks
+
+
+def _check_answers(pairs, bits, masks):
+    return [
+        name in bits and user_id in masks and bool(masks[user_id] >> bits[name] & 1)
+        for user_id, name in pairs
+    ]
+
+
+def check_permissions(application_id, pairs):
+    """
+    Answer many (user_id, permission_name) questions for one application in
+    two queries: permission bits by name, then role masks by user. Unknown
+    users, permissions and soft-deleted rows answer False.
+    """
+    bits, masks = _check_querysets(application_id, pairs)
+    return _check_answers(pairs, dict(bits), dict(masks))
+
+
+async def acheck_permissions(application_id, pairs):
+    """ Async check_permissions, for the native async check view """
+    bits, masks = _check_querysets(application_id, pairs)
+    return _check_answers(pairs, {name: bit async for name, bit in bits},
+                          {user_id: mask async for user_id, mask in masks})
@@ -0,0 +1,163 @@
+"""
+Database routing of the permission model between the primary ('default')
+and the read replicas listed in DATABASE_REPLICAS.
+
+With replicas configured, reads of the permission-model tables go to a
+random replica and writes go to the primary (objects loaded from other
+databases, such as a benchmark's scratch files, stay there). Reads go to the
+primary instead when:
+
+- the current request (or thread, outside requests) has already written to
+  the primary, so it reads its own writes (marked by signal receivers once
+  the write is made, not by routing, which lookups also use);
+- the client wrote within the last REPLICA_MAX_LAG seconds, which
+  ReplicaPinningMiddleware remembers in a cookie;
+- the primary is inside a transaction, whose reads must see its writes;
+- the query asks for it with ShardedQuerySet.primary(), as the lookups
+  behind the permission cache and permission checks do: a grant read from a
+  lagging replica would stay cached after the replica caught up;
+- no replica is within REPLICA_MAX_LAG seconds of the primary.
+
+Lag is measured pt-heartbeat style: ReplicaHeartbeat is stamped on the
+primary (by `manage.py replicate_db`, or a cron job with real replication)
+and read back from each replica at most every REPLICA_LAG_CHECK_INTERVAL
+seconds per process.
+"""
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from application.models import ReplicaHeartbeat
+
+
+# The permission model and the tables derived from it
+REPLICATED_MODELS = {
+    "application.application",
+    "application.role",
+    "application.role_permissions",
+    "application.apppermission",
+    "application.applicationuser",
+    "application.roleclosure",
+    "application.effectivepermission",
+}
+
+_pinned = ContextVar("replica_pinned", default=None)  # None outside a request: a per-thread flag is used
+
+
+class _ThreadPin(threading.local):
+    wrote = False
+
+
+_thread_pin = _ThreadPin()
+
+
+def start_request(pinned=False):
+    """ Route this request's reads to the primary if `pinned`; returns a token for finish_request() """
+    return _pinned.set({"pinned": pinned, "wrote": False})
+
+
+def finish_request(token):
+    """ Whether the request wrote, and reset the routing state """
+    state = _pinned.get()
+    _pinned.reset(token)
+    return bool(state and state["wrote"])
+
+
+def mark_written():
+    """ Pin this request's (or thread's) reads to the primary: it wrote the permission model """
+    state = _pinned.get()
+    if state is None:
+        _thread_pin.wrote = True
+    else:
+        state["wrote"] = True
+
+
+def _reads_pinned():
+    state = _pinned.get()
+    if state is None:
+        return _thread_pin.wrote
+    return state["pinned"] or state["wrote"]
+
+
+def unpin_thread():
+    """ Let this thread read from replicas again after it wrote (commands, tests) """
+    _thread_pin.wrote = False
+
+
+class ReplicaLag:
+    """ Per-process cache of each replica's lag behind the primary, in seconds (None: unknown) """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def get(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+        if checked is not None and now - checked[0] < getattr(settings, "REPLICA_LAG_CHECK_INTERVAL", 1.0):
+            return checked[1]
+        lag = self.measure(alias)
+        with self._lock:
+            self._checked[alias] = (now, lag)
+        return lag
+
+    def measure(self, alias):
+        try:
+            beat = ReplicaHeartbeat.objects.using(alias).values_list("ts", flat=True).first()
+        except DatabaseError:
+            return None  # unreachable, or not replicated yet
+        return None if beat is None else max(0.0, (timezone.now() - beat).total_seconds())
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+def healthy_replicas():
+    """ DATABASE_REPLICAS aliases within REPLICA_MAX_LAG seconds of the primary """
+    max_lag = getattr(settings, "REPLICA_MAX_LAG", 5)
+    return [
+        alias for alias in getattr(settings, "DATABASE_REPLICAS", ())
+        if (lag := replica_lag.get(alias)) is not None and lag <= max_lag
+    ]
+
+
+class ReplicaRouter:
+    """ DATABASE_ROUTERS entry sending permission-model reads to replicas and writes to the primary """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICATED_MODELS or not getattr(settings, "DATABASE_REPLICAS", ()):
+            return None
+        if hints.get("primary") or _reads_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", ())
+        if model._meta.label_lower not in REPLICATED_MODELS or not replicas:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db and instance._state.db not in replicas:
+            return instance._state.db  # e.g. a scratch database of a benchmark
+        return DEFAULT_DB_ALIAS  # rows read from a replica are written back to the primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", ())
+        if replicas and {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, *replicas}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, "DATABASE_REPLICAS", ()):
+            return False  # replicas get the schema by replication
+        return None
@@ -0,0 +1,71 @@
+from django.conf import settings
+from dj_rest_auth.jwt_auth import CookieTokenRefreshSerializer
+from dj_rest_auth.serializers import LoginSerializer
+from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from application.models import AppPermission, ApplicationUser, ChangeLogEntry, Role
+from application.tokens import ClaimsRefreshToken
+
+
+class AppPermissionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AppPermission
+        fields = ("id", "name", "description", "data", "created_ts", "updated_ts")
+
+
+class RoleSerializer(serializers.ModelSerializer):
+    # Names come from prefetch_related("permissions"), one query per page
+    permissions = serializers.SlugRelatedField(slug_field="name", many=True, read_only=True)
+
+    class Meta:
+        model = Role
+        fields = ("id", "name", "description", "parent", "permissions", "data", "created_ts", "updated_ts")
+
+
+class ApplicationUserSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source="user.username", read_only=True)
+    role_name = serializers.CharField(source="role.name", read_only=True)
+
+    class Meta:
+        model = ApplicationUser
+        fields = ("id", "user", "username", "role", "role_name", "data", "created_ts", "updated_ts")
+
+
+class PermissionCheckPairSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    permission = serializers.CharField(max_length=100)
+
+
+class PermissionCheckSerializer(serializers.Serializer):
+    checks = PermissionCheckPairSerializer(
+        many=True, allow_empty=False, max_length=getattr(settings, "PERMISSION_CHECK_MAX_PAIRS", 500)
+    )
+
+
+
+class ChangeLogEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChangeLogEntry
+        fields = ("id", "model", "object_id", "action", "data", "created_ts")
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """ Query parameters of GET /api/changes """
+    application = serializers.IntegerField()
+    since = serializers.IntegerField(min_value=0, required=False)
+    wait = serializers.FloatField(min_value=0, max_value=getattr(settings, "CHANGES_MAX_WAIT", 30), default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=getattr(settings, "CHANGES_MAX_PAGE_SIZE", 1000), default=100)
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(CookieTokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsLoginSerializer(LoginSerializer):
+    application = serializers.IntegerField(
+        required=False, help_text="Only embed role/permission claims for this application."
+    )
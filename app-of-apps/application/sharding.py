@@ -0,0 +1,196 @@
+"""
+Optional tenant sharding of the per-application tables.
+
+With DATABASE_SHARDS set, the roles, permissions, role-permission links,
+members and the tables derived from them (RoleClosure, EffectivePermission)
+of an application live in the database the shard map (ApplicationShard)
+assigns it. Applications, users, the map itself and the change log stay on
+'default'. New applications are spread over DATABASE_SHARDS by id;
+applications without an entry (created before sharding was enabled) stay on
+'default'. `manage.py move_application_shard` moves one between databases.
+
+Routing is by application:
+
+- ShardRouter sends a query to the shard of the application named by its
+  hints: the instance being saved, deleted or followed (a role's members,
+  an application's roles) or the `application_id` hint that ShardedQuerySet
+  adds when a query filters on one application or creates rows of one;
+- bulk_create()/bulk_update() split their objects by database;
+- queries over several applications run on 'default' (or wherever using()
+  sends them): fan them out with `across_shards()`.
+
+Each shard has the full schema (`manage.py migrate --database <alias>`), but
+its copies of the global tables stay empty, so foreign keys from tenant rows
+to applications and users have no database constraint, and a join from a
+tenant table to a global one must be a second query on other shards (see
+ShardedQuerySet.select_global_related). A change to a tenant row and its
+change log entry or manifest revision bump commit in separate transactions
+when the tenant is not on 'default'.
+
+Processes cache the map for SHARD_MAP_TTL seconds. While a move copies the
+last changes the tenant is locked: writes to it fail with TenantMoving (503).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import exceptions
+
+from application.caching import LRUCache
+from application.models import Application, AppPermission, ApplicationShard, ApplicationUser, Role
+
+
+# The per-application tables; every other model is global
+SHARDED_MODELS = {
+    "application.role",
+    "application.role_permissions",
+    "application.apppermission",
+    "application.applicationuser",
+    "application.roleclosure",
+    "application.effectivepermission",
+}
+
+
+class TenantMoving(exceptions.APIException):
+    status_code = 503
+    default_detail = "This application is being moved to another database; retry shortly."
+    default_code = "tenant_moving"
+
+
+def enabled():
+    return bool(getattr(settings, "DATABASE_SHARDS", ()))
+
+
+def shards():
+    """ Every database that may hold tenant rows: 'default' and DATABASE_SHARDS """
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *getattr(settings, "DATABASE_SHARDS", ())]))
+
+
+def is_remote(alias):
+    """ Whether `alias` is a shard other than 'default', whose copies of the global tables are empty """
+    return alias != DEFAULT_DB_ALIAS and alias in getattr(settings, "DATABASE_SHARDS", ())
+
+
+class ShardMap:
+    """ Per-process cache of the shard map: application id -> (alias, locked), for SHARD_MAP_TTL seconds """
+
+    def __init__(self, maxsize=100000):
+        self._cache = LRUCache(maxsize=maxsize)
+
+    def get(self, application_id):
+        entry = self._cache.get(application_id)
+        if entry is None:
+            entry = self.load(application_id)
+            self._cache.set(application_id, entry, ttl=getattr(settings, "SHARD_MAP_TTL", 5))
+        return entry
+
+    def load(self, application_id):
+        """ Uncached entry, read from 'default' itself rather than a lagging replica """
+        return (
+            ApplicationShard.objects.using(DEFAULT_DB_ALIAS).filter(pk=application_id)
+            .values_list("alias", "locked").first()
+        ) or (DEFAULT_DB_ALIAS, False)
+
+    def pop(self, application_id):
+        self._cache.pop(application_id)
+
+    def clear(self):
+        self._cache.clear()
+
+
+shard_map = ShardMap(maxsize=getattr(settings, "SHARD_MAP_CACHE_SIZE", 100000))
+
+
+def database_for(application_id):
+    """ Alias of the database holding the application's tenant rows """
+    return shard_map.get(application_id)[0] if enabled() else DEFAULT_DB_ALIAS
+
+
+def by_database(application_ids):
+    """ {alias: [application ids]} for the given applications """
+    groups = defaultdict(list)
+    for application_id in application_ids:
+        groups[database_for(application_id)].append(application_id)
+    return groups
+
+
+def global_database(using):
+    """ Database of the global rows (applications, change log) for a change written on `using` """
+    return DEFAULT_DB_ALIAS if is_remote(using) else using
+
+
+def across_shards(queryset):
+    """ The queryset on every shard, for queries over several applications; as is without sharding """
+    if not enabled() or queryset._db is not None:
+        return [queryset]
+    return [queryset.using(alias) for alias in shards()]
+
+
+def assign(applications):
+    """ Give new applications a shard map entry, spreading them over DATABASE_SHARDS by id """
+    aliases = getattr(settings, "DATABASE_SHARDS", ())
+    if not aliases:
+        return
+    ApplicationShard.objects.using(DEFAULT_DB_ALIAS).bulk_create([
+        ApplicationShard(application_id=application.pk, alias=aliases[application.pk % len(aliases)])
+        for application in applications
+    ], ignore_conflicts=True)
+    for application in applications:
+        shard_map.pop(application.pk)
+
+
+def delete_tenant_rows(application_id=None, user_id=None):
+    """
+    Delete, on the shards other than 'default', the rows of a deleted
+    application or user: foreign keys do not cascade across databases
+    """
+    for alias in shards():
+        if not is_remote(alias):
+            continue
+        if application_id is not None:
+            for model in (ApplicationUser, Role, AppPermission):
+                model.objects.using(alias).filter(application_id=application_id).delete()
+        else:
+            ApplicationUser.objects.using(alias).filter(user_id=user_id).delete()
+
+
+class ShardRouter:
+    """
+    DATABASE_ROUTERS entry, before ReplicaRouter: sends the tenant tables to
+    their application's shard. Tenants on 'default' are left to the next
+    router, so they keep using read replicas.
+    """
+
+    def _application_id(self, hints):
+        application_id = hints.get("application_id")
+        instance = hints.get("instance")
+        if application_id is None and instance is not None:
+            application_id = instance.pk if isinstance(instance, Application) else getattr(instance, "application_id", None)
+        return application_id
+
+    def _route(self, model, hints, write):
+        if not enabled():
+            return None
+        instance = hints.get("instance")
+        from_remote = instance is not None and is_remote(instance._state.db)
+        if model._meta.label_lower not in SHARDED_MODELS:
+            # Following a tenant row on another shard to its application or user
+            return DEFAULT_DB_ALIAS if from_remote else None
+        application_id = self._application_id(hints)
+        if application_id is None:
+            return None  # link and closure rows stay with the row they were reached from
+        alias, locked = shard_map.get(application_id)
+        if write and locked:
+            raise TenantMoving()
+        return alias if alias != DEFAULT_DB_ALIAS or from_remote else None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints, write=False)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints, write=True)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if enabled() and (obj1._meta.label_lower in SHARDED_MODELS) != (obj2._meta.label_lower in SHARDED_MODELS):
+            return True  # tenant rows point at the global applications and users from any shard
+        return None
@@ -0,0 +1,385 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from application import changelog, effective_permissions, routers, sharding
+from application.authentication import api_key_cache
+from application.blacklist import blacklist_filter
+from application.db import configure_sqlite_connection
+from application.manifest import manifest_cache
+from application.metrics import install_sql_metrics
+from application.models import Application, AppPermission, ApplicationUser, ChangeLogEntry, Role, RoleClosure
+from application.permissions import permission_cache
+
+
+# Sent, inside the writing transaction, after set-based writes that bypass per-row
+# signals (bulk_create, bulk_update, QuerySet.update).
+# Arguments: sender (the model), application_ids (set of ids touched) and, for
+# ApplicationUser writes that did not move memberships, optionally user_ids
+# (set of the members' users; every member may have changed when absent).
+bulk_changed = Signal()
+
+connection_created.connect(configure_sqlite_connection, dispatch_uid="application.configure_sqlite_connection")
+connection_created.connect(install_sql_metrics, dispatch_uid="application.install_sql_metrics")
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_save, sender=Role)
+@receiver(post_save, sender=AppPermission)
+@receiver(post_save, sender=ApplicationUser)
+@receiver(post_delete, sender=Application)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=AppPermission)
+@receiver(post_delete, sender=ApplicationUser)
+@receiver(m2m_changed, sender=Role.permissions.through)
+def pin_reads_to_primary(sender, using, action="post_save", **kwargs):
+    """
+    Read-your-writes: once the request or thread wrote the permission model,
+    it reads the primary (application.routers). The derived tables only
+    change along with these models.
+    """
+    if action.startswith("post_") and using == DEFAULT_DB_ALIAS:
+        routers.mark_written()
+
+
+@receiver(bulk_changed)
+def pin_reads_to_primary_after_bulk_writes(sender, **kwargs):
+    if sender._meta.label_lower in routers.REPLICATED_MODELS:
+        routers.mark_written()
+
+
+def invalidate(func, *args):
+    """
+    Run a cache invalidation now and again once the transaction commits, so a
+    reader that cached pre-commit rows in between cannot keep them.
+    """
+    func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver(pre_save, sender=Application)
+def remember_api_key_digest(sender, instance, using, **kwargs):
+    instance._previous_api_key_digest = None
+    if instance.pk is not None:
+        instance._previous_api_key_digest = (
+            sender.objects.using(using).filter(pk=instance.pk).values_list("API_KEY_DIGEST", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def invalidate_api_key(sender, instance, **kwargs):
+    # Also clears negative entries, so a freshly created key works immediately
+    invalidate(api_key_cache.invalidate, instance.API_KEY_DIGEST)
+    previous = getattr(instance, "_previous_api_key_digest", None)
+    if previous and previous != instance.API_KEY_DIGEST:
+        invalidate(api_key_cache.invalidate, previous)
+
+
+@receiver(pre_save, sender=ApplicationUser)
+def remember_membership_key(sender, instance, using, **kwargs):
+    """ Keep the key the row was stored under, in case save() moves it to another user or application """
+    instance._previous_membership_key = None
+    if instance.pk is not None:
+        instance._previous_membership_key = (
+            sender.objects.using(using).filter(pk=instance.pk).values_list("application_id", "user_id").first()
+        )
+
+
+@receiver(post_save, sender=ApplicationUser)
+@receiver(post_delete, sender=ApplicationUser)
+def invalidate_membership(sender, instance, **kwargs):
+    invalidate(permission_cache.invalidate, instance.application_id, instance.user_id)
+    previous = getattr(instance, "_previous_membership_key", None)
+    if previous and previous != (instance.application_id, instance.user_id):
+        invalidate(permission_cache.invalidate, *previous)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=AppPermission)
+@receiver(post_delete, sender=AppPermission)
+def invalidate_application_permissions(sender, instance, **kwargs):
+    invalidate(permission_cache.invalidate_application, instance.application_id)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permissions(sender, instance, action, **kwargs):
+    # `instance` is a Role, or an AppPermission when the reverse side is edited;
+    # both carry the application whose compiled permissions are now stale.
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate(permission_cache.invalidate_application, instance.application_id)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def sync_role_permission_masks(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """ Keep Role.permission_mask equal to the OR of its permissions' bits """
+    if not reverse:
+        role_ids = [instance.pk]
+    elif action == "pre_clear":
+        # The links are gone by post_clear, so remember which roles they pointed at
+        instance._cleared_role_ids = list(instance.roles.values_list("pk", flat=True))
+        return
+    elif action == "post_clear":
+        role_ids = instance._cleared_role_ids
+    else:
+        role_ids = pk_set or ()
+    if action in ("post_add", "post_remove", "post_clear"):
+        Role.recompute_permission_masks(role_ids, using=using)
+
+
+@receiver(pre_save, sender=Role)
+def remember_role_parent(sender, instance, using, **kwargs):
+    """ Keep the parent and liveness the row was stored with, to tell whether save() changes what it inherits """
+    instance._previous_inheritance = None
+    if instance.pk is not None:
+        instance._previous_inheritance = (
+            sender.objects.using(using).filter(pk=instance.pk).values_list("parent_id", "deleted_ts").first()
+        )
+
+
+@receiver(post_save, sender=Role)
+def maintain_role_closure(sender, instance, created, using, **kwargs):
+    """ Move the role's subtree in RoleClosure and refresh what it passes on: masks and effective permissions """
+    previous = getattr(instance, "_previous_inheritance", None)
+    if created:
+        RoleClosure.move(instance, created=True, using=using)
+        if instance.parent_id is None:
+            return  # nothing to inherit, nothing inherits from it yet
+    elif previous is not None and previous[0] != instance.parent_id:
+        RoleClosure.move(instance, using=using)
+    elif previous is not None and (previous[1] is None) == (instance.deleted_ts is None):
+        return
+    Role.recompute_permission_masks([instance.pk], using=using)
+    if not created:
+        effective_permissions.refresh_roles([instance.pk], using=using)
+
+
+@receiver(bulk_changed, sender=Role)
+def rebuild_role_closure(sender, application_ids, **kwargs):
+    # Bulk writes may create roles, move them or change which are alive; only
+    # roles with a parent inherit anything, so only their masks can change
+    for using, ids in sharding.by_database(application_ids).items():
+        Role.recompute_permission_masks(RoleClosure.rebuild(ids, using=using), using=using)
+
+
+@receiver(pre_delete, sender=AppPermission)
+def remember_permission_roles(sender, instance, **kwargs):
+    instance._role_ids = list(instance.roles.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=AppPermission)
+def clear_deleted_permission_bit(sender, instance, using, **kwargs):
+    # Deleting the join rows does not send m2m_changed; without this the bit
+    # would stay set and be inherited by the next permission that reuses it.
+    Role.recompute_permission_masks(getattr(instance, "_role_ids", ()), using=using)
+
+
+@receiver(bulk_changed)
+def invalidate_bulk_changes(sender, application_ids, **kwargs):
+    for application_id in application_ids:
+        invalidate(permission_cache.invalidate_application, application_id)
+    if sender is Application:
+        digests = Application.objects.filter(pk__in=application_ids).values_list("API_KEY_DIGEST", flat=True)
+        for digest in digests:
+            invalidate(api_key_cache.invalidate, digest)
+
+
+# Change-data-capture feed (see application.changelog)
+
+CHANGELOG_MODELS = {
+    Application: "application", Role: "role", AppPermission: "permission", ApplicationUser: "member",
+}
+
+
+def changelog_data(instance):
+    """ Current state of the row, so the latest entry per object is enough to sync it """
+    if isinstance(instance, Application):
+        return {"name": instance.name}
+    if isinstance(instance, Role):
+        return {"name": instance.name, "parent": instance.parent_id}
+    if isinstance(instance, AppPermission):
+        return {"name": instance.name, "bit_index": instance.bit_index}
+    return {"user": instance.user_id, "role": instance.role_id}
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_save, sender=Role)
+@receiver(post_save, sender=AppPermission)
+@receiver(post_save, sender=ApplicationUser)
+def record_save(sender, instance, created, using, **kwargs):
+    application_id = instance.pk if sender is Application else instance.application_id
+    if instance.deleted_ts is not None:
+        action, data = ChangeLogEntry.DELETED, {}
+    else:
+        action = ChangeLogEntry.CREATED if created else ChangeLogEntry.UPDATED
+        data = changelog_data(instance)
+    changelog.record(application_id, CHANGELOG_MODELS[sender], instance.pk, action, data, using=using)
+    previous = getattr(instance, "_previous_membership_key", None)
+    if previous and previous[0] != instance.application_id:
+        # Moved to another application: it left the old one
+        changelog.record(previous[0], "member", instance.pk, ChangeLogEntry.DELETED, using=using)
+
+
+@receiver(post_delete, sender=Application)
+@receiver(post_delete, sender=Role)
+@receiver(post_delete, sender=AppPermission)
+@receiver(post_delete, sender=ApplicationUser)
+def record_delete(sender, instance, using, **kwargs):
+    application_id = instance.pk if sender is Application else instance.application_id
+    changelog.record(application_id, CHANGELOG_MODELS[sender], instance.pk, ChangeLogEntry.DELETED, using=using)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def record_role_permissions(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        role_ids = [instance.pk]
+    elif action == "post_clear":
+        role_ids = instance._cleared_role_ids  # remembered by sync_role_permission_masks
+    else:
+        role_ids = list(pk_set or ())
+    for role_id, (application_id, permission_ids) in changelog.role_permissions(role_ids, using=using).items():
+        changelog.record(application_id, "role_permissions", role_id, ChangeLogEntry.UPDATED,
+                         {"permissions": permission_ids}, using=using)
+
+
+@receiver(bulk_changed)
+def record_bulk_changes(sender, application_ids, **kwargs):
+    # Set-based writes do not say which rows changed: clients resync the model
+    for application_id in application_ids:
+        changelog.record(application_id, CHANGELOG_MODELS[sender], None, ChangeLogEntry.BULK)
+
+
+# Manifest revisions (see application.manifest)
+
+def bump_revisions(application_ids, using="default"):
+    """
+    Bump each application once per transaction: readers only see the new
+    revision when it commits, together with every other change it made.
+    """
+    connection = connections[using]
+    application_ids = set(application_ids)
+    if connection.in_atomic_block:
+        # run_on_commit is a new list after every commit, rollback and
+        # savepoint rollback, so it tells whether an earlier bump still stands
+        scope = connection.run_on_commit
+        bumped = getattr(connection, "_bumped_revisions", None)
+        if bumped is None or bumped[0] is not scope:
+            bumped = connection._bumped_revisions = (scope, set())
+        application_ids -= bumped[1]
+        bumped[1].update(application_ids)
+    Application.bump_revisions(application_ids, using=sharding.global_database(using))
+    for application_id in application_ids:
+        invalidate(manifest_cache.pop, application_id)
+
+
+@receiver(post_save, sender=Application)
+def bump_application_revision(sender, instance, created, using, **kwargs):
+    if not created:
+        bump_revisions([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=AppPermission)
+@receiver(post_delete, sender=AppPermission)
+def bump_child_revision(sender, instance, using, **kwargs):
+    bump_revisions([instance.application_id], using=using)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def bump_role_permissions_revision(sender, instance, action, using, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_revisions([instance.application_id], using=using)
+
+
+@receiver(bulk_changed)
+def bump_bulk_revisions(sender, application_ids, **kwargs):
+    if sender is not ApplicationUser:  # members are not part of the manifest
+        bump_revisions(application_ids)
+
+
+
+# Materialized effective permissions (see application.effective_permissions)
+
+@receiver(post_save, sender=ApplicationUser)
+@receiver(post_delete, sender=ApplicationUser)
+def refresh_member_permissions(sender, instance, using, **kwargs):
+    effective_permissions.refresh(instance.application_id, [instance.user_id], using=using)
+    previous = getattr(instance, "_previous_membership_key", None)
+    if previous and previous != (instance.application_id, instance.user_id):
+        effective_permissions.refresh(previous[0], [previous[1]], using=using)
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def refresh_role_permission_members(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        role_ids = [instance.pk]
+        permission_ids = None if action == "post_clear" else pk_set
+    else:
+        role_ids = instance._cleared_role_ids if action == "post_clear" else list(pk_set or ())
+        permission_ids = [instance.pk]
+    effective_permissions.refresh_roles(role_ids, permission_ids, using=using)
+
+
+@receiver(pre_save, sender=AppPermission)
+def remember_permission_liveness(sender, instance, using, **kwargs):
+    instance._previous_deleted_ts = None
+    if instance.pk is not None:
+        instance._previous_deleted_ts = sender.objects.using(using).filter(pk=instance.pk).values_list("deleted_ts", flat=True).first()
+
+
+@receiver(post_save, sender=AppPermission)
+def refresh_permission_holders(sender, instance, created, using, **kwargs):
+    if not created and (instance._previous_deleted_ts is None) != (instance.deleted_ts is None):
+        role_ids = list(instance.roles.using(using).values_list("pk", flat=True))
+        effective_permissions.refresh_roles(role_ids, [instance.pk], using=using)
+
+
+@receiver(bulk_changed)
+def refresh_bulk_effective_permissions(sender, application_ids, user_ids=None, **kwargs):
+    if sender is Application:
+        return  # applications' own columns grant nothing
+    for application_id in application_ids:
+        using = sharding.database_for(application_id)
+        if sender is ApplicationUser and user_ids is not None:
+            effective_permissions.refresh(application_id, user_ids, using=using)
+        else:
+            effective_permissions.refresh_application(application_id, using=using)
+
+
+# Tenant sharding (see application.sharding)
+
+@receiver(post_save, sender=Application)
+def assign_application_shard(sender, instance, created, **kwargs):
+    if created:
+        sharding.assign([instance])
+
+
+@receiver(pre_delete, sender=Application)
+def delete_application_tenant_rows(sender, instance, **kwargs):
+    sharding.delete_tenant_rows(application_id=instance.pk)
+
+
+@receiver(post_delete, sender=Application)
+def forget_application_shard(sender, instance, **kwargs):
+    sharding.shard_map.pop(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_tenant_rows(sender, instance, **kwargs):
+    sharding.delete_tenant_rows(user_id=instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    # Adding a jti whose transaction then rolls back only costs a false positive
+    if created:
+        blacklist_filter.add(instance.token.jti)
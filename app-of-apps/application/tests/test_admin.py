@@ -0,0 +1,72 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from application.models import Application, ApplicationUser
+from application.pagination import EstimatedCountPaginator
+
+CHANGELIST = "/admin/application/applicationuser/"
+
+
+@pytest.fixture
+def admin_client(create_users):
+    _, admin_user, _ = create_users
+    client = Client()
+    client.force_login(admin_user)
+    return client
+
+
+def changelist_queries(client, url=CHANGELIST):
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(url).status_code == 200
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_changelist_queries_do_not_grow_with_rows(admin_client, create_application, create_application_users,
+                                                  create_roles):
+    """Test that the membership changelist costs the same with 3 rows as with 23."""
+    few = changelist_queries(admin_client)
+    _, viewer_role = create_roles
+    for i in range(20):
+        user = User.objects.create(username=f"member-{i}")
+        ApplicationUser.objects.create(application=create_application, user=user, role=viewer_role)
+    assert changelist_queries(admin_client) == few
+
+
+@pytest.mark.django_db
+def test_filter_choices_are_bounded(admin_client, settings, create_users, create_application):
+    """Test that a filter lists at most ADMIN_FILTER_MAX_CHOICES applications, plus the selected one, current."""
+    settings.ADMIN_FILTER_MAX_CHOICES = 2
+    Application.objects.create(user=create_users[2], name="SalesApp")
+    other = Application.objects.create(user=create_users[2], name="SupportApp")
+    page = admin_client.get(CHANGELIST).content.decode()
+    assert "SupportApp - developer" in page and "FinanceApp - developer" not in page  # newest first
+    page = admin_client.get(f"{CHANGELIST}?application__id__exact={create_application.pk}").content.decode()
+    assert "SupportApp - developer" in page and "FinanceApp - developer" in page
+    other.name = "RenamedApp"
+    other.save()
+    assert "RenamedApp - developer" in admin_client.get(CHANGELIST).content.decode()
+
+
+@pytest.mark.django_db
+def test_role_filter_follows_application_filter(admin_client, create_application, create_application_users):
+    """Test that role choices only appear, and only for that application, once an application is picked."""
+    assert "By role" not in admin_client.get(CHANGELIST).content.decode()
+    page = admin_client.get(f"{CHANGELIST}?application__id__exact={create_application.pk}").content.decode()
+    assert "By role" in page and "Viewer (FinanceApp)" in page
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator(settings, create_application_users):
+    """Test capped counts for filtered lists and planner estimates for whole tables."""
+    settings.ADMIN_EXACT_COUNT_LIMIT = 2
+    filtered = ApplicationUser.objects.filter(application=create_application_users[0].application)
+    assert EstimatedCountPaginator(filtered.order_by("pk"), 100).count == 2
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    assert EstimatedCountPaginator(ApplicationUser.objects.order_by("pk"), 100).count == 3
+    assert EstimatedCountPaginator(Application.objects.order_by("pk"), 100).count == 1  # below the limit: exact
@@ -0,0 +1,164 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from application.models import ApplicationUser
+from application.pagination import after_cursor
+
+
+@pytest.fixture
+def owner_client(create_users):
+    _, _, developer_user = create_users
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(developer_user)}")
+    return client
+
+
+@pytest.mark.django_db
+def test_members_pages_in_created_order(owner_client, create_application, create_application_users):
+    """Test that following `next` walks every member exactly once."""
+    url = f"/api/applications/{create_application.pk}/members/?page_size=2"
+    seen = []
+    while url:
+        response = owner_client.get(url)
+        assert response.status_code == 200
+        seen += [row["username"] for row in response.data["results"]]
+        url = response.data["next"]
+    assert seen == ["normal", "admin", "developer"]
+
+
+@pytest.mark.django_db
+def test_deep_pages_cost_constant_queries(owner_client, create_application, create_application_users):
+    """Test that a page with a cursor costs the same number of queries as the first page."""
+    url = f"/api/applications/{create_application.pk}/members/?page_size=1"
+    with CaptureQueriesContext(connection) as first_page:
+        next_url = owner_client.get(url).data["next"]
+    with CaptureQueriesContext(connection) as second_page:
+        owner_client.get(next_url)
+    assert len(first_page) == len(second_page) == 3  # user + application + page
+
+
+@pytest.mark.django_db
+def test_roles_include_permission_names(owner_client, create_application, create_roles):
+    """Test role listing with prefetched permission names."""
+    response = owner_client.get(f"/api/applications/{create_application.pk}/roles/")
+    roles = {row["name"]: sorted(row["permissions"]) for row in response.json()["results"]}
+    assert roles == {"Admin": ["Create Reports", "View Reports"], "Viewer": ["View Reports"]}
+
+
+@pytest.mark.django_db
+def test_api_key_client_reads_its_own_application(create_application, create_permissions):
+    """Test that an application can list its own permissions with its API key."""
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    response = client.get(f"/api/applications/{create_application.pk}/permissions/")
+    assert response.status_code == 200
+    assert len(response.data["results"]) == 2
+
+
+@pytest.mark.django_db
+def test_api_key_is_not_a_user_login(create_application):
+    """Test that the user endpoints of dj_rest_auth do not accept an API key."""
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    assert client.get("/auth/user/").status_code == 401
+    assert client.post("/auth/password/change/", {}).status_code == 401
+
+
+@pytest.mark.django_db
+def test_other_users_are_forbidden(create_users, create_application):
+    """Test that non-owners cannot list an application's members."""
+    normal_user, _, _ = create_users
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(normal_user)}")
+    assert client.get(f"/api/applications/{create_application.pk}/members/").status_code == 403
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(owner_client, create_application):
+    """Test that a garbled cursor is a 404, not a server error."""
+    response = owner_client.get(f"/api/applications/{create_application.pk}/members/?cursor=garbage")
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_cursor_seeks_into_index(create_application_users):
+    """Test that the cursor predicate is an index range, not a scan."""
+    first = create_application_users[0]
+    queryset = after_cursor(ApplicationUser.alive.filter(application_id=first.application_id),
+                            (first.created_ts, first.pk)).order_by("created_ts", "pk")
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = " ".join(str(row) for row in cursor.fetchall())
+    assert "appuser_app_alive_idx (application_id=? AND created_ts>?)" in plan
+
+
+@pytest.mark.django_db
+def test_batch_permission_check(create_application, create_application_users, create_users):
+    """Test per-pair answers from a fixed number of queries."""
+    normal_user, admin_user, _ = create_users
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    checks = [
+        {"user": admin_user.pk, "permission": "Create Reports"},
+        {"user": normal_user.pk, "permission": "Create Reports"},
+        {"user": normal_user.pk, "permission": "View Reports"},
+        {"user": normal_user.pk, "permission": "Unknown"},
+        {"user": 999, "permission": "View Reports"},
+    ]
+    url = f"/api/applications/{create_application.pk}/check"
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(url, {"checks": checks}, format="json")
+    assert response.status_code == 200
+    assert [row["allowed"] for row in response.json()["results"]] == [True, False, True, False, False]
+    assert response.json()["server_time_ms"] >= 0
+    assert response["Server-Timing"].startswith("check;dur=")
+    assert len(queries) == 4  # API key (first use), application, permission bits, role masks
+
+
+@pytest.mark.django_db
+def test_batch_permission_check_limit(owner_client, create_application):
+    """Test that oversized batches are rejected."""
+    checks = [{"user": 1, "permission": "View Reports"}] * 501
+    response = owner_client.post(f"/api/applications/{create_application.pk}/check/", {"checks": checks},
+                                 format="json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_membership_lookup(owner_client, create_application, create_application_users, create_users):
+    """Test the async single-membership lookup."""
+    _, admin_user, _ = create_users
+    url = f"/api/applications/{create_application.pk}/members/{admin_user.pk}/"
+    response = owner_client.get(url)
+    assert response.status_code == 200
+    assert (response.json()["username"], response.json()["role_name"]) == ("admin", "Admin")
+    assert owner_client.get(f"/api/applications/{create_application.pk}/members/999/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_views_authenticate(create_application, create_users):
+    """Test DRF-shaped 401/403 answers from the async views."""
+    normal_user, _, _ = create_users
+    url = f"/api/applications/{create_application.pk}/roles/"
+    response = APIClient().get(url)
+    assert (response.status_code, response["WWW-Authenticate"]) == (401, 'Bearer realm="api"')
+    assert APIClient().get(url, HTTP_X_API_KEY="0" * 32).status_code == 401
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(normal_user)}")
+    assert client.get(url).json() == {"detail": "You do not have permission to perform this action."}
+
+
+@pytest.mark.django_db
+def test_async_client(create_application, create_roles):
+    """Test the roles endpoint through Django's async (ASGI) request path."""
+    response = async_to_sync(AsyncClient().get)(f"/api/applications/{create_application.pk}/roles/",
+                                       headers={"X-API-Key": create_application.API_KEY})
+    assert response.status_code == 200
+    assert {row["name"] for row in response.json()["results"]} == {"Admin", "Viewer"}
@@ -0,0 +1,80 @@
+import pytest
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from application.authentication import APIKeyAuthentication, api_key_cache
+from application.models import Application, hash_api_key
+
+
+@pytest.fixture(autouse=True)
+def clear_api_key_cache():
+    api_key_cache.clear()
+    yield
+    api_key_cache.clear()
+
+
+def authenticate(**headers):
+    request = APIRequestFactory().get("/", **headers)
+    return APIKeyAuthentication().authenticate(request)
+
+
+@pytest.mark.django_db
+def test_digest_is_stored(create_application):
+    """Test that saving an application stores the digest of its key."""
+    app = create_application
+    assert app.API_KEY_DIGEST == hash_api_key(app.API_KEY)
+    assert Application.objects.get(API_KEY_DIGEST=hash_api_key(app.API_KEY)) == app
+
+
+@pytest.mark.django_db
+def test_authenticate_with_header(create_application):
+    """Test both supported header forms."""
+    app = create_application
+    user, auth = authenticate(HTTP_X_API_KEY=app.API_KEY)
+    assert auth == app
+    assert user.is_authenticated and user.application == app
+
+    _, auth = authenticate(HTTP_AUTHORIZATION=f"Api-Key {app.API_KEY}")
+    assert auth == app
+
+
+@pytest.mark.django_db
+def test_no_key_is_not_handled(create_application):
+    """Test that requests without a key are left to other authenticators."""
+    assert authenticate() is None
+    assert authenticate(HTTP_AUTHORIZATION="Bearer abc") is None
+
+
+@pytest.mark.django_db
+def test_known_key_is_cached(create_application, django_assert_num_queries):
+    """Test that a resolved key is served from the cache."""
+    app = create_application
+    authenticate(HTTP_X_API_KEY=app.API_KEY)
+    with django_assert_num_queries(0):
+        assert authenticate(HTTP_X_API_KEY=app.API_KEY)[1] == app
+
+
+@pytest.mark.django_db
+def test_unknown_key_is_negatively_cached(db, django_assert_num_queries):
+    """Test that repeated bad keys and malformed keys skip the database."""
+    bad_key = "0" * 32
+    with django_assert_num_queries(1):
+        with pytest.raises(AuthenticationFailed):
+            authenticate(HTTP_X_API_KEY=bad_key)
+    with django_assert_num_queries(0):
+        with pytest.raises(AuthenticationFailed):
+            authenticate(HTTP_X_API_KEY=bad_key)
+        with pytest.raises(AuthenticationFailed):
+            authenticate(HTTP_X_API_KEY="not-a-key")
+
+
+@pytest.mark.django_db
+def test_soft_deleted_application_is_rejected(create_application):
+    """Test that soft-deleting an application evicts its cached key."""
+    app = create_application
+    authenticate(HTTP_X_API_KEY=app.API_KEY)
+    app.deleted_ts = timezone.now()
+    app.save()
+    with pytest.raises(AuthenticationFailed):
+        authenticate(HTTP_X_API_KEY=app.API_KEY)
@@ -0,0 +1,45 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from application.management.commands.bench import compare, percentile
+
+
+@pytest.mark.django_db
+def test_bench_writes_results(tmp_path):
+    """Test that every scenario runs on a small dataset and lands in the JSON results."""
+    output = tmp_path / "bench.json"
+    call_command("bench", use_existing_db=True, apps=2, users=20, roles_per_app=2, perms_per_app=4,
+                 members_per_app=10, iterations=5, login_iterations=2, output=str(output), stdout=StringIO())
+    results = json.loads(output.read_text())
+    assert set(results["scenarios"]) == {
+        "membership_lookup", "permission_resolution_cold", "permission_resolution_cached", "role_assignment",
+        "api_key_resolution_cold", "api_key_resolution_cached", "admin_changelist", "jwt_login",
+    }
+    assert results["scenarios"]["permission_resolution_cached"]["queries"]["max"] == 0
+    assert results["scenarios"]["permission_resolution_cold"]["queries"]["min"] == 1
+    assert results["meta"]["dataset"]["apps"] == 2
+
+
+@pytest.mark.django_db
+def test_bench_is_not_throttled(tmp_path, settings):
+    """Test that more API-key requests than the default burst are not rejected by the rate limit."""
+    output = tmp_path / "bench.json"
+    call_command("bench", use_existing_db=True, apps=1, users=10, roles_per_app=2, perms_per_app=2,
+                 members_per_app=5, iterations=settings.THROTTLE_DEFAULT_BURST + 20, only=["membership_lookup"],
+                 output=str(output), stdout=StringIO())
+    assert json.loads(output.read_text())["scenarios"]["membership_lookup"]["latency_ms"]["p50"] > 0
+
+
+def test_compare_flags_regressions():
+    """Test that slower p95s beyond the tolerance and extra queries are reported."""
+    def result(p95, queries):
+        return {"scenarios": {"lookup": {"latency_ms": {"p95": p95}, "queries": {"mean": queries}}}}
+
+    assert compare(result(1.0, 2), result(1.1, 2), tolerance=0.2) == []
+    assert compare(result(1.0, 2), result(1.5, 3), tolerance=0.2) == [
+        "lookup: p95 1.000 ms -> 1.500 ms", "lookup: queries 2 -> 3",
+    ]
+    assert [percentile(list(range(1, 101)), p) for p in (50, 95, 99)] == [50, 95, 99]
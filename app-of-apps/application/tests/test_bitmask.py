@@ -0,0 +1,71 @@
+import pytest
+
+from application import bulk
+from application.models import AppPermission, Role
+
+
+def mask_of(role):
+    return Role.objects.values_list("permission_mask", flat=True).get(pk=role.pk)
+
+
+@pytest.mark.django_db
+def test_bit_indexes_are_sequential_per_application(create_permissions):
+    """Test that each permission gets the next free bit of its application."""
+    create_perm, view_perm = create_permissions
+    assert (create_perm.bit_index, view_perm.bit_index) == (0, 1)
+    extra = bulk.bulk_create(AppPermission, [AppPermission(application=create_perm.application, name=f"p{i}")
+                                             for i in range(3)])
+    assert [perm.bit_index for perm in extra] == [2, 3, 4]
+
+
+@pytest.mark.django_db
+def test_role_masks_follow_m2m_changes(create_roles, create_permissions):
+    """Test that add/remove/clear from either side keep the mask in sync."""
+    admin_role, viewer_role = create_roles
+    create_perm, view_perm = create_permissions
+    assert mask_of(admin_role) == 0b11
+    assert mask_of(viewer_role) == 0b10
+
+    viewer_role.permissions.add(create_perm)
+    assert mask_of(viewer_role) == 0b11
+    view_perm.roles.remove(viewer_role)
+    assert mask_of(viewer_role) == 0b01
+    create_perm.roles.clear()
+    assert (mask_of(admin_role), mask_of(viewer_role)) == (0b10, 0)
+
+
+@pytest.mark.django_db
+def test_permission_delete_clears_bit(create_roles, create_permissions):
+    """Test that deleting a permission removes its bit from every role."""
+    admin_role, _ = create_roles
+    create_perm, _ = create_permissions
+    create_perm.delete()
+    assert mask_of(admin_role) == 0b10
+
+
+@pytest.mark.django_db
+def test_has_permissions(create_application, create_roles):
+    """Test constant-time checks against compiled masks."""
+    app = create_application
+    admin_role, viewer_role = (Role.objects.get(pk=role.pk) for role in create_roles)
+    both = app.compile_mask(["Create Reports", "View Reports"])
+    view = app.compile_mask(["View Reports"])
+
+    assert admin_role.has_permissions(both)
+    assert viewer_role.has_permissions(view)
+    assert not viewer_role.has_permissions(both)
+    with pytest.raises(AppPermission.DoesNotExist):
+        app.compile_mask(["Delete Reports"])
+
+
+@pytest.mark.django_db
+def test_masks_wider_than_64_bits(create_application, create_roles):
+    """Test that applications with hundreds of permissions round-trip through the database."""
+    app = create_application
+    admin_role, _ = create_roles
+    perms = bulk.bulk_create(AppPermission, [AppPermission(application=app, name=f"p{i}") for i in range(300)])
+    admin_role.permissions.add(*perms)
+
+    role = Role.objects.get(pk=admin_role.pk)
+    assert role.permission_mask.bit_length() == 302
+    assert role.has_permissions(app.compile_mask(["p299", "Create Reports"]))
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from application.blacklist import BlacklistFilter, BloomFilter, blacklist_filter
+from application.tokens import ClaimsRefreshToken
+
+
+@pytest.fixture(autouse=True)
+def fresh_filter():
+    blacklist_filter.clear()
+    yield
+    blacklist_filter.clear()
+
+
+def test_bloom_filter_false_positive_rate():
+    """Test that a filter filled to capacity stays near its configured error rate."""
+    bloom = BloomFilter(10_000, 0.01)
+    for i in range(10_000):
+        bloom.add(f"member-{i}")
+    assert all(f"member-{i}" in bloom for i in range(10_000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 200
+    assert bloom.nbytes < 12_000 and 0.005 < bloom.false_positive_rate() < 0.02
+
+
+@pytest.mark.django_db
+def test_refresh_skips_the_blacklist_query(create_users):
+    """Test that a token the filter rules out is refreshed without the blacklist join."""
+    _, admin_user, _ = create_users
+    refresh = str(ClaimsRefreshToken.for_user(admin_user))
+    blacklist_filter.refresh()
+    with CaptureQueriesContext(connection) as captured:
+        response = APIClient().post("/auth/token/refresh/", {"refresh": refresh})
+    assert response.status_code == 200
+    assert not [q for q in captured if "token_blacklist_blacklistedtoken" in q["sql"]]
+    assert blacklist_filter.stats()["checks"] == 1
+
+
+@pytest.mark.django_db
+def test_logout_blacklists_immediately(create_users):
+    """Test that a token blacklisted in this process is refused at once."""
+    _, admin_user, _ = create_users
+    refresh = ClaimsRefreshToken.for_user(admin_user)
+    blacklist_filter.refresh()
+    RefreshToken(str(refresh)).blacklist()  # what dj_rest_auth's logout does
+    response = APIClient().post("/auth/token/refresh/", {"refresh": str(refresh)})
+    assert response.status_code == 401
+    assert blacklist_filter.stats()["database_checks"] == 1
+
+
+@pytest.mark.django_db
+def test_sync_picks_up_other_processes(create_users):
+    """Test that rows written behind the filter's back are found by the next sync."""
+    _, admin_user, _ = create_users
+    now = [0.0]
+    jti_filter = BlacklistFilter(capacity=100, error_rate=0.01, sync_interval=5, rebuild_interval=60,
+                                 timer=lambda: now[0])
+    token = ClaimsRefreshToken.for_user(admin_user)
+    jti = token["jti"]
+    assert not jti_filter.might_contain(jti)
+    BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))  # no signal reaches jti_filter
+    assert not jti_filter.might_contain(jti)
+    now[0] = 5
+    assert jti_filter.might_contain(jti)
+
+
+@pytest.mark.django_db
+def test_sync_picks_up_late_commits(create_users):
+    """Test that a row committed after the sync passed its id and timestamp is still found."""
+    _, admin_user, _ = create_users
+    now = [0.0]
+    jti_filter = BlacklistFilter(capacity=100, error_rate=0.01, sync_interval=5, rebuild_interval=60, sync_margin=60,
+                                 timer=lambda: now[0])
+    early, late = (ClaimsRefreshToken.for_user(admin_user)["jti"] for _ in range(2))
+    jti_filter.refresh()
+    BlacklistedToken.objects.create(pk=1000, token=OutstandingToken.objects.get(jti=early))
+    now[0] = 5
+    assert jti_filter.might_contain(early)
+
+    # A concurrent writer's transaction commits a lower id with an older timestamp
+    BlacklistedToken.objects.create(pk=500, token=OutstandingToken.objects.get(jti=late))
+    BlacklistedToken.objects.filter(pk=500).update(blacklisted_at=timezone.now() - timedelta(seconds=30))
+    now[0] = 10
+    assert jti_filter.might_contain(late)
+
+
+@pytest.mark.django_db
+def test_prune_tokens(create_users):
+    """Test that expired outstanding and blacklisted tokens are deleted in chunks and live ones kept."""
+    _, admin_user, _ = create_users
+    now = timezone.now()
+    tokens = OutstandingToken.objects.bulk_create([
+        OutstandingToken(user=admin_user, jti=f"jti-{i}", token="", expires_at=now + timedelta(days=-1 if i < 5 else 1))
+        for i in range(8)
+    ])
+    BlacklistedToken.objects.bulk_create([BlacklistedToken(token=token) for token in tokens[3:6]])
+
+    out = StringIO()
+    call_command("prune_tokens", chunk_size=2, stdout=out)
+    assert "Deleted 5 outstanding and 2 blacklisted tokens" in out.getvalue()
+    assert sorted(OutstandingToken.objects.values_list("jti", flat=True)) == ["jti-5", "jti-6", "jti-7"]
+    assert BlacklistedToken.objects.get().token.jti == "jti-5"
@@ -0,0 +1,60 @@
+import pytest
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from application import bulk
+from application.authorization import authorization_context
+from application.models import Application, AppPermission, Role, RoleClosure, hash_api_key
+
+
+@pytest.mark.django_db
+def test_bulk_create_roles_checks_owner_once(create_application):
+    """Test that a bulk insert costs the owner and group queries, the INSERT, a revision bump, 3 closure and 2 member queries."""
+    app = create_application
+    roles = [Role(application=app, name=f"Role {i}") for i in range(50)]
+    with CaptureQueriesContext(connection) as queries:
+        bulk.bulk_create(Role, roles)
+    assert len([q for q in queries if "SAVEPOINT" not in q["sql"]]) == 9
+    assert Role.objects.filter(application=app).count() == 50
+    assert RoleClosure.objects.filter(descendant__application=app, depth=0).count() == 50
+
+
+@pytest.mark.django_db
+def test_bulk_create_rejects_non_developer_owner(create_users):
+    """Test that bulk helpers apply the same rule as save()."""
+    normal_user, _, developer_user = create_users
+    apps = [Application(user=developer_user, name="Ok"), Application(user=normal_user, name="Nope")]
+    with pytest.raises(PermissionDenied):
+        bulk.bulk_create(Application, apps)
+    assert not Application.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_create_applications_sets_digest(create_users):
+    """Test that bulk-created applications get their API key digest."""
+    _, _, developer_user = create_users
+    app, = bulk.bulk_create(Application, [Application(user=developer_user, name="Bulk")])
+    assert Application.objects.get(name="Bulk").API_KEY_DIGEST == hash_api_key(app.API_KEY)
+
+
+@pytest.mark.django_db
+def test_bulk_update_permissions(create_permissions):
+    """Test bulk updates of guarded models."""
+    perms = list(create_permissions)
+    for perm in perms:
+        perm.description = "updated"
+    assert bulk.bulk_update(AppPermission, perms, ["description"]) == 2
+    assert set(AppPermission.objects.values_list("description", flat=True)) == {"updated"}
+
+
+@pytest.mark.django_db
+def test_context_memoizes_save(create_application):
+    """Test that save() inside a context checks each owner only once."""
+    app = Application.objects.get(pk=create_application.pk)  # no cached `user`
+    with authorization_context():
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(10):
+                Role(application_id=app.pk, name=f"Role {i}").save()
+    authorization_queries = [q for q in queries if q["sql"].startswith("SELECT")]
+    assert len(authorization_queries) == 2
@@ -0,0 +1,135 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from application import changelog
+from application.models import ApplicationUser, ChangeLogEntry, Role
+
+
+@pytest.fixture
+def feed_client(create_application):
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    return client
+
+
+def changes(client, application, **params):
+    return client.get("/api/changes", {"application": application.pk, **params})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_entries_are_written_once_at_commit(create_application, create_users):
+    """Test that a transaction's entries are buffered into one INSERT and dropped on rollback."""
+    app = create_application
+    normal_user, admin_user, _ = create_users
+    start = ChangeLogEntry.objects.count()
+    with CaptureQueriesContext(connection) as captured:
+        with transaction.atomic():
+            role = Role.objects.create(application=app, name="Editor")
+            ApplicationUser.objects.create(application=app, user=normal_user, role=role)
+            try:
+                with transaction.atomic():
+                    ApplicationUser.objects.create(application=app, user=admin_user, role=role)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            assert ChangeLogEntry.objects.count() == start
+    inserts = [q for q in captured if q["sql"].startswith('INSERT INTO "application_changelogentry"')]
+    assert len(inserts) == 1
+    entries = list(ChangeLogEntry.objects.filter(pk__gt=start).values_list("model", "action"))
+    assert entries == [("role", "created"), ("member", "created")]
+
+    with transaction.atomic():
+        Role.objects.create(application=app, name="Discarded")
+        transaction.set_rollback(True)
+    assert not ChangeLogEntry.objects.filter(data__name="Discarded").exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feed_since_cursor(feed_client, create_application, create_roles, create_permissions):
+    """Test the cursor handshake, full-state role permission entries and paging."""
+    app = create_application
+    admin_role, viewer_role = create_roles
+    create_perm, view_perm = create_permissions
+    cursor = changes(feed_client, app).json()["cursor"]
+
+    viewer_role.permissions.add(create_perm)
+    view_perm.roles.remove(admin_role)
+    Role.objects.filter(pk=viewer_role.pk).soft_delete()
+
+    body = changes(feed_client, app, since=cursor, limit=2).json()
+    assert body["has_more"] is True
+    assert [(e["model"], e["object_id"], e["data"]) for e in body["results"]] == [
+        ("role_permissions", viewer_role.pk, {"permissions": sorted([create_perm.pk, view_perm.pk])}),
+        ("role_permissions", admin_role.pk, {"permissions": [create_perm.pk]}),
+    ]
+    body = changes(feed_client, app, since=body["cursor"]).json()
+    assert body["has_more"] is False
+    assert [(e["model"], e["object_id"], e["action"]) for e in body["results"]] == [("role", None, "bulk")]
+    assert changes(feed_client, app, since=body["cursor"]).json()["results"] == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_feed_is_scoped_to_the_caller(create_users, create_application):
+    """Test that other users cannot read an application's feed and that parameters are validated."""
+    normal_user, _, _ = create_users
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(normal_user)}")
+    assert changes(client, create_application, since=0).status_code == 403
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    assert changes(client, create_application, since=-1).status_code == 400
+    assert changes(client, create_application, wait=3600).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_long_poll_times_out_at_head(feed_client, create_application):
+    """Test that an idle wait returns no entries and advances the cursor to the head."""
+    head = changes(feed_client, create_application).json()["cursor"]
+    assert head == ChangeLogEntry.objects.latest("pk").pk
+    body = changes(feed_client, create_application, since=head, wait=0.05).json()
+    assert body == {"cursor": head, "results": [], "has_more": False}
+
+
+def test_notifier_wakes_waiters_from_other_threads():
+    """Test that a write notified from another thread wakes only that application's waiters."""
+    notifier = changelog.ChangeNotifier()
+
+    async def wait():
+        with notifier.listen(1) as changed, notifier.listen(2) as other:
+            threading.Thread(target=notifier.notify, args=({1},)).start()
+            await changed.wait()
+            return other.is_set()
+
+    assert async_to_sync(wait)() is False
+    assert not notifier._waiters
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retention_and_compaction(feed_client, create_application, create_roles):
+    """Test that compaction keeps the newest entry per object and retention expires old cursors."""
+    app = create_application
+    admin_role, _ = create_roles
+    for name in ("Admin 2", "Admin 3"):
+        admin_role.name = name
+        admin_role.save()
+    ChangeLogEntry.objects.update(created_ts=ChangeLogEntry.objects.latest("pk").created_ts - timedelta(hours=2))
+    newest = ChangeLogEntry.objects.latest("pk").pk
+
+    call_command("compact_changelog", retention_days=1, compact_after_hours=1, stdout=StringIO())
+    role_entries = ChangeLogEntry.objects.filter(model="role", object_id=admin_role.pk)
+    assert list(role_entries.values_list("data__name", flat=True)) == ["Admin 3"]
+
+    ChangeLogEntry.objects.update(created_ts=ChangeLogEntry.objects.latest("pk").created_ts - timedelta(days=2))
+    call_command("compact_changelog", retention_days=1, stdout=StringIO())
+    assert list(ChangeLogEntry.objects.values_list("pk", flat=True)) == [newest]
+    assert changes(feed_client, app, since=0).status_code == 410
+    assert changes(feed_client, app, since=newest - 1).status_code == 200
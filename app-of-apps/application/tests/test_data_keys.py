@@ -0,0 +1,54 @@
+import pytest
+from django.db import connection
+
+from application.data_keys import DataKey
+from application.models import ApplicationUser
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return " ".join(str(row) for row in cursor.fetchall())
+
+
+@pytest.fixture
+def tagged_members(create_application_users):
+    departments = ["Finance", "Finance", "Sales"]
+    for member, department in zip(create_application_users, departments):
+        member.data = {"department": department, "level": 3}
+        member.save()
+    return create_application_users
+
+
+@pytest.mark.django_db
+def test_filter_data_results(tagged_members, create_application):
+    """Test indexed, multi-value and fallback lookups."""
+    members = ApplicationUser.objects.filter(application=create_application)
+    assert members.filter_data(department="Finance").count() == 2
+    assert members.filter_data(department__in=["Sales", "Legal"]).count() == 1
+    assert members.filter_data(level=3).count() == 3  # unindexed key, JSON lookup
+    assert members.filter_data(department="Finance", level=3).count() == 2
+
+
+@pytest.mark.django_db
+def test_filter_data_uses_expression_index(tagged_members, create_application):
+    """Test that declared keys are routed to their expression index."""
+    members = ApplicationUser.objects.filter(application=create_application)
+    assert "appuser_data_department_idx" in query_plan(members.filter_data(department="Finance"))
+    assert "appuser_data_department_idx" not in query_plan(members.filter(data__department="Finance"))
+
+
+def test_data_key_rejects_unsafe_keys():
+    """Test that keys are validated, since they are inlined into SQL."""
+    with pytest.raises(ValueError):
+        DataKey("data", "x') OR 1=1 --")
+
+
+@pytest.mark.django_db
+def test_data_key_falls_back_to_key_transform(tagged_members, create_application, monkeypatch):
+    """Test that backends without a native form compile DataKey as Django's key text transform."""
+    monkeypatch.delattr(DataKey, "as_sqlite")
+    members = ApplicationUser.objects.filter(application=create_application)
+    assert members.filter_data(department="Finance").count() == 2
+    assert members.filter_data(department__in=["Sales", "Legal"]).count() == 1
@@ -0,0 +1,31 @@
+import pytest
+from django.db import connection
+from django.test import override_settings
+
+from application.db import SQLITE_DEFAULT_PRAGMAS, apply_sqlite_pragmas, configure_sqlite_connection
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)  # synchronous cannot change inside a transaction
+def test_production_profile_applies_pragmas():
+    """Test that the connection_created receiver applies the active profile."""
+    try:
+        with override_settings(DATABASE_PROFILE="production"):
+            configure_sqlite_connection(sender=None, connection=connection)
+        assert (pragma("busy_timeout"), pragma("cache_size"), pragma("synchronous")) == (5000, -65536, 1)
+    finally:
+        apply_sqlite_pragmas(connection, {k: v for k, v in SQLITE_DEFAULT_PRAGMAS.items() if k != "journal_mode"})
+
+
+@pytest.mark.django_db
+def test_unknown_pragmas_are_rejected():
+    """Test that only whitelisted pragma names and plain values reach the SQL."""
+    with pytest.raises(ValueError):
+        apply_sqlite_pragmas(connection, {"cache_size": "1; DROP TABLE auth_user"})
+    with pytest.raises(ValueError):
+        apply_sqlite_pragmas(connection, {"writable_schema": 1})
@@ -0,0 +1,99 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from application import bulk, effective_permissions
+from application.models import AppPermission, ApplicationUser, EffectivePermission
+from application.permissions import resolve_permissions, users_with_permission
+
+
+def stored(app):
+    return set(EffectivePermission.objects.filter(application=app).values_list("user__username", "permission__name"))
+
+
+def assert_in_sync(app):
+    user_ids = next(effective_permissions.user_chunks(app.pk), [])
+    assert effective_permissions.refresh(app.pk, user_ids, dry_run=True) == (0, 0)
+
+
+@pytest.mark.django_db
+def test_table_follows_every_change(create_application_users, create_application, create_roles, create_users):
+    """Test that membership, role, link and permission changes keep the table equal to the model."""
+    app = create_application
+    admin_role, viewer_role = create_roles
+    normal_user, admin_user, developer_user = create_users
+    assert stored(app) == {
+        ("normal", "View Reports"), ("developer", "View Reports"),
+        ("admin", "Create Reports"), ("admin", "View Reports"),
+    }
+
+    member = ApplicationUser.objects.get(user=normal_user)
+    member.role = admin_role  # reassignment
+    member.save()
+    assert ("normal", "Create Reports") in stored(app)
+
+    export = AppPermission.objects.create(application=app, name="Export")
+    viewer_role.permissions.add(export)
+    assert {("developer", "Export")} <= stored(app)
+    export.roles.remove(viewer_role)  # reverse side
+    assert not {row for row in stored(app) if row[1] == "Export"}
+
+    admin_role.parent = viewer_role
+    admin_role.save()
+    viewer_role.permissions.add(export)
+    assert ("admin", "Export") in stored(app)  # inherited
+
+    export.deleted_ts = export.created_ts
+    export.save()
+    assert not {row for row in stored(app) if row[1] == "Export"}
+
+    ApplicationUser.objects.filter(user=developer_user).soft_delete()
+    ApplicationUser.objects.get(user=admin_user).delete()
+    assert {username for username, _ in stored(app)} == {"normal"}
+    assert_in_sync(app)
+
+
+@pytest.mark.django_db
+def test_lookups_are_single_queries(create_application_users, create_application, create_users,
+                                    django_assert_num_queries):
+    """Test both directions of lookup against the table."""
+    app = create_application
+    normal_user, admin_user, developer_user = create_users
+    with django_assert_num_queries(1):
+        assert set(resolve_permissions(app.pk, admin_user.pk)) == {"Create Reports", "View Reports"}
+    with django_assert_num_queries(1):
+        assert set(users_with_permission(app, "View Reports")) == {normal_user.pk, admin_user.pk, developer_user.pk}
+    assert list(users_with_permission(app, "Create Reports")) == [admin_user.pk]
+
+
+@pytest.mark.django_db
+def test_bulk_memberships_are_materialized(create_application, create_roles, create_users):
+    """Test that bulk-created memberships get their rows."""
+    app = create_application
+    _, viewer_role = create_roles
+    bulk.bulk_create(ApplicationUser, [
+        ApplicationUser(application=app, user=user, role=viewer_role) for user in create_users
+    ])
+    assert stored(app) == {("normal", "View Reports"), ("admin", "View Reports"), ("developer", "View Reports")}
+
+
+@pytest.mark.django_db
+def test_rebuild_command(create_application_users, create_application, create_users):
+    """Test that --verify reports drift and a chunked rebuild repairs it."""
+    app = create_application
+    normal_user, admin_user, _ = create_users
+    expected = stored(app)
+    EffectivePermission.objects.filter(user=admin_user).delete()
+    EffectivePermission.objects.create(
+        application=app, user=normal_user, permission=AppPermission.objects.get(name="Create Reports")
+    )
+
+    with pytest.raises(CommandError, match="2 missing and 1 stale rows"):
+        call_command("rebuild_effective_permissions", verify=True, stdout=StringIO())
+    out = StringIO()
+    call_command("rebuild_effective_permissions", chunk_size=1, stdout=out)
+    assert "Repaired 2 missing and 1 stale rows" in out.getvalue()
+    assert stored(app) == expected
+    call_command("rebuild_effective_permissions", verify=True, application=[app.pk], stdout=StringIO())
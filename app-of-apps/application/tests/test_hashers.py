@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+from io import StringIO
+
+import pytest
+from allauth.account.models import EmailAddress
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from rest_framework.test import APIClient
+
+from app import settings as project_settings
+from application import hashers
+
+
+POOLED_HASHERS = [
+    "application.hashers.PBKDF2PasswordHasher",
+    "application.hashers.ScryptPasswordHasher",
+]
+
+
+@pytest.fixture
+def pool(settings):
+    """A one-thread pool without a queue, so a single blocked hash fills it."""
+    settings.PASSWORD_HASHING_WORKERS = 1
+    settings.PASSWORD_HASHING_QUEUE_DEPTH = 0
+    hashers.reset_hashing_pool()
+    yield hashers.get_hashing_pool()
+    hashers.reset_hashing_pool()
+
+
+@pytest.fixture
+def cheap_params(settings):
+    settings.PASSWORD_HASHER_PARAMS = {"pbkdf2": {"iterations": 1000}, "scrypt": {"work_factor": 2 ** 4}}
+
+
+def occupy(pool):
+    """Block the pool's only slot until the returned event is set."""
+    started, release = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=pool.run, args=(hold,))
+    thread.start()
+    started.wait(5)
+    return release, thread
+
+
+def test_pool_rejects_past_its_queue():
+    """Test that calls beyond workers + queue depth fail fast and are counted."""
+    pool = hashers.BoundedHashingPool(workers=1, queue_depth=1)
+    try:
+        release, holder = occupy(pool)
+        queued = threading.Thread(target=pool.run, args=(lambda: None,))
+        queued.start()
+        while pool.stats()["in_flight"] < 2:
+            time.sleep(0.001)
+        with pytest.raises(hashers.HashingOverloaded):
+            pool.run(lambda: None)
+        release.set()
+        holder.join()
+        queued.join()
+        assert pool.stats() == {"workers": 1, "queue_depth": 1, "in_flight": 0, "completed": 2, "rejected": 1}
+        assert pool.run(lambda: 42) == 42
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.django_db
+def test_login_upgrades_hashes(settings, pool, cheap_params, create_users):
+    """Test that a login rehashes passwords of another algorithm or older parameters, on the pool."""
+    settings.PASSWORD_HASHERS = POOLED_HASHERS
+    normal_user, _, _ = create_users
+    normal_user.password = make_password("testpass", hasher="scrypt")
+    normal_user.save()
+
+    assert User.objects.get(pk=normal_user.pk).check_password("testpass")
+    upgraded = User.objects.get(pk=normal_user.pk).password
+    assert upgraded.startswith("pbkdf2_sha256$1000$")
+
+    settings.PASSWORD_HASHER_PARAMS = {"pbkdf2": {"iterations": 2000}}
+    assert User.objects.get(pk=normal_user.pk).check_password("testpass")
+    assert User.objects.get(pk=normal_user.pk).password.startswith("pbkdf2_sha256$2000$")
+    assert pool.stats()["completed"] >= 4
+
+
+@pytest.mark.django_db
+def test_login_storm_gets_503(settings, pool, cheap_params, create_users):
+    """Test that a login answers 503 at once while the hashing pool is full."""
+    settings.PASSWORD_HASHERS = POOLED_HASHERS
+    _, admin_user, _ = create_users
+    admin_user.set_password("adminpass")
+    admin_user.save()
+    EmailAddress.objects.create(user=admin_user, email=admin_user.email, verified=True, primary=True)
+    credentials = {"email": "admin@example.com", "password": "adminpass"}
+
+    release, holder = occupy(pool)
+    try:
+        response = APIClient().post("/auth/login/", credentials)
+    finally:
+        release.set()
+        holder.join()
+    assert response.status_code == 503
+    assert response.data["detail"].code == "hashing_overloaded"
+    assert APIClient().post("/auth/login/", credentials).status_code == 200
+
+
+@pytest.mark.django_db
+def test_admin_login_storm_gets_503(settings, pool, cheap_params, create_users):
+    """Test that a login outside DRF also answers 503, not 500, while the hashing pool is full."""
+    settings.PASSWORD_HASHERS = POOLED_HASHERS
+    _, admin_user, _ = create_users
+    admin_user.is_staff = True
+    admin_user.set_password("adminpass")
+    admin_user.save()
+    credentials = {"username": "admin", "password": "adminpass"}
+
+    release, holder = occupy(pool)
+    try:
+        response = Client().post("/admin/login/", credentials)
+    finally:
+        release.set()
+        holder.join()
+    assert response.status_code == 503
+    assert Client().post("/admin/login/", credentials).status_code == 302
+
+
+@pytest.mark.django_db
+def test_legacy_hashes_still_verify(settings, pool, cheap_params, create_users):
+    """Test that hashes of Django's other default hashers verify and are upgraded to the preferred one."""
+    settings.PASSWORD_HASHERS = project_settings.PASSWORD_HASHERS
+    normal_user, _, _ = create_users
+    normal_user.password = make_password("testpass", hasher="pbkdf2_sha1")
+    normal_user.save()
+
+    assert User.objects.get(pk=normal_user.pk).check_password("testpass")
+    assert User.objects.get(pk=normal_user.pk).password.startswith("pbkdf2_sha256$1000$")
+
+
+def test_bench_password_hashing(cheap_params, tmp_path):
+    """Test that the hashing benchmark reports throughput per policy and skips unavailable ones."""
+    output = tmp_path / "hashing.json"
+    call_command("bench_password_hashing", logins=4, clients=2, workers=1, output=str(output), stdout=StringIO())
+    results = json.loads(output.read_text())
+    assert results["policies"]["scrypt"]["hasher"]["work_factor"] == 16  # tuned by PASSWORD_HASHER_PARAMS
+    assert results["policies"]["pbkdf2"]["logins_per_second_per_core"] > 0
+    assert results["policies"]["pbkdf2"]["rejected"] == 0
@@ -0,0 +1,53 @@
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from application.models import ApplicationUser
+from application.permissions import get_effective_permissions
+
+
+@pytest.fixture
+def new_users(db):
+    return [User.objects.create(username=f"member{i}") for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_import_csv(tmp_path, create_application, create_roles, new_users):
+    """Test a CSV import with valid, unknown and duplicate rows."""
+    app = create_application
+    source = tmp_path / "members.csv"
+    source.write_text(
+        "username,role\n"
+        "member0,Admin\n"
+        "member1,Viewer\n"
+        "member1,Viewer\n"   # duplicate within the file
+        "ghost,Viewer\n"     # unknown user
+        "member2,Owner\n"    # unknown role
+    )
+    rejects = tmp_path / "rejects.jsonl"
+    out = StringIO()
+    call_command("import_members", str(app.pk), str(source), "--chunk-size", "2",
+                 "--rejects", str(rejects), stdout=out)
+
+    members = dict(ApplicationUser.objects.filter(application=app).values_list("user__username", "role__name"))
+    assert members == {"member0": "Admin", "member1": "Viewer"}
+    reasons = [json.loads(line)["reason"] for line in rejects.read_text().splitlines()]
+    assert reasons == ["'member1' is already a member", "unknown user 'ghost'", "unknown role 'Owner'"]
+    assert "Imported 2 members, rejected 3 rows" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_jsonl_invalidates_cache(tmp_path, create_application, create_roles, new_users):
+    """Test a JSONL import and that cached permissions of imported users are refreshed."""
+    app = create_application
+    assert get_effective_permissions(app, new_users[0]) == frozenset()
+
+    source = tmp_path / "members.jsonl"
+    source.write_text('{"username": "member0", "role": "Viewer"}\nnot json\n')
+    call_command("import_members", str(app.pk), str(source), stdout=StringIO())
+
+    assert ApplicationUser.objects.filter(application=app, user=new_users[0]).exists()
+    assert get_effective_permissions(app, new_users[0]) == {"View Reports"}
@@ -0,0 +1,111 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from application.manifest import manifest_cache
+from application.models import Application, Role
+
+
+@pytest.fixture
+def manifest_client(create_application):
+    manifest_cache.clear()
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    return client
+
+
+def manifest_url(application):
+    return f"/api/applications/{application.pk}/manifest/"
+
+
+@pytest.mark.django_db
+def test_manifest_in_constant_queries(manifest_client, create_application, create_roles):
+    """Test the manifest body, and that it costs the same queries for any number of roles."""
+    app = create_application
+    response = manifest_client.get(manifest_url(app))
+    body = response.json()
+    assert body["revision"] == Application.objects.get(pk=app.pk).revision
+    assert {role["name"]: sorted(role["permissions"]) for role in body["roles"]} == {
+        "Admin": ["Create Reports", "View Reports"], "Viewer": ["View Reports"],
+    }
+    assert response["ETag"] == f'"{app.pk}.{body["revision"]}"'
+
+    for i in range(10):
+        Role.objects.create(application=app, name=f"Extra {i}").permissions.add(*app.permissions.all())
+    manifest_cache.clear()
+    with CaptureQueriesContext(connection) as captured:
+        assert len(manifest_client.get(manifest_url(app)).json()["roles"]) == 12
+    assert len(captured) == 4  # application, permissions, roles, role permissions
+
+
+@pytest.mark.django_db
+def test_if_none_match_answers_without_queries(manifest_client, create_application, create_roles):
+    """Test that revalidating a cached manifest returns 304 without touching the database."""
+    etag = manifest_client.get(manifest_url(create_application))["ETag"]
+    with CaptureQueriesContext(connection) as captured:
+        response = manifest_client.get(manifest_url(create_application), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    assert len(captured) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_child_changes_bump_the_revision(manifest_client, create_application, create_roles, create_permissions):
+    """Test that role, permission and role-permission changes all produce a new ETag."""
+    app = create_application
+    admin_role, viewer_role = create_roles
+    create_perm, _ = create_permissions
+    etags = [manifest_client.get(manifest_url(app))["ETag"]]
+    for change in (
+        lambda: viewer_role.permissions.add(create_perm),
+        lambda: Role.objects.filter(pk=admin_role.pk).soft_delete(),
+        lambda: setattr(create_perm, "name", "Author Reports") or create_perm.save(),
+    ):
+        change()
+        response = manifest_client.get(manifest_url(app), HTTP_IF_NONE_MATCH=etags[-1])
+        assert response.status_code == 200
+        etags.append(response["ETag"])
+    assert len(set(etags)) == 4
+    assert [role["name"] for role in response.json()["roles"]] == ["Viewer"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stale_application_save_keeps_the_revision(create_application, create_roles):
+    """Test that saving an instance loaded before a bump does not move the revision back."""
+    app = Application.objects.get(pk=create_application.pk)
+    Role.objects.create(application=app, name="Auditor")
+    revision = Application.objects.get(pk=app.pk).revision
+    app.description = "Renamed"
+    app.save()
+    assert Application.objects.get(pk=app.pk).revision == revision + 1
+
+
+@pytest.mark.django_db
+def test_cached_manifest_is_still_authorized(manifest_client, create_application, create_users):
+    """Test that a cached manifest is not served to other users."""
+    manifest_client.get(manifest_url(create_application))
+    normal_user, _, _ = create_users
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(normal_user)}")
+    assert client.get(manifest_url(create_application)).status_code == 403
+
+
+@pytest.mark.django_db(transaction=True)
+def test_one_bump_per_transaction(create_application):
+    """Test that a transaction bumps the revision once, and a rolled-back savepoint's bump is redone."""
+    app = create_application
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Role.objects.create(application=app, name="Discarded")
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with CaptureQueriesContext(connection) as captured:
+            for i in range(5):
+                Role.objects.create(application=app, name=f"Role {i}")
+    bumps = [q for q in captured if q["sql"].startswith('UPDATE "application_application"')]
+    assert len(bumps) == 1
+    assert Application.objects.get(pk=app.pk).revision == 1
@@ -0,0 +1,65 @@
+import logging
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APIClient
+
+from application import metrics
+
+
+@pytest.fixture
+def registry():
+    metrics.registry.reset()
+    return metrics.registry
+
+
+@pytest.mark.django_db
+def test_requests_are_recorded_per_url_name(registry, create_application, create_permissions):
+    """Test request, latency and SQL series for a resolved URL name."""
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=create_application.API_KEY)
+    client.get(f"/api/applications/{create_application.pk}/permissions/")
+    client.get("/no/such/page/")
+
+    text = client.get("/metrics").content.decode()
+    assert 'app_http_requests_total{view="application-permissions",method="GET",status="200"} 1' in text
+    assert 'app_http_request_duration_seconds_count{view="application-permissions"} 1' in text
+    assert 'app_http_requests_total{view="<unresolved>",method="GET",status="404"} 1' in text
+    assert registry.queries["application-permissions"] >= 2
+    assert 'app_cache_hits_total{cache="permissions"}' in text
+
+
+@pytest.mark.django_db
+def test_repeated_statements_are_flagged(create_users, caplog):
+    """Test that one statement repeated past the threshold counts as a possible N+1."""
+    registry = metrics.MetricsRegistry(n_plus_one_threshold=3)
+    collected, token = metrics.start_request()
+    try:
+        for user in create_users:
+            User.objects.get(pk=user.pk)
+    finally:
+        metrics.finish_request(token)
+    assert collected.queries == 3
+
+    with caplog.at_level(logging.WARNING, logger="application.metrics"):
+        registry.observe("users", "GET", 200, 0.01, collected)
+        registry.observe("users", "GET", 200, 0.01, collected)
+    assert registry.n_plus_one["users"] == 2
+    assert len(caplog.records) == 1  # each statement is logged once per view
+
+
+@pytest.mark.django_db
+def test_wrapper_is_installed_once():
+    """Test that the SQL wrapper is not stacked on reconnects."""
+    connection.ensure_connection()
+    metrics.install_sql_metrics(sender=None, connection=connection)
+    assert connection.execute_wrappers.count(metrics.sql_metrics_wrapper) == 1
+
+
+@pytest.mark.django_db
+def test_metrics_token(settings):
+    """Test that the endpoint requires the bearer token once one is configured."""
+    settings.METRICS_TOKEN = "secret"
+    assert APIClient().get("/metrics").status_code == 401
+    assert APIClient().get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code == 200
@@ -1,64 +1,9 @@
 import pytest
-from django.contrib.auth.models import User, Group
 from django.core.exceptions import PermissionDenied
 from application.models import Application, Role, AppPermission, ApplicationUser
 from django.utils import timezone
 
 
-@pytest.fixture
-def create_users(db):  # Add `db` fixture to enable database access
-    """Create users for testing."""
-    normal_user = User.objects.create_user(username="normal", email="normal@example.com", password="testpass")
-    admin_user = User.objects.create_superuser(username="admin", email="admin@example.com", password="adminpass")
-    developer_user = User.objects.create_user(username="developer", email="developer@example.com", password="devpass")
-
-    # Assign developer role
-    developer_group, _ = Group.objects.get_or_create(name="developer")
-    developer_user.groups.add(developer_group)
-
-    return normal_user, admin_user, developer_user
-
-@pytest.fixture
-def create_application(db, create_users):
-    """Create an application with a developer user."""
-    _, _, developer_user = create_users
-    return Application.objects.create(user=developer_user, name="FinanceApp", description="Financial management")
-
-@pytest.fixture
-def create_permissions(db, create_application):
-    """Create permissions for an application."""
-    app = create_application
-    create_perm = AppPermission.objects.create(application=app, name="Create Reports", description="Allows report creation")
-    view_perm = AppPermission.objects.create(application=app, name="View Reports", description="Allows report viewing")
-    return create_perm, view_perm
-
-@pytest.fixture
-def create_roles(db, create_application, create_permissions):
-    """Create roles and assign permissions."""
-    app = create_application
-    create_perm, view_perm = create_permissions
-
-    admin_role = Role.objects.create(application=app, name="Admin", description="Full access")
-    viewer_role = Role.objects.create(application=app, name="Viewer", description="Can view reports")
-
-    admin_role.permissions.add(create_perm, view_perm)
-    viewer_role.permissions.add(view_perm)
-
-    return admin_role, viewer_role
-
-@pytest.fixture
-def create_application_users(db, create_application, create_users, create_roles):
-    """Assign users to roles in an application."""
-    normal_user, admin_user, developer_user = create_users
-    admin_role, viewer_role = create_roles
-    app = create_application
-
-    return [
-        ApplicationUser.objects.create(application=app, user=normal_user, role=viewer_role),
-        ApplicationUser.objects.create(application=app, user=admin_user, role=admin_role),
-        ApplicationUser.objects.create(application=app, user=developer_user, role=viewer_role)
-    ]
-
 # ---------------- TEST CASES ---------------- #
 
 @pytest.mark.django_db
@@ -0,0 +1,115 @@
+import pytest
+from django.utils import timezone
+
+from application.caching import LRUCache
+from application.models import AppPermission
+from application.permissions import PermissionCache, get_effective_permissions, permission_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_permission_cache():
+    permission_cache.clear()
+    yield
+    permission_cache.clear()
+
+
+def test_lru_cache_eviction_and_counters():
+    """Test that the LRU evicts the least recently used entry and counts lookups."""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_lru_cache_ttl():
+    """Test that entries expire after their TTL."""
+    now = [0.0]
+    cache = LRUCache(maxsize=10, ttl=5, timer=lambda: now[0])
+    cache.set("key", "value")
+    now[0] = 4.9
+    assert cache.get("key") == "value"
+    now[0] = 5.0
+    assert cache.get("key") is None
+
+
+def test_permission_cache_ttl():
+    """Test that entries expire, so writes made by other processes are seen without a signal."""
+    now, grants = [0.0], {"View Reports"}
+    cache = PermissionCache(maxsize=10, ttl=10, timer=lambda: now[0])
+    assert cache.get_or_compute(1, 1, lambda *key: set(grants)) == {"View Reports"}
+    grants.clear()  # revoked by another worker
+    now[0] = 9.9
+    assert cache.get_or_compute(1, 1, lambda *key: set(grants)) == {"View Reports"}
+    now[0] = 10.0
+    assert cache.get_or_compute(1, 1, lambda *key: set(grants)) == frozenset()
+
+
+@pytest.mark.django_db
+def test_effective_permissions(create_application_users, create_users, create_application):
+    """Test that permissions resolve through the user's role."""
+    normal_user, admin_user, _ = create_users
+    app = create_application
+    assert get_effective_permissions(app, admin_user) == {"Create Reports", "View Reports"}
+    assert get_effective_permissions(app.pk, normal_user.pk) == {"View Reports"}
+
+
+@pytest.mark.django_db
+def test_effective_permissions_are_cached(create_application_users, create_users, create_application,
+                                          django_assert_num_queries):
+    """Test that a repeated lookup is served without queries."""
+    normal_user, _, _ = create_users
+    get_effective_permissions(create_application, normal_user)
+    with django_assert_num_queries(0):
+        assert get_effective_permissions(create_application, normal_user) == {"View Reports"}
+
+
+@pytest.mark.django_db
+def test_role_permission_change_invalidates(create_application_users, create_users, create_application,
+                                            create_roles, create_permissions):
+    """Test that m2m changes on Role.permissions invalidate the cache."""
+    normal_user, _, _ = create_users
+    _, viewer_role = create_roles
+    create_perm, view_perm = create_permissions
+    app = create_application
+
+    get_effective_permissions(app, normal_user)
+    viewer_role.permissions.add(create_perm)
+    assert get_effective_permissions(app, normal_user) == {"Create Reports", "View Reports"}
+
+    view_perm.roles.remove(viewer_role)  # reverse side of the relation
+    assert get_effective_permissions(app, normal_user) == {"Create Reports"}
+
+
+@pytest.mark.django_db
+def test_membership_change_invalidates(create_application_users, create_users, create_application, create_roles):
+    """Test that reassigning a role or soft-deleting a membership invalidates the cache."""
+    normal_user, _, _ = create_users
+    admin_role, _ = create_roles
+    app = create_application
+    membership = create_application_users[0]
+
+    assert get_effective_permissions(app, normal_user) == {"View Reports"}
+    membership.role = admin_role
+    membership.save()
+    assert get_effective_permissions(app, normal_user) == {"Create Reports", "View Reports"}
+
+    membership.deleted_ts = timezone.now()
+    membership.save()
+    assert get_effective_permissions(app, normal_user) == frozenset()
+
+
+@pytest.mark.django_db
+def test_permission_delete_invalidates(create_application_users, create_users, create_application):
+    """Test that deleting an AppPermission invalidates the whole application."""
+    _, admin_user, _ = create_users
+    app = create_application
+
+    get_effective_permissions(app, admin_user)
+    AppPermission.objects.get(application=app, name="Create Reports").delete()
+    assert get_effective_permissions(app, admin_user) == {"View Reports"}
@@ -0,0 +1,73 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import authenticate
+from django.core.management import call_command
+
+from application.models import Application, AppPermission, ApplicationUser, Role
+from application.signals import bulk_changed
+
+
+def populate(**options):
+    call_command("populate_user_db", stdout=StringIO(), **options)
+
+
+def snapshot():
+    return sorted(
+        ApplicationUser.objects.filter(application__name__startswith="synth")
+        .values_list("application__name", "user__username", "role__name", "role__permission_mask")
+    )
+
+
+@pytest.mark.django_db
+def test_populate_is_idempotent():
+    """Test that running the command twice neither crashes nor duplicates rows."""
+    populate()
+    populate()
+    assert Application.objects.count() == 1
+    assert ApplicationUser.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_synthetic_dataset(settings):
+    """Test the generated volumes, and that a rerun with the same seed adds nothing."""
+    options = dict(apps=3, users=40, roles_per_app=4, perms_per_app=10, members_per_app=25, chunk_size=7,
+                   fast_hash=True)
+    populate(**options)
+    first = snapshot()
+    assert Application.objects.filter(name__startswith="synth0-app-").count() == 3
+    assert Role.objects.filter(application__name__startswith="synth").count() == 12
+    assert AppPermission.objects.filter(application__name__startswith="synth").count() == 30
+    assert len(first) == 75
+    assert all(mask for *_, mask in first)  # every role was granted something
+    assert authenticate(username="synth0-user-39", password="synthetic") is not None
+
+    populate(**options)
+    assert snapshot() == first
+
+
+@pytest.mark.django_db
+def test_role_permission_links_are_announced():
+    """Test that each application's bulk-inserted role permissions are followed by a Role bulk_changed."""
+    linked = []
+
+    def receiver(sender, application_ids, **kwargs):
+        links = Role.permissions.through.objects.filter(role__application_id__in=application_ids)
+        if sender is Role and links.exists():
+            linked.extend(application_ids)
+
+    bulk_changed.connect(receiver)
+    try:
+        populate(apps=2, users=5, roles_per_app=2, perms_per_app=3, members_per_app=2, fast_hash=True)
+    finally:
+        bulk_changed.disconnect(receiver)
+    apps = Application.objects.filter(name__startswith="synth0-app-").values_list("pk", flat=True)
+    assert sorted(linked) == sorted(apps)
+
+
+@pytest.mark.django_db
+def test_worker_pool_hashes_passwords():
+    """Test a separately seeded dataset whose passwords are hashed by worker processes."""
+    populate(apps=1, users=10, members_per_app=5, workers=2, seed=1)
+    assert len(snapshot()) == 5
+    assert authenticate(username="synth1-user-0", password="synthetic") is not None
@@ -0,0 +1,124 @@
+import pytest
+from django.core.exceptions import ValidationError
+
+from application import bulk
+from application.models import AppPermission, Application, ApplicationUser, Role, RoleClosure
+from application.permissions import check_permissions, get_effective_permissions, permission_cache
+from application.tokens import build_permission_claims
+
+
+@pytest.fixture
+def hierarchy(create_application, create_users):
+    """Viewer <- Editor <- Admin, each adding one permission, and a user holding Editor."""
+    app = create_application
+    normal_user, _, _ = create_users
+    roles, parent = {}, None
+    for name in ("Viewer", "Editor", "Admin"):
+        permission = AppPermission.objects.create(application=app, name=f"{name} permission")
+        parent = roles[name] = Role.objects.create(application=app, name=name, parent=parent)
+        parent.permissions.add(permission)
+    ApplicationUser.objects.create(application=app, user=normal_user, role=roles["Editor"])
+    permission_cache.clear()
+    return app, normal_user, roles
+
+
+def closure(app):
+    return set(RoleClosure.objects.filter(descendant__application=app).values_list(
+        "ancestor__name", "descendant__name", "depth"
+    ))
+
+
+@pytest.mark.django_db
+def test_permissions_are_inherited(hierarchy, django_assert_num_queries):
+    """Test that a role holds its ancestors' permissions, resolved in one query."""
+    app, user, roles = hierarchy
+    with django_assert_num_queries(1):
+        assert get_effective_permissions(app, user) == {"Viewer permission", "Editor permission"}
+    assert check_permissions(app.pk, [(user.pk, "Viewer permission"), (user.pk, "Admin permission")]) == [True, False]
+    assert sorted(build_permission_claims(user.pk)[str(app.pk)]["p"]) == ["Editor permission", "Viewer permission"]
+
+    # A permission granted to an ancestor later reaches every role below it
+    extra = AppPermission.objects.create(application=app, name="Export")
+    roles["Viewer"].permissions.add(extra)
+    assert "Export" in get_effective_permissions(app, user)
+    assert Role.objects.get(pk=roles["Admin"].pk).has_permissions(app.compile_mask(["Export", "Admin permission"]))
+
+
+@pytest.mark.django_db
+def test_closure_follows_moves(hierarchy):
+    """Test that moving a subtree updates the closure incrementally, matching a full rebuild."""
+    app, user, roles = hierarchy
+    assert closure(app) == {
+        ("Viewer", "Viewer", 0), ("Editor", "Editor", 0), ("Admin", "Admin", 0),
+        ("Viewer", "Editor", 1), ("Editor", "Admin", 1), ("Viewer", "Admin", 2),
+    }
+    editor = roles["Editor"]
+    editor.parent = None
+    editor.save()
+    assert closure(app) == {
+        ("Viewer", "Viewer", 0), ("Editor", "Editor", 0), ("Admin", "Admin", 0), ("Editor", "Admin", 1),
+    }
+    assert get_effective_permissions(app, user) == {"Editor permission"}
+    assert not Role.objects.get(pk=roles["Admin"].pk).has_permissions(app.compile_mask(["Viewer permission"]))
+
+    incremental = closure(app)
+    RoleClosure.objects.filter(descendant__application=app).delete()
+    RoleClosure.rebuild([app.pk])
+    assert closure(app) == incremental
+
+
+@pytest.mark.django_db
+def test_invalid_parents_are_rejected(hierarchy, settings, django_assert_max_num_queries):
+    """Test that cycles, other applications' roles and too deep hierarchies are refused in bounded queries."""
+    app, _, roles = hierarchy
+    viewer = roles["Viewer"]
+    viewer.parent = roles["Admin"]
+    with django_assert_max_num_queries(3), pytest.raises(ValidationError, match="already inherits"):
+        viewer.save()
+
+    other = Application.objects.create(user=app.user, name="Other")
+    with pytest.raises(ValidationError, match="same application"):
+        Role.objects.create(application=other, name="Stranger", parent=roles["Admin"])
+
+    settings.ROLE_HIERARCHY_MAX_DEPTH = 2  # Admin already inherits through two levels
+    with pytest.raises(ValidationError, match="limited to 2 levels"):
+        Role.objects.create(application=app, name="Owner", parent=roles["Admin"])
+
+
+@pytest.mark.django_db
+def test_soft_deleted_ancestor_passes_nothing(hierarchy):
+    """Test that soft-deleting a role withdraws what it passed on, and restoring brings it back."""
+    app, user, roles = hierarchy
+    Role.objects.filter(pk=roles["Viewer"].pk).soft_delete()
+    permission_cache.clear()
+    assert get_effective_permissions(app, user) == {"Editor permission"}
+    assert check_permissions(app.pk, [(user.pk, "Viewer permission")]) == [False]
+    Role.objects.filter(pk=roles["Viewer"].pk).restore()
+    assert check_permissions(app.pk, [(user.pk, "Viewer permission")]) == [True]
+
+
+@pytest.mark.django_db
+def test_soft_deleted_middle_role_cuts_inheritance(hierarchy, create_users):
+    """Test that roles below a soft-deleted role no longer inherit from the roles above it."""
+    app, user, roles = hierarchy
+    _, admin_user, _ = create_users
+    ApplicationUser.objects.create(application=app, user=admin_user, role=roles["Admin"])
+    Role.objects.filter(pk=roles["Editor"].pk).soft_delete()
+    permission_cache.clear()
+    assert get_effective_permissions(app, admin_user) == {"Admin permission"}
+    assert Role.objects.get(pk=roles["Admin"].pk).permission_mask == app.compile_mask(["Admin permission"])
+    assert build_permission_claims(admin_user.pk)[str(app.pk)]["p"] == ["Admin permission"]
+    Role.objects.filter(pk=roles["Editor"].pk).restore()
+    assert check_permissions(app.pk, [(admin_user.pk, "Viewer permission")]) == [True]
+
+
+@pytest.mark.django_db
+def test_bulk_update_rebuilds_the_closure(hierarchy):
+    """Test that re-parenting through bulk_update is picked up by the closure and the masks."""
+    app, user, roles = hierarchy
+    admin = roles["Admin"]
+    admin.parent = roles["Viewer"]
+    bulk.bulk_update(Role, [admin], ["parent"])
+    assert ("Editor", "Admin", 1) not in closure(app)
+    assert ("Viewer", "Admin", 1) in closure(app)
+    assert Role.objects.get(pk=admin.pk).permission_mask == app.compile_mask(["Viewer permission", "Admin permission"])
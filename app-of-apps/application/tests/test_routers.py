@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.db import connections, router
+from django.http import HttpResponse
+from django.utils import timezone
+
+from application import routers
+from application.middleware import ReplicaPinningMiddleware
+from application.models import Application, ApplicationUser, ReplicaHeartbeat, Role
+from application.permissions import check_permissions, get_effective_permissions, permission_cache
+
+
+@pytest.fixture(scope="module")
+def replica_alias(tmp_path_factory):
+    """A second SQLite file as a 'replica' alias, registered before the test database setup."""
+    path = tmp_path_factory.mktemp("replica") / "replica.sqlite3"
+    connections.settings["replica"] = {**connections.settings["default"], "NAME": str(path)}
+    yield "replica"
+    connections["replica"].close()
+    del connections["replica"]
+    del connections.settings["replica"]
+
+
+@pytest.fixture
+def replica(replica_alias, settings):
+    settings.DATABASE_REPLICAS = [replica_alias]
+    routers.replica_lag.clear()
+    routers.unpin_thread()
+    yield replica_alias
+    routers.replica_lag.clear()
+    routers.unpin_thread()
+
+
+def role_names(app):
+    return set(Role.objects.filter(application=app).values_list("name", flat=True))
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_reads_go_to_replicas_until_the_thread_writes(replica, create_roles, create_application):
+    """Test replica reads, primary writes and read-your-writes, against a stub-replicated copy."""
+    app = create_application
+    call_command("replicate_db", stdout=StringIO())
+    routers.unpin_thread()
+    Role.objects.using("default").create(application=app, name="Auditor")  # written past the router
+    routers.unpin_thread()
+    assert role_names(app) == {"Admin", "Viewer"}  # the replica has not caught up
+
+    Role.objects.create(application=app, name="Editor")
+    assert role_names(app) == {"Admin", "Viewer", "Auditor", "Editor"}  # pinned to the primary
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_lagging_replica_is_skipped(replica, create_roles, create_application, settings):
+    """Test that a replica whose heartbeat is older than REPLICA_MAX_LAG is not read from."""
+    app = create_application
+    call_command("replicate_db", stdout=StringIO())
+    Role.objects.create(application=app, name="Editor")
+    routers.unpin_thread()
+    assert "Editor" not in role_names(app)
+
+    ReplicaHeartbeat.objects.using("replica").update(ts=timezone.now() - timedelta(seconds=settings.REPLICA_MAX_LAG + 1))
+    routers.replica_lag.clear()
+    assert "Editor" in role_names(app)
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_writing_client_is_pinned(replica, create_roles, create_application, rf):
+    """Test that a request that wrote sets the pin cookie, and that requests sending it read the primary."""
+    app = create_application
+    call_command("replicate_db", stdout=StringIO())
+    routers.unpin_thread()
+
+    def view(request):
+        if request.method == "POST":
+            Role.objects.create(application=app, name="Editor")
+        return HttpResponse(",".join(sorted(role_names(app))))
+
+    middleware = ReplicaPinningMiddleware(view)
+    response = middleware(rf.post("/"))
+    assert response.cookies["db_pin"]["max-age"] == 5
+    assert "Editor" in middleware(rf.get("/", HTTP_COOKIE="db_pin=1")).content.decode()
+    response = middleware(rf.get("/"))
+    assert "Editor" not in response.content.decode()  # unpinned clients may read stale data
+    assert "db_pin" not in response.cookies
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_permission_lookups_read_the_primary(replica, create_application_users, create_users, create_roles,
+                                             create_application):
+    """Test that a grant change is seen at once, and not cached from a lagging replica."""
+    app = create_application
+    normal_user, _, _ = create_users
+    admin_role, _ = create_roles
+    call_command("replicate_db", stdout=StringIO())
+    permission_cache.clear()
+    membership = ApplicationUser.objects.using("default").get(application=app, user=normal_user)
+    membership.role = admin_role
+    membership.save(using="default")  # written past the router
+    routers.unpin_thread()
+    assert ApplicationUser.objects.get(pk=membership.pk).role_id != admin_role.pk  # the replica lags
+
+    assert get_effective_permissions(app, normal_user) == {"Create Reports", "View Reports"}
+    assert check_permissions(app.pk, [(normal_user.pk, "Create Reports")]) == [True]
+    call_command("replicate_db", stdout=StringIO())
+    assert get_effective_permissions(app, normal_user) == {"Create Reports", "View Reports"}
+    permission_cache.clear()
+
+
+def test_writes_stay_on_other_databases(replica_alias, settings):
+    """Test that writes follow instances on databases other than the primary and its replicas, or without replicas."""
+    owner = User(username="bench-owner")
+    owner._state.db = "bench_production"
+    settings.DATABASE_REPLICAS = []
+    assert router.db_for_write(Application, instance=owner) == "bench_production"
+    Application(user=owner, name="bench")  # the relation is allowed
+    settings.DATABASE_REPLICAS = [replica_alias]
+    assert router.db_for_write(Application, instance=owner) == "bench_production"
+    owner._state.db = replica_alias
+    assert router.db_for_write(Application, instance=owner) == "default"  # read from a replica, written back
+
+
+@pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+def test_write_lookups_do_not_pin(replica, create_roles, create_application):
+    """Test that asking for the write database, e.g. to avoid a lagging replica, does not pin the thread."""
+    app = create_application
+    call_command("replicate_db", stdout=StringIO())
+    routers.unpin_thread()
+    Role.objects.using("default").create(application=app, name="Auditor")  # written past the router
+    routers.unpin_thread()
+    assert router.db_for_write(Role) == "default"
+    assert "Auditor" not in role_names(app)
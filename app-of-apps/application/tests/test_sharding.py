@@ -0,0 +1,126 @@
+from io import StringIO
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from application import sharding
+from application.management.commands import move_application_shard
+from application.models import (
+    ApplicationShard, ApplicationUser, AppPermission, EffectivePermission, Role, RoleClosure,
+)
+from application.permissions import resolve_permissions
+from application.tokens import build_permission_claims
+
+TENANT_MODELS = (AppPermission, Role, Role.permissions.through, ApplicationUser, RoleClosure, EffectivePermission)
+
+pytestmark = pytest.mark.django_db(transaction=True, databases=["default", "shard1"])
+
+
+@pytest.fixture(scope="module")
+def shard_alias(tmp_path_factory, django_db_blocker):
+    """A migrated second SQLite file as the 'shard1' alias, registered before the test database setup."""
+    path = tmp_path_factory.mktemp("shard") / "shard1.sqlite3"
+    connections.settings["shard1"] = {**connections.settings["default"], "NAME": str(path)}
+    with django_db_blocker.unblock():
+        call_command("migrate", database="shard1", verbosity=0)
+    yield "shard1"
+    connections["shard1"].close()
+    del connections["shard1"]
+    del connections.settings["shard1"]
+
+
+@pytest.fixture
+def sharded(shard_alias, settings):
+    """Sharding on, new applications placed on shard1."""
+    settings.DATABASE_SHARDS = [shard_alias]
+    settings.SHARD_MAP_TTL = 0
+    sharding.shard_map.clear()
+    yield shard_alias
+    sharding.shard_map.clear()
+
+
+def counts(using):
+    return [model._base_manager.using(using).count() for model in TENANT_MODELS]
+
+
+def test_tenant_rows_live_on_their_shard(sharded, create_application_users, create_application, create_users):
+    """Test that an application's rows are written to and read from its shard, and globals stay on default."""
+    app = create_application
+    _, admin_user, developer_user = create_users
+    assert ApplicationShard.objects.get(application=app).alias == "shard1"
+    assert all(counts("shard1")) and not any(counts("default"))
+
+    assert set(resolve_permissions(app.pk, admin_user.pk)) == {"Create Reports", "View Reports"}
+    assert set(build_permission_claims(admin_user.pk)[str(app.pk)]["p"]) == {"Create Reports", "View Reports"}
+    admin, viewer = Role.alive.get(application=app, name="Admin"), Role.alive.get(application=app, name="Viewer")
+    admin.parent = viewer
+    admin.save()
+    viewer.parent = admin
+    with pytest.raises(ValidationError, match="already inherits"):
+        viewer.save()  # the cycle check reads the closure on the shard
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(developer_user)}")
+    members = client.get(f"/api/applications/{app.pk}/members/").json()["results"]
+    assert {member["username"] for member in members} == {"normal", "admin", "developer"}
+    member = client.get(f"/api/applications/{app.pk}/members/{admin_user.pk}/").json()
+    assert (member["username"], member["role_name"]) == ("admin", "Admin")
+    assert len(client.get(f"/api/applications/{app.pk}/roles/").json()["results"]) == 2
+
+    admin_user.delete()
+    assert not ApplicationUser.objects.using("shard1").filter(user_id=admin_user.pk).exists()
+    app.delete()
+    assert not any(counts("shard1"))
+
+
+def test_move_application_shard(sharded, create_application_users, create_application, create_users, create_roles,
+                                monkeypatch):
+    """Test an online move back to default, with changes made during the copy replayed under the lock."""
+    app = create_application
+    normal_user, admin_user, developer_user = create_users
+    admin_role, viewer_role = create_roles
+    before = counts("shard1")
+    rebuild = move_application_shard.Command.rebuild
+
+    def write_during_copy(command, alias, everything, user_ids=()):
+        if everything is True and alias == "default" and not hasattr(command, "_wrote"):
+            command._wrote = True  # the online copy is done: keep writing to the source
+            ApplicationUser.objects.get(application=app, user=normal_user).delete()
+            member = ApplicationUser.objects.get(application=app, user=developer_user)
+            member.role = admin_role
+            member.save()
+            viewer_role.permissions.add(AppPermission.objects.create(application=app, name="Export"))
+        rebuild(command, alias, everything, user_ids)
+
+    monkeypatch.setattr(move_application_shard.Command, "rebuild", write_during_copy)
+    out = StringIO()
+    call_command("move_application_shard", app.pk, "default", batch_size=1, stdout=out)
+    assert f"✅ Moved application {app.pk} to default" in out.getvalue()
+
+    assert sharding.database_for(app.pk) == "default"
+    assert not any(counts("shard1"))
+    after = counts("default")
+    assert after[:3] == [before[0] + 1, before[1], before[2] + 1]  # Export and its link
+    assert after[3] == before[3] - 1
+    assert set(resolve_permissions(app.pk, developer_user.pk)) == {"Create Reports", "View Reports"}
+    assert set(resolve_permissions(app.pk, normal_user.pk)) == set()
+    assert set(viewer_role.permissions.values_list("name", flat=True)) == {"View Reports", "Export"}
+    call_command("rebuild_effective_permissions", verify=True, stdout=StringIO())
+
+
+def test_locked_tenant_refuses_writes(sharded, create_roles, create_application):
+    """Test that writes to an application being moved fail with 503 while reads go on."""
+    app = create_application
+    ApplicationShard.objects.filter(application=app).update(locked=True)
+    sharding.shard_map.clear()
+    with pytest.raises(sharding.TenantMoving):
+        Role.objects.create(application=app, name="Editor")
+    assert Role.objects.filter(application=app).count() == 2
+
+    with pytest.raises(CommandError, match="already on shard1"):
+        call_command("move_application_shard", app.pk, "shard1", stdout=StringIO())
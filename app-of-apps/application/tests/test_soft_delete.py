@@ -0,0 +1,52 @@
+import pytest
+from django.db import connection
+
+from application.models import Application, ApplicationUser, Role
+from application.permissions import get_effective_permissions, permission_cache
+
+
+@pytest.mark.django_db
+def test_alive_manager_hides_tombstones(create_application_users):
+    """Test that `alive` filters soft-deleted rows while the other managers keep them."""
+    ApplicationUser.objects.filter(pk=create_application_users[0].pk).soft_delete()
+    assert ApplicationUser.alive.count() == 2
+    assert ApplicationUser.all_with_deleted.count() == 3
+    assert ApplicationUser.objects.deleted().count() == 1
+
+
+@pytest.mark.django_db
+def test_soft_delete_and_restore_are_set_based(create_application_users, django_assert_num_queries):
+    """Test that soft_delete/restore only touch rows in the right state."""
+    with django_assert_num_queries(5):  # member keys + UPDATE + effective permissions (grants, stored, DELETE)
+        assert ApplicationUser.objects.all().soft_delete() == 3
+    assert ApplicationUser.objects.all().soft_delete() == 0
+    assert ApplicationUser.objects.all().restore() == 3
+    assert ApplicationUser.alive.count() == 3
+
+
+@pytest.mark.django_db
+def test_soft_delete_invalidates_permission_cache(create_application_users, create_users, create_application):
+    """Test that set-based soft deletes reach the permission cache."""
+    permission_cache.clear()
+    normal_user, _, _ = create_users
+    app = create_application
+    assert get_effective_permissions(app, normal_user) == {"View Reports"}
+    ApplicationUser.objects.filter(user=normal_user).soft_delete()
+    assert get_effective_permissions(app, normal_user) == frozenset()
+
+
+@pytest.mark.django_db
+def test_soft_delete_application(create_application):
+    """Test soft deletes on Application, whose own pk is the application id."""
+    assert Application.objects.filter(pk=create_application.pk).soft_delete() == 1
+    assert not Application.alive.exists()
+
+
+@pytest.mark.django_db
+def test_partial_index_is_used(create_roles):
+    """Test that live-row lookups by application can use the partial index."""
+    sql, params = Role.alive.filter(application_id=1).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = " ".join(str(row) for row in cursor.fetchall())
+    assert "role_app_alive_idx" in plan
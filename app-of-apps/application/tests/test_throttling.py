@@ -0,0 +1,101 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from application.authentication import api_key_cache
+from application.metrics import registry
+from application.models import Application
+from application.throttling import LocalBucketStore, SQLiteBucketStore, application_limits, parse_rate
+
+
+@pytest.fixture(autouse=True)
+def clear_api_key_cache():
+    api_key_cache.clear()
+    yield
+    api_key_cache.clear()
+
+
+@pytest.fixture
+def limited_application(create_application):
+    create_application.data = {"throttle": {"rate": "1/min", "burst": 2}}
+    create_application.save()
+    return create_application
+
+
+def test_parse_rate():
+    """Test DRF-style rates as tokens per second."""
+    assert parse_rate("20/s") == 20
+    assert parse_rate("120/min") == 2
+    assert parse_rate("36/hour") == 0.01
+    with pytest.raises(ValueError):
+        parse_rate("fast")
+
+
+@pytest.mark.parametrize("throttle", [{"rate": "abc"}, {"burst": "x"}, {"rate": 5}, {"burst": [1]}])
+def test_malformed_limits_fall_back_to_defaults(throttle, settings, caplog):
+    """Test that a bad per-application override uses the default limits instead of failing every request."""
+    settings.THROTTLE_DEFAULT_RATE, settings.THROTTLE_DEFAULT_BURST = "10/s", 50
+    assert application_limits(Application(pk=1, data={"throttle": throttle})) == (10, 50)
+    assert "Invalid throttle" in caplog.text
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: LocalBucketStore(maxsize=10),
+    lambda tmp_path: SQLiteBucketStore(tmp_path / "buckets.sqlite3"),
+], ids=["local", "sqlite"])
+def test_token_bucket(tmp_path, make_store):
+    """Test that a bucket allows its burst, then refills at its rate up to its capacity."""
+    store = make_store(tmp_path)
+    assert [store.take("a", 2, 3, 100.0)[0] for _ in range(4)] == [True, True, True, False]
+    assert store.take("b", 2, 3, 100.0)[0]  # buckets are independent
+    assert store.take("a", 2, 3, 100.5) == (True, 0)  # half a second refills one token
+    assert store.take("a", 2, 3, 101.0)[0]
+    assert not store.take("a", 2, 3, 101.0)[0]
+    assert store.take("a", 2, 3, 200.0) == (True, 2)  # never more than the capacity
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    """Test that stores opened on one file (one per worker process) share their buckets."""
+    first, second = SQLiteBucketStore(tmp_path / "buckets.sqlite3"), SQLiteBucketStore(tmp_path / "buckets.sqlite3")
+    assert first.take("a", 1, 2, 0.0)[0]
+    assert second.take("a", 1, 2, 0.0)[0]
+    assert not first.take("a", 1, 2, 0.0)[0]
+
+
+@pytest.mark.django_db
+def test_api_key_requests_are_throttled_per_application(limited_application, create_users,
+                                                        django_assert_num_queries):
+    """Test 429s past an application's own limit, without queries, counted per application."""
+    url = f"/api/applications/{limited_application.pk}/permissions/"
+    client = APIClient()
+    client.credentials(HTTP_X_API_KEY=limited_application.API_KEY)
+    assert [client.get(url).status_code for _ in range(2)] == [200, 200]
+    with django_assert_num_queries(0):
+        response = client.get(url)
+    assert response.status_code == 429
+    assert 0 < int(response["Retry-After"]) <= 60
+
+    jwt_client = APIClient()  # user tokens are not rate limited by application
+    jwt_client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(create_users[2])}")
+    assert jwt_client.get(url).status_code == 200
+
+    metrics = registry.render()
+    assert f'app_throttle_allowed_total{{application="{limited_application.pk}"}} 2' in metrics
+    assert f'app_throttle_rejected_total{{application="{limited_application.pk}"}} 1' in metrics
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views_are_throttled(limited_application, settings, tmp_path):
+    """Test that the native async views share the limit, here on the SQLite store."""
+    settings.THROTTLE_STORE = {
+        "BACKEND": "application.throttling.SQLiteBucketStore",
+        "OPTIONS": {"path": str(tmp_path / "buckets.sqlite3")},
+    }
+    headers = {"X-API-Key": limited_application.API_KEY}
+    urls = [f"/api/applications/{limited_application.pk}/{view}/" for view in ("roles", "manifest", "roles")]
+    responses = [async_to_sync(AsyncClient().get)(url, headers=headers) for url in urls]
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[-1].json()["detail"].startswith("Request was throttled.")
+    assert "Retry-After" in responses[-1]
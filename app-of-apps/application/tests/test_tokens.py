@@ -0,0 +1,70 @@
+import pytest
+from allauth.account.models import EmailAddress
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from application.claims import TokenPermissions
+from application.tokens import ClaimsRefreshToken, build_permission_claims
+
+
+@pytest.fixture
+def verified_admin(create_users):
+    _, admin_user, _ = create_users
+    EmailAddress.objects.create(user=admin_user, email=admin_user.email, verified=True, primary=True)
+    return admin_user
+
+
+def login(**data):
+    response = APIClient().post("/auth/login/", {"email": "admin@example.com", "password": "adminpass", **data})
+    assert response.status_code == 200, response.data
+    return response.data
+
+
+@pytest.mark.django_db
+def test_build_permission_claims(create_application_users, create_users, create_application):
+    """Test the compact claim for every membership of a user."""
+    _, admin_user, _ = create_users
+    assert build_permission_claims(admin_user.pk) == {
+        str(create_application.pk): {"r": "Admin", "p": ["Create Reports", "View Reports"]}
+    }
+    assert build_permission_claims(admin_user.pk, application_id=create_application.pk + 1) == {}
+
+
+@pytest.mark.django_db
+def test_login_embeds_claims(verified_admin, create_application_users, create_application):
+    """Test that the login access token can be checked without the database."""
+    tokens = login()
+    permissions = TokenPermissions.from_token(tokens["access"])
+    assert permissions.role(create_application.pk) == "Admin"
+    assert permissions.has_permission(create_application.pk, "Create Reports")
+    assert not permissions.has_permissions(create_application.pk, "Create Reports", "Delete Reports")
+
+
+@pytest.mark.django_db
+def test_scoped_login(verified_admin, create_application_users, create_application):
+    """Test that a scoped login only carries claims for the requested application."""
+    tokens = login(application=create_application.pk + 1)
+    permissions = TokenPermissions.from_token(tokens["access"])
+    assert permissions.scope == create_application.pk + 1
+    assert permissions.applications == {}
+
+
+@pytest.mark.django_db
+def test_refresh_recomputes_claims(verified_admin, create_application_users, create_application, create_roles):
+    """Test that claims follow role changes at the next refresh, not the refresh token's age."""
+    refresh = str(ClaimsRefreshToken.for_user(verified_admin))
+    assert "apps" not in ClaimsRefreshToken(refresh).payload
+
+    _, viewer_role = create_roles
+    create_application_users[1].role = viewer_role
+    create_application_users[1].save()
+
+    response = APIClient().post("/auth/token/refresh/", {"refresh": refresh})
+    assert response.status_code == 200
+    assert TokenPermissions.from_token(response.data["access"]).role(create_application.pk) == "Viewer"
+
+
+def test_invalid_token_is_rejected():
+    """Test that tampered tokens do not verify."""
+    with pytest.raises(InvalidToken):
+        TokenPermissions.from_token("not.a.token")
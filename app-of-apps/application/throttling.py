@@ -0,0 +1,200 @@
+"""
+Per-application rate limiting for API-key clients, as token buckets.
+
+Each Application gets a bucket of `burst` tokens refilled at `rate`, read
+from Application.data["throttle"] (e.g. {"rate": "50/s", "burst": 200}) or
+the THROTTLE_DEFAULT_RATE / THROTTLE_DEFAULT_BURST settings. The
+Application comes from the API-key cache, so a check reads no table; the
+bucket itself lives in the store picked by THROTTLE_STORE:
+
+- LocalBucketStore: in-process, for a single worker process.
+- SQLiteBucketStore: a small SQLite file shared by every worker on the host,
+  updated with one UPSERT per check (not the application database).
+
+Rejections are counted per application and exported on /metrics.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from application.models import Application
+
+
+logger = logging.getLogger(__name__)
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """ "<requests>/<s|m|h|d>" (DRF's format, e.g. "100/min") -> tokens per second """
+    num, _, period = rate.partition("/")
+    try:
+        return int(num) / DURATIONS[period[:1]]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '100/min'.")
+
+
+class LocalBucketStore:
+    """ Buckets in a dict of this process; the least recently used are dropped past `maxsize` """
+    blocking = False
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, capacity, now):
+        """ Take one token; returns (allowed, tokens left) """
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, max(now, updated_at))
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """
+    Buckets in a SQLite file shared by the worker processes of one host. The
+    refill, the take and the write are a single UPSERT, so concurrent workers
+    never lose a take. Bucket state is disposable: the file runs without fsync.
+    """
+    blocking = True  # file I/O: async callers should run it in a thread
+
+    UPSERT = """
+        INSERT INTO buckets (key, tokens, updated_at, allowed) VALUES (:key, :capacity - 1, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:capacity, tokens + max(0, :now - updated_at) * :rate)
+                     - (min(:capacity, tokens + max(0, :now - updated_at) * :rate) >= 1),
+            allowed = min(:capacity, tokens + max(0, :now - updated_at) * :rate) >= 1,
+            updated_at = max(updated_at, :now)
+        RETURNING allowed, tokens
+    """
+
+    def __init__(self, path, timeout=1.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, allowed INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, capacity, now):
+        allowed, tokens = self._connection().execute(
+            self.UPSERT, {"key": key, "rate": rate, "capacity": capacity, "now": now}
+        ).fetchone()
+        return bool(allowed), tokens
+
+    def clear(self):
+        self._connection().execute("DELETE FROM buckets")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    """ The THROTTLE_STORE of this process, created on first use """
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = getattr(settings, "THROTTLE_STORE", {})
+            backend = import_string(config.get("BACKEND", "application.throttling.LocalBucketStore"))
+            _store = backend(**config.get("OPTIONS", {}))
+        return _store
+
+
+def reset_bucket_store():
+    """ Drop the store so the next check picks up changed settings (tests) """
+    global _store
+    with _store_lock:
+        _store = None
+
+
+class RejectionCounter:
+    """ Per-application allowed/rejected counts of this process """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.allowed = Counter()
+        self.rejected = Counter()
+
+    def record(self, application_id, allowed):
+        with self._lock:
+            (self.allowed if allowed else self.rejected)[application_id] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.allowed), dict(self.rejected)
+
+    def reset(self):
+        with self._lock:
+            self.allowed.clear()
+            self.rejected.clear()
+
+
+throttle_counts = RejectionCounter()
+
+
+def application_limits(application):
+    """ (tokens per second, burst) of an application; malformed overrides fall back to the defaults """
+    limits = application.data.get("throttle") if isinstance(application.data, dict) else None
+    limits = limits if isinstance(limits, dict) else {}
+    default_rate = getattr(settings, "THROTTLE_DEFAULT_RATE", "20/s")
+    default_burst = getattr(settings, "THROTTLE_DEFAULT_BURST", 100)
+    try:
+        rate = parse_rate(limits.get("rate") or default_rate)
+        burst = max(1, int(limits.get("burst") or default_burst))
+    except (AttributeError, TypeError, ValueError):
+        logger.warning("Invalid throttle %r of application %s, using the defaults", limits, application.pk)
+        rate, burst = parse_rate(default_rate), max(1, int(default_burst))
+    return rate, burst
+
+
+class ApplicationRateThrottle(BaseThrottle):
+    """
+    DRF throttle keyed by the Application of API-key requests; other
+    requests (JWT users) pass through untouched.
+    """
+
+    @property
+    def blocking(self):
+        return get_bucket_store().blocking
+
+    def allow_request(self, request, view):
+        application = request.auth
+        if not isinstance(application, Application):
+            return True
+        rate, burst = application_limits(application)
+        allowed, tokens = get_bucket_store().take(f"app:{application.pk}", rate, burst, time.time())
+        throttle_counts.record(application.pk, allowed)
+        self.wait_seconds = None if allowed or rate <= 0 else (1 - tokens) / rate
+        return allowed
+
+    def wait(self):
+        return None if self.wait_seconds is None else math.ceil(self.wait_seconds)
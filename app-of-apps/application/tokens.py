@@ -0,0 +1,73 @@
+from collections import defaultdict
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from application import sharding
+from application.blacklist import blacklist_filter
+from application.claims import APPLICATION_SCOPE_CLAIM, APPLICATIONS_CLAIM
+from application.models import AppPermission, ApplicationUser, RoleClosure
+
+
+def build_permission_claims(user_id, application_id=None):
+    """
+    {"<application_id>": {"r": role name, "p": [permission names]}} for every
+    live membership of the user, or only `application_id` when given. Two
+    queries, on every shard when sharding is on and no application is given.
+    """
+    memberships = ApplicationUser.alive.filter(user_id=user_id, role__deleted_ts__isnull=True)
+    if application_id is not None:
+        memberships = memberships.filter(application_id=application_id)
+    claims = {}
+    for queryset in sharding.across_shards(memberships):
+        roles = {role_id: (app_id, name) for app_id, role_id, name in
+                 queryset.values_list("application_id", "role_id", "role__name")}
+        if not roles:
+            continue
+
+        permissions = defaultdict(set)
+        rows = AppPermission.alive.using(queryset.db).filter(  # own and inherited, through RoleClosure
+            ~RoleClosure.through_deleted_role("roles__descendant_links__"),
+            roles__deleted_ts__isnull=True, roles__descendant_links__descendant__in=roles.keys(),
+        ).values_list("roles__descendant_links__descendant", "name")
+        for role_id, name in rows:
+            permissions[role_id].add(name)
+
+        claims.update(
+            (str(app_id), {"r": name, "p": sorted(permissions[role_id])})
+            for role_id, (app_id, name) in roles.items()
+        )
+    return claims
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry the user's role/permission claims.
+
+    Claims are computed whenever an access token is minted (login and every
+    refresh) and are never stored on the refresh token itself, so they are at
+    most ACCESS_TOKEN_LIFETIME stale. An optional application scope is kept on
+    the refresh token and limits the claims to that one application.
+    """
+    no_copy_claims = (*RefreshToken.no_copy_claims, APPLICATIONS_CLAIM)
+
+    def check_blacklist(self):
+        """ Only jtis the in-process filter cannot rule out are looked up (see application.blacklist) """
+        if blacklist_filter.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()  # raises TokenError when blacklisted
+            blacklist_filter.record_false_positive()
+
+    @classmethod
+    def for_user(cls, user, application_id=None):
+        token = super().for_user(user)
+        if application_id is not None:
+            token[APPLICATION_SCOPE_CLAIM] = int(application_id)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[APPLICATIONS_CLAIM] = build_permission_claims(
+            self.payload[api_settings.USER_ID_CLAIM], self.payload.get(APPLICATION_SCOPE_CLAIM)
+        )
+        return access
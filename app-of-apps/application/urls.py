@@ -0,0 +1,14 @@
+from django.urls import path, re_path
+
+from application import views
+
+
+urlpatterns = [
+    path("applications/<int:application_id>/members/", views.ApplicationUserList.as_view(), name="application-members"),
+    path("applications/<int:application_id>/members/<int:user_id>/", views.MembershipView.as_view(), name="application-member"),
+    path("applications/<int:application_id>/roles/", views.RoleList.as_view(), name="application-roles"),
+    path("applications/<int:application_id>/permissions/", views.AppPermissionList.as_view(), name="application-permissions"),
+    path("applications/<int:application_id>/manifest/", views.ManifestView.as_view(), name="application-manifest"),
+    re_path(r"^applications/(?P<application_id>\d+)/check/?$", views.PermissionCheckView.as_view(), name="application-check"),
+    re_path(r"^changes/?$", views.ChangesView.as_view(), name="changes"),
+]
@@ -1,7 +1,297 @@
-from django.shortcuts import render
-from django.http import HttpResponse
+import asyncio
+import json
+import time
 
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from dj_rest_auth.app_settings import api_settings as rest_auth_settings
+from dj_rest_auth.jwt_auth import get_refresh_view
+from dj_rest_auth.views import LoginView
+from rest_framework import exceptions, generics
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from application import changelog
+from application.authentication import APIKeyAuthentication, aauthenticate
+from application.manifest import abuild_manifest, manifest_cache
+from application.metrics import registry
+from application.models import Application, AppPermission, ApplicationUser, ChangeLogEntry, Role
+from application.pagination import KeysetPagination
+from application.permissions import IsApplicationOwnerOrClient, acheck_permissions
+from application.serializers import (
+    AppPermissionSerializer, ApplicationUserSerializer, ChangeLogEntrySerializer, ChangesQuerySerializer,
+    ClaimsLoginSerializer, ClaimsTokenRefreshSerializer, PermissionCheckSerializer, RoleSerializer,
+)
+from application.tokens import ClaimsRefreshToken
 
 
 def applications_list(request):
-    return HttpResponse("Hello world!")
\ No newline at end of file
+    return HttpResponse("Hello world!")
+
+
+async def metrics(request):
+    """ Request and cache metrics in the Prometheus text exposition format """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ClaimsLoginView(LoginView):
+    """
+    dj_rest_auth login whose access token embeds the user's role/permission
+    claims, optionally limited to one `application`.
+    """
+    serializer_class = ClaimsLoginSerializer
+
+    def login(self):
+        self.user = self.serializer.validated_data["user"]
+        refresh = ClaimsRefreshToken.for_user(self.user, self.serializer.validated_data.get("application"))
+        self.access_token, self.refresh_token = refresh.access_token, refresh
+        if rest_auth_settings.SESSION_LOGIN:
+            self.process_login()
+
+
+class ClaimsTokenRefreshView(get_refresh_view()):
+    """ Token refresh that recomputes the claims of every new access token """
+    serializer_class = ClaimsTokenRefreshSerializer
+
+
+class ApplicationScopedMixin:
+    """
+    Resolves `application_id` from the URL and checks the caller may read it.
+    Only these views accept API keys: the auth endpoints expect a User.
+    """
+    authentication_classes = (JWTAuthentication, APIKeyAuthentication)
+    permission_classes = (IsAuthenticated, IsApplicationOwnerOrClient)
+
+    def get_application(self):
+        if not hasattr(self, "_application"):
+            self._application = get_object_or_404(Application.alive, pk=self.kwargs["application_id"])
+            self.check_object_permissions(self.request, self._application)
+        return self._application
+
+
+class ApplicationScopedListView(ApplicationScopedMixin, generics.ListAPIView):
+    """ Live rows of `model` for one application, keyset-paginated over (created_ts, id) """
+    pagination_class = KeysetPagination
+    model = None
+
+    def get_queryset(self):
+        return self.model.alive.filter(application=self.get_application())
+
+
+class ApplicationUserList(ApplicationScopedListView):
+    model = ApplicationUser
+    serializer_class = ApplicationUserSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("role").select_global_related("user")
+
+
+class AppPermissionList(ApplicationScopedListView):
+    model = AppPermission
+    serializer_class = AppPermissionSerializer
+
+
+class AsyncApplicationView(View):
+    """
+    Native async counterpart of ApplicationScopedMixin for the read-heavy
+    endpoints, so waiting on the database never holds a worker thread.
+    DRF views are sync-only; authentication (JWT or API key, see
+    authentication.aauthenticate), IsApplicationOwnerOrClient and DRF-shaped
+    error bodies are reproduced here on top of the async ORM.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))  # token authentication only, like APIView
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user, request.auth = await aauthenticate(request)
+            if request.user is None:
+                raise exceptions.NotAuthenticated()
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        response = JsonResponse(data, status=exc.status_code, safe=False)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response["WWW-Authenticate"] = JWTAuthentication().authenticate_header(self.request)
+        if isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+            response["Retry-After"] = str(exc.wait)
+        return response
+
+    async def check_throttles(self, request):
+        """ APIView.check_throttles; throttles backed by a blocking store run in a thread """
+        for throttle in [throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES]:
+            if getattr(throttle, "blocking", True):
+                allowed = await sync_to_async(throttle.allow_request)(request, self)
+            else:
+                allowed = throttle.allow_request(request, self)
+            if not allowed:
+                raise exceptions.Throttled(throttle.wait())
+
+    async def get_application(self, application_id):
+        try:
+            application = await Application.alive.aget(pk=application_id)
+        except Application.DoesNotExist:
+            raise exceptions.NotFound()
+        if not IsApplicationOwnerOrClient().has_object_permission(self.request, self, application):
+            raise exceptions.PermissionDenied()
+        return application
+
+
+class MembershipView(AsyncApplicationView):
+    """ One user's live membership of an application, with their role """
+
+    async def get(self, request, application_id, user_id):
+        application = await self.get_application(application_id)
+        try:
+            member = await ApplicationUser.alive.select_related("role").select_global_related("user").aget(
+                application=application, user_id=user_id
+            )
+        except ApplicationUser.DoesNotExist:
+            raise exceptions.NotFound()
+        return JsonResponse(ApplicationUserSerializer(member).data)
+
+
+class RoleList(AsyncApplicationView):
+    """ Live roles of an application with their permission names, keyset-paginated """
+    pagination_class = KeysetPagination
+
+    async def get(self, request, application_id):
+        application = await self.get_application(application_id)
+        queryset = Role.alive.filter(application=application).prefetch_related(
+            Prefetch("permissions", AppPermission.alive.all())
+        )
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request, view=self)
+        return JsonResponse(paginator.get_paginated_data(RoleSerializer(page, many=True).data))
+
+
+class PermissionCheckView(AsyncApplicationView):
+    """
+    Answer a batch of (user, permission) checks for one application in a fixed
+    number of queries. `server_time_ms` (also sent as a Server-Timing header)
+    covers validation and resolution, for tail-latency tracking.
+    """
+
+    async def post(self, request, application_id):
+        started = time.perf_counter()
+        application = await self.get_application(application_id)
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise exceptions.ParseError()
+        serializer = PermissionCheckSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        pairs = [(check["user"], check["permission"]) for check in serializer.validated_data["checks"]]
+        allowed = await acheck_permissions(application.pk, pairs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        results = [
+            {"user": user_id, "permission": name, "allowed": result}
+            for (user_id, name), result in zip(pairs, allowed)
+        ]
+        response = JsonResponse({"results": results, "server_time_ms": round(elapsed_ms, 3)})
+        response["Server-Timing"] = f"check;dur={elapsed_ms:.3f}"
+        return response
+
+
+class ManifestView(AsyncApplicationView):
+    """
+    The application's live roles, permissions and role -> permission matrix,
+    versioned by Application.revision (see application.manifest). Fresh
+    cached manifests are authorized and revalidated without a query.
+    """
+
+    async def get(self, request, application_id):
+        manifest = manifest_cache.get(application_id)
+        if manifest is not None and manifest.is_fresh():
+            owner = Application(pk=manifest.application_id, user_id=manifest.user_id)
+            if not IsApplicationOwnerOrClient().has_object_permission(request, self, owner):
+                raise exceptions.PermissionDenied()
+        else:
+            application = await self.get_application(application_id)
+            revalidated = manifest.revalidated(application) if manifest is not None else None
+            manifest = revalidated or await abuild_manifest(application)
+            manifest_cache.set(application_id, manifest)
+
+        etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if "*" in etags or manifest.etag in etags:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(manifest.body, content_type="application/json")
+        response["ETag"] = manifest.etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class CursorExpired(exceptions.APIException):
+    status_code = 410
+    default_detail = "Entries after this cursor were removed by retention; reload the full state."
+    default_code = "cursor_expired"
+
+
+class ChangesView(AsyncApplicationView):
+    """
+    Change feed of one application, for clients keeping a local copy of its
+    roles, permissions and members warm (see application.changelog).
+
+    Without `since`, answers the current cursor: take it before loading the
+    full state, then poll with ?since=<cursor>. With `wait` (seconds), an
+    empty answer is held back until an entry arrives or the wait runs out.
+    410 Gone means entries past the cursor were dropped: reload the full state.
+    """
+
+    async def get(self, request):
+        query = ChangesQuerySerializer(data=request.GET)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        application = await self.get_application(params["application"])
+        if "since" not in params:
+            return JsonResponse({"cursor": await changelog.ahead(), "results": [], "has_more": False})
+
+        since, limit = params["since"], params["limit"]
+        oldest = await changelog.aoldest()
+        if oldest is not None and since < oldest - 1:
+            raise CursorExpired()
+
+        deadline = time.monotonic() + params["wait"]
+        poll_interval = getattr(settings, "CHANGES_POLL_INTERVAL", 1.0)
+        entries = ChangeLogEntry.objects.filter(application_id=application.pk, pk__gt=since).order_by("pk")
+        with changelog.notifier.listen(application.pk) as changed:
+            while True:
+                changed.clear()
+                head = await changelog.ahead()  # read first: every entry up to it is already visible
+                page = [entry async for entry in entries[:limit + 1]]
+                remaining = deadline - time.monotonic()
+                if page or remaining <= 0:
+                    break
+                try:
+                    # Woken by writes in this process; polls for other processes' writes
+                    await asyncio.wait_for(changed.wait(), min(poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        cursor = page[-1].pk if has_more else max(since, head, *(entry.pk for entry in page[-1:]))
+        return JsonResponse({
+            "cursor": cursor,
+            "results": ChangeLogEntrySerializer(page, many=True).data,
+            "has_more": has_more,
+        })